@@ -0,0 +1,230 @@
+from collections import defaultdict
+import numpy as np
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm.attributes import set_committed_value
+from app.data.models import Project, StaticTest, CyclicTest, Deflection, Shot
+from app.data.versions import bump_projects
+from app.domain.test_plan_cache import test_plan_cache
+from app.domain.test_plan_engine import TestPlanEngine
+
+
+# One INSERT ... RETURNING per table. Only callers that need rows back in
+# parameter order ask for it; it costs a per-row fallback on some backends.
+def _insert_returning(db, model, rows, ordered=False):
+    if not rows:
+        return []
+    return db.scalars(insert(model).returning(model, sort_by_parameter_order=ordered), rows).all()
+
+
+def _group_by_project(tests):
+    grouped = defaultdict(list)
+    for test in sorted(tests, key=lambda test: test.index):
+        grouped[test.project_id].append(test)
+    return grouped
+
+
+def create_projects_with_test_plans(db, device_id, projects_data):
+    """Insert projects and their generated static/cyclic tests in three statements.
+
+    The returned projects have every ProjectSchema relationship populated in
+    memory, so they can be serialized without reloading them.
+    """
+    projects = _insert_returning(db, Project, [
+        dict(
+            name=data.name,
+            inward_design_pressure=data.inward_design_pressure,
+            outward_design_pressure=data.outward_design_pressure,
+            device_id=device_id,
+        )
+        for data in projects_data
+    ], ordered=True)
+
+    static_rows, cyclic_rows = [], []
+    for project in projects:
+        static_plan, cyclic_plan = test_plan_cache.get(project.inward_design_pressure, project.outward_design_pressure)
+        static_rows.extend(dict(row, project_id=project.id) for row in static_plan)
+        cyclic_rows.extend(dict(row, project_id=project.id) for row in cyclic_plan)
+    static_tests = _insert_returning(db, StaticTest, static_rows)
+    cyclic_tests = _insert_returning(db, CyclicTest, cyclic_rows)
+
+    for static_test in static_tests:
+        set_committed_value(static_test, "deflections", [])
+    static_by_project = _group_by_project(static_tests)
+    cyclic_by_project = _group_by_project(cyclic_tests)
+    for project in projects:
+        set_committed_value(project, "static_tests", static_by_project[project.id])
+        set_committed_value(project, "cyclic_tests", cyclic_by_project[project.id])
+        set_committed_value(project, "infiltration_tests", [])
+        set_committed_value(project, "missile_impact_tests", [])
+    return projects
+
+
+# Fields recalculated from the design pressures when a project is updated
+STATIC_PLAN_FIELDS = ("pressure", "duration")
+CYCLIC_PLAN_FIELDS = ("high_pressure", "low_pressure", "cycles")
+# Fields a client may overwrite through StaticTestUpdateSchema/CyclicTestUpdateSchema
+STATIC_UPDATE_FIELDS = ("type", "index", "duration", "pressure")
+CYCLIC_UPDATE_FIELDS = ("type", "index", "cycles", "low_pressure", "high_pressure")
+
+
+def upsert_tests_by_index(db, model, project_id, rows, update_fields):
+    """Apply `rows` (dicts keyed by "index") to a project's static or cyclic tests.
+
+    Existing unfinished tests get `update_fields` overwritten, missing indices are
+    inserted and finished tests are left untouched. Costs one SELECT plus at most
+    one bulk UPDATE and one bulk INSERT, however many rows are given.
+    """
+    existing = {
+        test.index: test
+        for test in db.query(model).filter(model.project_id == project_id)
+    }
+    updates, inserts = [], []
+    for row in rows:
+        test = existing.get(row["index"])
+        if test is None:
+            inserts.append(dict(row, project_id=project_id, finished=False))
+        elif not test.finished:
+            updates.append(dict({field: row[field] for field in update_fields}, id=test.id))
+    if updates:
+        db.execute(update(model), updates)
+    if inserts:
+        db.execute(insert(model), inserts)
+
+
+DEFLECTION_FIELDS = ("max_deflection", "permanent_deflection", "recovery")
+
+
+def upsert_deflections_by_gauge(db, rows_by_test):
+    """Write computed deflections, keyed by static test id, replacing the values of gauges already recorded.
+
+    One SELECT plus at most one bulk UPDATE and one bulk INSERT for any number
+    of tests. Returns (updated, inserted).
+    """
+    if not rows_by_test:
+        return 0, 0
+    existing = {
+        (static_test_id, gauge): deflection_id
+        for deflection_id, static_test_id, gauge in db.query(
+            Deflection.id, Deflection.static_test_id, Deflection.deflection_gauge
+        ).filter(Deflection.static_test_id.in_(rows_by_test.keys()))
+    }
+    updates, inserts = [], []
+    for static_test_id, rows in rows_by_test.items():
+        for row in rows:
+            deflection_id = existing.get((static_test_id, row["deflection_gauge"]))
+            if deflection_id is None:
+                inserts.append(dict(row, static_test_id=static_test_id))
+            else:
+                updates.append(dict({field: row[field] for field in DEFLECTION_FIELDS}, id=deflection_id))
+    if updates:
+        db.execute(update(Deflection), updates)
+    if inserts:
+        db.execute(insert(Deflection), inserts)
+    return len(updates), len(inserts)
+
+
+DEFLECTION_BATCH_FIELDS = ("deflection_gauge",) + DEFLECTION_FIELDS
+SHOT_FIELDS = ("area", "velocity", "result", "note")
+
+
+def apply_batch(db, model, parent_column, parent_id, items, fields):
+    """Create, update and delete children of one parent from a list of batch items.
+
+    An item without "id" is a create and needs every field; an item with "id"
+    updates the fields it sets, or is removed when "delete" is true. Ids that
+    do not belong to the parent are reported as not_found. Returns one
+    {"index", "id", "status", "detail"} per item, in order; the caller decides
+    whether to commit. Costs one SELECT and at most one INSERT, UPDATE and
+    DELETE statement each.
+    """
+    requested = {item["id"] for item in items if item.get("id") is not None}
+    owned = set()
+    if requested:
+        owned = {
+            child_id for child_id, in db.query(model.id).filter(
+                getattr(model, parent_column) == parent_id, model.id.in_(requested)
+            )
+        }
+
+    results, creates, updates, deletes, seen = [], [], [], [], set()
+    for position, item in enumerate(items):
+        result = dict(index=position, id=item.get("id"), status=None, detail=None)
+        results.append(result)
+        values = {field: item[field] for field in fields if item.get(field) is not None}
+        if result["id"] is None:
+            missing = [field for field in fields if field not in values]
+            if item.get("delete") or missing:
+                result.update(status="invalid", detail=f"Missing fields: {', '.join(missing)}" if missing
+                              else "Delete needs an id")
+                continue
+            creates.append((result, dict(values, **{parent_column: parent_id})))
+        elif result["id"] not in owned:
+            result.update(status="not_found", detail=f"{model.__name__} not found")
+        elif result["id"] in seen:
+            result.update(status="invalid", detail="Duplicate id in batch")
+        elif item.get("delete"):
+            seen.add(result["id"])
+            deletes.append(result["id"])
+            result["status"] = "deleted"
+        else:
+            seen.add(result["id"])
+            if values:
+                updates.append(dict(values, id=result["id"]))
+            result["status"] = "updated"
+
+    if creates:
+        created = _insert_returning(db, model, [row for _, row in creates], ordered=True)
+        for (result, _), child in zip(creates, created):
+            result.update(id=child.id, status="created")
+    if updates:
+        db.execute(update(model), updates)
+    if deletes:
+        db.execute(delete(model).where(model.id.in_(deletes)))
+    return results
+
+
+def _recalculate_unfinished(db, model, project_positions, plan, columns):
+    tests = db.query(model.id, model.project_id, model.index).filter(
+        model.project_id.in_(project_positions.keys()), model.finished.is_(False)
+    ).all()
+    if not tests:
+        return 0, set()
+    ids, project_ids, indices = (np.asarray(column) for column in zip(*tests))
+    rows = np.fromiter((project_positions[project_id] for project_id in project_ids.tolist()), dtype=np.int64)
+    # Tests beyond the protocol's table (custom plans) keep their values
+    in_plan = indices < next(iter(plan.values())).shape[1]
+    ids, rows, indices, project_ids = ids[in_plan], rows[in_plan], indices[in_plan], project_ids[in_plan]
+    values = {column: plan[column][rows, indices].tolist() for column in columns}
+    updates = [
+        dict({column: values[column][k] for column in columns}, id=test_id)
+        for k, test_id in enumerate(ids.tolist())
+    ]
+    if updates:
+        db.execute(update(model), updates)
+    return len(updates), set(project_ids.tolist())
+
+
+def recalculate_test_plans(db, protocol=None, project_ids=None):
+    """Recompute every unfinished static/cyclic test from its project's design
+    pressures under `protocol`, e.g. after a standard revision changed factors.
+
+    All projects are evaluated in one engine call, and those with an updated
+    test are bumped; returns the number of static and cyclic tests updated.
+    """
+    query = db.query(Project.id, Project.inward_design_pressure, Project.outward_design_pressure)
+    if project_ids is not None:
+        query = query.filter(Project.id.in_(project_ids))
+    projects = query.all()
+    if not projects:
+        return 0, 0
+    ids, inward, outward = zip(*projects)
+    project_positions = {project_id: position for position, project_id in enumerate(ids)}
+    engine = TestPlanEngine(protocol)
+    static_updated, static_projects = _recalculate_unfinished(
+        db, StaticTest, project_positions, engine.static_plan(inward, outward), STATIC_PLAN_FIELDS
+    )
+    cyclic_updated, cyclic_projects = _recalculate_unfinished(
+        db, CyclicTest, project_positions, engine.cyclic_plan(inward, outward), CYCLIC_PLAN_FIELDS
+    )
+    bump_projects(db, static_projects | cyclic_projects)
+    return static_updated, cyclic_updated
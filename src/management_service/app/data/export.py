@@ -0,0 +1,260 @@
+"""Streaming exports of projects, test results and telemetry.
+
+Rows are read with `yield_per` (a server-side cursor on PostgreSQL) and
+encoded batch by batch, so memory stays constant however much is exported.
+Project-level rows are filtered by device and by the project's created_at;
+telemetry by device and recorded_at. Projects created before created_at
+existed have no date and only show up in exports without a date range.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.data.models import (
+    CyclicTest, Deflection, Device, MissileImpactTest, Project, Shot, StaticTest, TelemetryChunk, TelemetrySample,
+)
+
+BATCH_SIZE = 2_000
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# (column name, type) per export; types drive the CSV/NDJSON encoding and the Parquet schema
+COLUMNS = {
+    "projects": (
+        ("id", "int"), ("device_id", "int"), ("device_name", "str"), ("name", "str"),
+        ("inward_design_pressure", "float"), ("outward_design_pressure", "float"), ("created_at", "datetime"),
+    ),
+    "static_tests": (
+        ("id", "int"), ("project_id", "int"), ("device_id", "int"), ("index", "int"), ("type", "str"),
+        ("pressure_factor", "str"), ("pressure", "float"), ("duration", "int"), ("finished", "bool"),
+    ),
+    "cyclic_tests": (
+        ("id", "int"), ("project_id", "int"), ("device_id", "int"), ("index", "int"), ("type", "str"),
+        ("cycles", "int"), ("low_pressure", "float"), ("high_pressure", "float"), ("completed_cycles", "int"),
+        ("deflection", "float"), ("permanent_set", "float"), ("result", "bool"), ("note", "str"), ("finished", "bool"),
+    ),
+    "deflections": (
+        ("id", "int"), ("static_test_id", "int"), ("project_id", "int"), ("device_id", "int"),
+        ("deflection_gauge", "int"), ("max_deflection", "float"), ("permanent_deflection", "float"),
+        ("recovery", "float"),
+    ),
+    "shots": (
+        ("id", "int"), ("missile_impact_test_id", "int"), ("project_id", "int"), ("device_id", "int"),
+        ("missile", "str"), ("missile_weight", "float"), ("area", "float"), ("velocity", "float"),
+        ("result", "bool"), ("note", "str"),
+    ),
+    "telemetry": (
+        ("device_id", "int"), ("sensor", "str"), ("static_test_id", "int"), ("cyclic_test_id", "int"),
+        ("recorded_at", "datetime"), ("value", "float"),
+    ),
+}
+EXPORTS = tuple(COLUMNS)
+
+
+def _statement(export):
+    if export == "projects":
+        return select(
+            Project.id, Project.device_id, Device.name.label("device_name"), Project.name,
+            Project.inward_design_pressure, Project.outward_design_pressure, Project.created_at,
+        ).join(Device, Project.device_id == Device.id).order_by(Project.id)
+    if export == "static_tests":
+        return select(
+            StaticTest.id, StaticTest.project_id, Project.device_id, StaticTest.index, StaticTest.type,
+            StaticTest.pressure_factor, StaticTest.pressure, StaticTest.duration, StaticTest.finished,
+        ).join(Project, StaticTest.project_id == Project.id).order_by(StaticTest.id)
+    if export == "cyclic_tests":
+        return select(
+            CyclicTest.id, CyclicTest.project_id, Project.device_id, CyclicTest.index, CyclicTest.type,
+            CyclicTest.cycles, CyclicTest.low_pressure, CyclicTest.high_pressure, CyclicTest.completed_cycles,
+            CyclicTest.deflection, CyclicTest.permanent_set, CyclicTest.result, CyclicTest.note, CyclicTest.finished,
+        ).join(Project, CyclicTest.project_id == Project.id).order_by(CyclicTest.id)
+    if export == "deflections":
+        return select(
+            Deflection.id, Deflection.static_test_id, StaticTest.project_id, Project.device_id,
+            Deflection.deflection_gauge, Deflection.max_deflection, Deflection.permanent_deflection,
+            Deflection.recovery,
+        ).join(StaticTest, Deflection.static_test_id == StaticTest.id) \
+         .join(Project, StaticTest.project_id == Project.id).order_by(Deflection.id)
+    if export == "shots":
+        return select(
+            Shot.id, Shot.missile_impact_test_id, MissileImpactTest.project_id, Project.device_id,
+            MissileImpactTest.missile, MissileImpactTest.missile_weight, Shot.area, Shot.velocity, Shot.result,
+            Shot.note,
+        ).join(MissileImpactTest, Shot.missile_impact_test_id == MissileImpactTest.id) \
+         .join(Project, MissileImpactTest.project_id == Project.id).order_by(Shot.id)
+    raise ValueError(f"Unknown export {export!r}")
+
+
+def _project_rows(db, export, device_id, start, end):
+    statement = _statement(export)
+    if device_id is not None:
+        statement = statement.where(Project.device_id == device_id)
+    if start is not None:
+        statement = statement.where(Project.created_at >= start)
+    if end is not None:
+        statement = statement.where(Project.created_at < end)
+    for rows in db.execute(statement.execution_options(yield_per=BATCH_SIZE)).partitions():
+        yield [tuple(row) for row in rows]
+
+
+def _telemetry_rows(db, device_id, start, end):
+    # Local imports keep the data layer importable without NumPy-backed telemetry helpers
+    from app.telemetry.store import from_epoch, to_epoch, unpack
+
+    chunks = select(
+        TelemetryChunk.device_id, TelemetryChunk.sensor, TelemetryChunk.static_test_id,
+        TelemetryChunk.cyclic_test_id, TelemetryChunk.start_at, TelemetryChunk.offsets, TelemetryChunk.values,
+    ).order_by(TelemetryChunk.id)
+    samples = select(
+        TelemetrySample.device_id, TelemetrySample.sensor, TelemetrySample.static_test_id,
+        TelemetrySample.cyclic_test_id, TelemetrySample.recorded_at, TelemetrySample.value,
+    ).order_by(TelemetrySample.id)
+    if device_id is not None:
+        chunks = chunks.where(TelemetryChunk.device_id == device_id)
+        samples = samples.where(TelemetrySample.device_id == device_id)
+    if start is not None:
+        chunks = chunks.where(TelemetryChunk.end_at >= start)
+        samples = samples.where(TelemetrySample.recorded_at >= start)
+    if end is not None:
+        chunks = chunks.where(TelemetryChunk.start_at < end)
+        samples = samples.where(TelemetrySample.recorded_at < end)
+    low = to_epoch(start) if start is not None else float("-inf")
+    high = to_epoch(end) if end is not None else float("inf")
+
+    # Chunks are large, so they are fetched a few at a time
+    for chunk_rows in db.execute(chunks.execution_options(yield_per=BATCH_SIZE // 100)).partitions():
+        batch = []
+        for chunk in chunk_rows:
+            start_epoch = to_epoch(chunk.start_at)
+            key = (chunk.device_id, chunk.sensor, chunk.static_test_id, chunk.cyclic_test_id)
+            for offset, value in zip(unpack(chunk.offsets).tolist(), unpack(chunk.values).tolist()):
+                if low <= start_epoch + offset < high:
+                    batch.append(key + (from_epoch(start_epoch + offset), value))
+        if batch:
+            yield batch
+    for rows in db.execute(samples.execution_options(yield_per=BATCH_SIZE)).partitions():
+        yield [tuple(row) for row in rows]
+
+
+def export_batches(db, export, device_id=None, start=None, end=None):
+    """Lists of row tuples in COLUMNS[export] order."""
+    if export == "telemetry":
+        return _telemetry_rows(db, device_id, start, end)
+    return _project_rows(db, export, device_id, start, end)
+
+
+def _text(value, kind):
+    if value is None:
+        return None
+    if kind == "datetime":
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    return value
+
+
+def encode_ndjson(batches, columns):
+    names = [name for name, _ in columns]
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(names, (_text(value, kind) for value, (_, kind) in zip(row, columns))))) + "\n"
+            for row in batch
+        ).encode()
+
+
+def encode_csv(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in columns)
+    for batch in batches:
+        writer.writerows(
+            ["" if value is None else _text(value, kind) for value, (_, kind) in zip(row, columns)] for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file that hands everything written so far to the response stream
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def encode_parquet(batches, columns):
+    """One Parquet row group per batch; needs pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "int": pa.int64(), "float": pa.float64(), "str": pa.string(), "bool": pa.bool_(),
+        "datetime": pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            arrays = [
+                pa.array([_as_utc(row[i]) if kind == "datetime" else row[i] for row in batch], type=types[kind])
+                for i, (_, kind) in enumerate(columns)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _as_utc(value):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv, "parquet": encode_parquet}
+
+
+def stream_export(session_factory, export, export_format, device_id=None, start=None, end=None):
+    """Encoded chunks of an export, read through a session of its own.
+
+    The stream outlives the request's dependencies, so it cannot use the
+    request session.
+    """
+    db = session_factory()
+    try:
+        yield from ENCODERS[export_format](export_batches(db, export, device_id, start, end), COLUMNS[export])
+    finally:
+        db.close()
+
+
+def export_filename(export, export_format):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return f"{export}-{stamp}.{export_format}"
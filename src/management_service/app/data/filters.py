@@ -0,0 +1,42 @@
+from sqlalchemy import exists, or_
+from app.data.models import Device, Project, StaticTest, CyclicTest
+
+
+def device_criteria(name_prefix=None):
+    criteria = []
+    if name_prefix:
+        criteria.append(Device.name.startswith(name_prefix, autoescape=True))
+    return criteria
+
+
+def project_criteria(device_id=None, name_prefix=None, finished=None):
+    criteria = []
+    if device_id is not None:
+        criteria.append(Project.device_id == device_id)
+    if name_prefix:
+        criteria.append(Project.name.startswith(name_prefix, autoescape=True))
+    if finished is not None:
+        # A project is finished once none of its static or cyclic tests is still open
+        has_open_tests = or_(
+            exists().where(StaticTest.project_id == Project.id, StaticTest.finished.is_(False)),
+            exists().where(CyclicTest.project_id == Project.id, CyclicTest.finished.is_(False)),
+        )
+        criteria.append(~has_open_tests if finished else has_open_tests)
+    return criteria
+
+
+# Keyset pagination on the primary key: `after` is the last id of the previous page
+def paginate(query, id_column, after=None, limit=None):
+    if after is not None:
+        query = query.filter(id_column > after)
+    query = query.order_by(id_column)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+# `ids` of the page, in order
+def next_cursor(ids, limit):
+    if limit is not None and len(ids) == limit:
+        return str(ids[-1])
+    return None
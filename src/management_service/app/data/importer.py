@@ -0,0 +1,339 @@
+"""Bulk import of historical results: devices, projects, tests, deflections and shots.
+
+Rows come as one list of flat records per entity (a CSV file or a JSON list
+each) and reference their parents by natural key: device name, project name
+within the device, static test index and missile within the project. Entities
+are loaded parents first. Each one costs a validation pass, a few bulk SELECTs
+to resolve parent ids and existing rows, and batched multi-row INSERTs.
+
+Invalid rows, and rows whose parent is missing or failed, are reported by
+position and skipped; everything else is imported. Devices, projects, tests
+and deflections that already exist are left as they are and counted as
+existing, so an import can be run again after fixing its errors. Infiltration
+tests and shots have no natural key, so they are only added to projects and
+missile impact tests created by the same import. Projects that got anything
+new have their versions bumped.
+"""
+import csv
+import io
+import json
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from app.data.bulk import _insert_returning
+from app.data.models import (
+    CyclicTest, Deflection, Device, InfiltrationTest, MissileImpactTest, Project, Shot, StaticTest,
+)
+from app.data.versions import bump_projects
+from app.data.schema import (
+    ImportCyclicTestSchema, ImportDeflectionSchema, ImportDeviceSchema, ImportInfiltrationTestSchema,
+    ImportMissileImpactTestSchema, ImportProjectSchema, ImportShotSchema, ImportStaticTestSchema,
+)
+
+# Rows per INSERT and ids per IN (...) lookup
+BATCH_SIZE = 1_000
+# Errors returned in a result; counts stay exact beyond it
+MAX_ERRORS = 1_000
+
+ROW_SCHEMAS = {
+    "devices": ImportDeviceSchema,
+    "projects": ImportProjectSchema,
+    "static_tests": ImportStaticTestSchema,
+    "cyclic_tests": ImportCyclicTestSchema,
+    "infiltration_tests": ImportInfiltrationTestSchema,
+    "missile_impact_tests": ImportMissileImpactTestSchema,
+    "deflections": ImportDeflectionSchema,
+    "shots": ImportShotSchema,
+}
+IMPORT_ORDER = tuple(ROW_SCHEMAS)
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+def _describe(error):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}" for item in error.errors()
+    )
+
+
+class _ImportRun:
+    def __init__(self, db):
+        self.db = db
+        self.counts = {entity: dict(created=0, existing=0, failed=0) for entity in IMPORT_ORDER}
+        self.errors = []
+        # Natural key -> id, filled from the database and from rows inserted by this run
+        self.devices = {}
+        self.projects = {}
+        self.static_tests = {}
+        self.missile_impact_tests = {}
+        self.new_projects = set()
+        self.new_missile_impact_tests = set()
+        # Projects with new rows anywhere in their tree
+        self.changed_projects = set()
+
+    def fail(self, entity, index, detail):
+        self.counts[entity]["failed"] += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(dict(entity=entity, index=index, detail=detail))
+
+    def validate(self, entity, rows):
+        schema, valid = ROW_SCHEMAS[entity], []
+        for index, row in enumerate(rows):
+            try:
+                valid.append((index, schema.model_validate(row).model_dump()))
+            except ValidationError as exc:
+                self.fail(entity, index, _describe(exc))
+        return valid
+
+    def insert(self, model, rows, returning):
+        """Insert in batches; with `returning` the new ids come back in row order."""
+        ids = []
+        for batch in _batches(rows):
+            if returning:
+                ids.extend(row.id for row in _insert_returning(self.db, model, batch, ordered=True))
+            else:
+                self.db.execute(insert(model), batch)
+        return ids
+
+    # Bulk lookups: only keys not resolved yet hit the database
+
+    def load_devices(self, names):
+        missing = {name for name in names if name not in self.devices}
+        for batch in _batches(missing):
+            for device_id, name in self.db.query(Device.id, Device.name).filter(Device.name.in_(batch)).order_by(Device.id):
+                self.devices.setdefault(name, device_id)
+
+    def load_projects(self, keys):
+        missing = {key for key in keys if key not in self.projects}
+        self.load_devices(device for device, _ in missing)
+        names_by_device = {}
+        for device, project in missing:
+            if device in self.devices:
+                names_by_device.setdefault(self.devices[device], set()).add(project)
+        device_names = {device_id: name for name, device_id in self.devices.items()}
+        names = set().union(*names_by_device.values()) if names_by_device else set()
+        for batch in _batches(names):
+            query = self.db.query(Project.id, Project.device_id, Project.name).filter(
+                Project.device_id.in_(list(names_by_device)), Project.name.in_(batch)
+            ).order_by(Project.id)
+            for project_id, device_id, name in query:
+                self.projects.setdefault((device_names[device_id], name), project_id)
+
+    def load_tests(self, model, column, keys, known):
+        """Ids of tests keyed by (device, project, `column` value), e.g. a static test's index."""
+        keys = {key for key in keys if key not in known}
+        self.load_projects(key[:2] for key in keys)
+        project_keys = {self.projects[key[:2]]: key[:2] for key in keys if key[:2] in self.projects}
+        values = {key[2] for key in keys}
+        for project_batch in _batches(project_keys):
+            query = self.db.query(model.id, model.project_id, getattr(model, column)).filter(
+                model.project_id.in_(project_batch), getattr(model, column).in_(values)
+            ).order_by(model.id)
+            for test_id, project_id, value in query:
+                known.setdefault(project_keys[project_id] + (value,), test_id)
+        return known
+
+    def parent_project(self, entity, index, row):
+        project_id = self.projects.get((row["device"], row["project"]))
+        if project_id is None:
+            self.fail(entity, index, f"Project {row['project']!r} of device {row['device']!r} not found")
+        return project_id
+
+    # Entities, in IMPORT_ORDER
+
+    def import_devices(self, rows):
+        valid = self.validate("devices", rows)
+        self.load_devices(row["name"] for _, row in valid)
+        new, seen = [], set()
+        for index, row in valid:
+            if row["name"] in seen:
+                self.fail("devices", index, f"Duplicate device {row['name']!r}")
+            elif row["name"] in self.devices:
+                self.counts["devices"]["existing"] += 1
+            else:
+                new.append(row)
+            seen.add(row["name"])
+        for row, device_id in zip(new, self.insert(Device, new, returning=True)):
+            self.devices[row["name"]] = device_id
+        self.counts["devices"]["created"] += len(new)
+
+    def import_projects(self, rows):
+        valid = self.validate("projects", rows)
+        self.load_projects((row["device"], row["name"]) for _, row in valid)
+        new, seen = [], set()
+        for index, row in valid:
+            key = (row["device"], row["name"])
+            if key in seen:
+                self.fail("projects", index, f"Duplicate project {row['name']!r} of device {row['device']!r}")
+            elif key in self.projects:
+                self.counts["projects"]["existing"] += 1
+            elif row["device"] not in self.devices:
+                self.fail("projects", index, f"Device {row['device']!r} not found")
+            else:
+                new.append((key, dict(
+                    name=row["name"], device_id=self.devices[row["device"]],
+                    inward_design_pressure=row["inward_design_pressure"],
+                    outward_design_pressure=row["outward_design_pressure"],
+                    **({"created_at": row["created_at"]} if row["created_at"] is not None else {}),
+                )))
+            seen.add(key)
+        # Rows with and without created_at need separate statements to keep the column default
+        for dated in (True, False):
+            group = [(key, values) for key, values in new if ("created_at" in values) == dated]
+            for (key, _), project_id in zip(group, self.insert(Project, [values for _, values in group], returning=True)):
+                self.projects[key] = project_id
+                self.new_projects.add(project_id)
+                self.changed_projects.add(project_id)
+        self.counts["projects"]["created"] += len(new)
+
+    def import_keyed_tests(self, entity, model, column, rows, known, fields, returning=False):
+        """Tests unique per project by `column`; existing ones are kept as they are."""
+        valid = self.validate(entity, rows)
+        known = self.load_tests(model, column, ((row["device"], row["project"], row[column]) for _, row in valid), known)
+        new, seen = [], set()
+        for index, row in valid:
+            key = (row["device"], row["project"], row[column])
+            if key in seen:
+                self.fail(entity, index, f"Duplicate {column} {row[column]!r} in project {row['project']!r}")
+            elif key in known:
+                self.counts[entity]["existing"] += 1
+            else:
+                project_id = self.parent_project(entity, index, row)
+                if project_id is not None:
+                    new.append((key, dict({field: row[field] for field in fields}, project_id=project_id)))
+                    self.changed_projects.add(project_id)
+            seen.add(key)
+        ids = self.insert(model, [values for _, values in new], returning)
+        for (key, _), test_id in zip(new, ids):
+            known[key] = test_id
+        self.counts[entity]["created"] += len(new)
+        return ids
+
+    def import_static_tests(self, rows):
+        self.import_keyed_tests(
+            "static_tests", StaticTest, "index", rows, self.static_tests,
+            ("index", "type", "pressure_factor", "pressure", "duration", "finished"), returning=True,
+        )
+
+    def import_cyclic_tests(self, rows):
+        self.import_keyed_tests(
+            "cyclic_tests", CyclicTest, "index", rows, {},
+            ("index", "type", "cycles", "low_pressure", "high_pressure", "completed_cycles", "deflection",
+             "permanent_set", "result", "note", "finished"),
+        )
+
+    def import_missile_impact_tests(self, rows):
+        ids = self.import_keyed_tests(
+            "missile_impact_tests", MissileImpactTest, "missile", rows, self.missile_impact_tests,
+            ("missile", "missile_weight"), returning=True,
+        )
+        self.new_missile_impact_tests.update(ids)
+
+    def import_infiltration_tests(self, rows):
+        valid = self.validate("infiltration_tests", rows)
+        self.load_projects((row["device"], row["project"]) for _, row in valid)
+        new = []
+        for index, row in valid:
+            project_id = self.parent_project("infiltration_tests", index, row)
+            if project_id is None:
+                continue
+            if project_id not in self.new_projects:
+                self.fail("infiltration_tests", index, "Infiltration tests are only imported into new projects")
+                continue
+            new.append(dict(
+                {field: row[field] for field in ("type", "pressure", "duration", "leakage")}, project_id=project_id
+            ))
+            self.changed_projects.add(project_id)
+        self.insert(InfiltrationTest, new, returning=False)
+        self.counts["infiltration_tests"]["created"] += len(new)
+
+    def import_deflections(self, rows):
+        valid = self.validate("deflections", rows)
+        self.load_tests(
+            StaticTest, "index", ((row["device"], row["project"], row["static_test"]) for _, row in valid),
+            self.static_tests,
+        )
+        test_ids = {self.static_tests[key] for key in
+                    ((row["device"], row["project"], row["static_test"]) for _, row in valid) if key in self.static_tests}
+        existing = set()
+        for batch in _batches(test_ids):
+            existing.update(self.db.query(Deflection.static_test_id, Deflection.deflection_gauge).filter(
+                Deflection.static_test_id.in_(batch)
+            ))
+        new = []
+        for index, row in valid:
+            static_test_id = self.static_tests.get((row["device"], row["project"], row["static_test"]))
+            if static_test_id is None:
+                self.fail("deflections", index, f"Static test {row['static_test']} of project {row['project']!r} not found")
+            elif (static_test_id, row["deflection_gauge"]) in existing:
+                self.counts["deflections"]["existing"] += 1
+            else:
+                existing.add((static_test_id, row["deflection_gauge"]))
+                self.changed_projects.add(self.projects[(row["device"], row["project"])])
+                new.append(dict(
+                    {field: row[field] for field in ("deflection_gauge", "max_deflection", "permanent_deflection", "recovery")},
+                    static_test_id=static_test_id,
+                ))
+        self.insert(Deflection, new, returning=False)
+        self.counts["deflections"]["created"] += len(new)
+
+    def import_shots(self, rows):
+        valid = self.validate("shots", rows)
+        self.load_tests(
+            MissileImpactTest, "missile", ((row["device"], row["project"], row["missile"]) for _, row in valid),
+            self.missile_impact_tests,
+        )
+        new = []
+        for index, row in valid:
+            test_id = self.missile_impact_tests.get((row["device"], row["project"], row["missile"]))
+            if test_id is None:
+                self.fail("shots", index, f"Missile impact test {row['missile']!r} of project {row['project']!r} not found")
+            elif test_id not in self.new_missile_impact_tests:
+                self.fail("shots", index, "Shots are only imported into new missile impact tests")
+            else:
+                new.append(dict(
+                    {field: row[field] for field in ("area", "velocity", "result", "note")},
+                    missile_impact_test_id=test_id,
+                ))
+                self.changed_projects.add(self.projects[(row["device"], row["project"])])
+        self.insert(Shot, new, returning=False)
+        self.counts["shots"]["created"] += len(new)
+
+
+def import_records(db, records):
+    """Import {entity: [row, ...]} and return {"counts", "errors", "errors_truncated"}.
+
+    Nothing is committed; the caller commits, or rolls back for a dry run.
+    """
+    unknown = set(records) - set(IMPORT_ORDER)
+    if unknown:
+        raise ValueError(f"Unknown import entities: {', '.join(sorted(unknown))}")
+    run = _ImportRun(db)
+    for entity in IMPORT_ORDER:
+        if records.get(entity):
+            getattr(run, f"import_{entity}")(records[entity])
+    bump_projects(db, run.changed_projects)
+    run.errors.sort(key=lambda error: (IMPORT_ORDER.index(error["entity"]), error["index"]))
+    failed = sum(count["failed"] for count in run.counts.values())
+    return {"counts": run.counts, "errors": run.errors, "errors_truncated": failed > len(run.errors)}
+
+
+def read_csv(text):
+    """Records of a CSV file with a header row; blank cells count as not given."""
+    return [
+        {column.strip(): value.strip() for column, value in row.items() if column and value and value.strip()}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+
+def read_json(text):
+    """{entity: [row, ...]} from a JSON document of that shape."""
+    records = json.loads(text)
+    if not isinstance(records, dict) or not all(isinstance(rows, list) for rows in records.values()):
+        raise ValueError("Expected a JSON object of entity name to list of rows")
+    return records
@@ -0,0 +1,53 @@
+from sqlalchemy.orm import selectinload
+from app.data.models import Device, Project, StaticTest, MissileImpactTest
+from app.data.schema import TreeDepth
+
+
+# Loader options that fetch everything ProjectSchema serializes with one
+# SELECT per relationship level, independent of the number of rows.
+def project_tree_options():
+    return (
+        selectinload(Project.static_tests).selectinload(StaticTest.deflections),
+        selectinload(Project.infiltration_tests),
+        selectinload(Project.missile_impact_tests).selectinload(MissileImpactTest.shots),
+        selectinload(Project.cyclic_tests),
+    )
+
+
+def static_test_tree_options():
+    return (selectinload(StaticTest.deflections),)
+
+
+def device_options(depth, project_criteria=()):
+    if depth == TreeDepth.devices:
+        return ()
+    projects = Device.projects.and_(*project_criteria) if project_criteria else Device.projects
+    if depth == TreeDepth.projects:
+        return (selectinload(projects),)
+    return (selectinload(projects).options(*project_tree_options()),)
+
+
+def project_options(depth):
+    if depth == TreeDepth.full:
+        return project_tree_options()
+    return ()
+
+
+def load_project_tree(db, project_id):
+    return (
+        db.query(Project)
+        .options(*project_tree_options())
+        .populate_existing()
+        .filter(Project.id == project_id)
+        .first()
+    )
+
+
+def load_static_test_tree(db, static_test_id):
+    return (
+        db.query(StaticTest)
+        .options(*static_test_tree_options())
+        .populate_existing()
+        .filter(StaticTest.id == static_test_id)
+        .first()
+    )
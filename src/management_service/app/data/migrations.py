@@ -0,0 +1,191 @@
+"""Versioned schema migrations, applied once per deployment before the workers start.
+
+    python -m app.data.migrations             # apply pending migrations
+    python -m app.data.migrations --wait 60   # first retry connecting for up to 60 s
+    python -m app.data.migrations --status    # list applied and pending migrations
+
+Each migration is a function decorated with @migration; its version is its
+position in MIGRATIONS, so new ones are only ever appended. Each runs in its
+own transaction together with its row in schema_migrations, so a failed one
+leaves nothing half applied and is retried by the next run.
+
+On Postgres the run holds an advisory lock: replicas or a compose migrate
+step starting together apply each migration once, the others wait and then
+find nothing pending. SQLite has a single writer anyway.
+
+Migration 1 creates the current models with create_all, which also adopts
+databases created before migrations existed. A fresh database therefore gets
+every later change from it too, so later migrations must tolerate finding
+their change in place (IF NOT EXISTS and the like).
+
+The API does not migrate at startup unless MIGRATE_ON_STARTUP=1, which is
+meant for development with a single process.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn
+from app.data.models import Base, CyclicTest, Deflection, InfiltrationTest, MissileImpactTest, Project, Shot, StaticTest
+
+logger = logging.getLogger(__name__)
+
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "0").lower() in ("1", "true", "yes")
+# pg_advisory_lock key: any constant no other code locks on
+LOCK_KEY = 4_158_207_301
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+    Column("seconds", Float, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(function):
+    MIGRATIONS.append(function)
+    return function
+
+
+@migration
+def create_models(conn):
+    """Tables of the models, plus the columns databases created before migrations may lack."""
+    Base.metadata.create_all(bind=conn)
+    # create_all only creates missing tables; nullable columns, and NOT NULL
+    # ones with a server default, added to a model before this migration are
+    # added here so older databases keep working
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and (column.nullable or column.server_default is not None):
+                definition = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+
+
+@migration
+def index_test_tables(conn):
+    """Indexes on the tests' parent keys, and one static and one cyclic test per (project, index)."""
+    for model in (StaticTest, CyclicTest):
+        duplicates = conn.execute(
+            select(model.project_id, model.index).group_by(model.project_id, model.index)
+            .having(func.count() > 1).order_by(model.project_id, model.index).limit(10)
+        ).all()
+        if duplicates:
+            # Which of the duplicates holds the real results is for a person to decide
+            raise RuntimeError(
+                f"{model.__tablename__} has several tests at the same (project_id, index), e.g. "
+                f"{', '.join(map(str, map(tuple, duplicates)))}; remove the extra ones and migrate again"
+            )
+    names = {
+        "ix_projects_device_id", "uq_static_tests_project_index", "uq_cyclic_tests_project_index",
+        "ix_deflections_static_test_gauge", "ix_infiltration_tests_project",
+        "ix_missile_impact_tests_project_missile", "ix_shots_missile_impact_test",
+    }
+    for model in (Project, StaticTest, CyclicTest, Deflection, InfiltrationTest, MissileImpactTest, Shot):
+        for index in model.__table__.indexes:
+            if index.name in names:
+                index.create(conn, checkfirst=True)
+
+
+@migration
+def cyclic_test_completed_cycles(conn):
+    """Cycles counted from telemetry, next to the planned `cycles`."""
+    if "completed_cycles" not in {column["name"] for column in inspect(conn).get_columns("cyclic_tests")}:
+        conn.execute(text("ALTER TABLE cyclic_tests ADD COLUMN completed_cycles INTEGER"))
+
+
+def _applied(conn):
+    return {row.version: row for row in conn.execute(select(schema_migrations))}
+
+
+def run_migrations(engine):
+    """Apply the pending migrations; returns the versions applied."""
+    applied_now = []
+    with engine.connect() as conn:
+        locked = conn.dialect.name == "postgresql"
+        if locked:
+            # Session level, so it is held across the per-migration commits below
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+            conn.commit()
+        try:
+            schema_migrations.create(conn, checkfirst=True)
+            conn.commit()
+            applied = _applied(conn)
+            conn.commit()
+            for version, function in enumerate(MIGRATIONS, start=1):
+                if version in applied:
+                    continue
+                started = time.perf_counter()
+                with conn.begin():
+                    function(conn)
+                    conn.execute(schema_migrations.insert().values(
+                        version=version, name=function.__name__, applied_at=datetime.now(timezone.utc),
+                        seconds=time.perf_counter() - started,
+                    ))
+                logger.info("Applied migration %d %s in %.2f s", version, function.__name__, time.perf_counter() - started)
+                applied_now.append(version)
+        finally:
+            if locked:
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+                conn.commit()
+    return applied_now
+
+
+def wait_for_database(engine, timeout):
+    """Retry connecting until the database accepts connections or `timeout` seconds passed."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with engine.connect():
+                return
+        except OperationalError as exc:
+            if time.monotonic() >= deadline:
+                raise
+            logger.info("Database not reachable yet (%s), retrying", exc.orig)
+            time.sleep(1)
+
+
+def status(engine):
+    """(version, name, applied_at or None) of every migration."""
+    with engine.connect() as conn:
+        applied = _applied(conn) if inspect(conn).has_table(schema_migrations.name) else {}
+    return [
+        (version, function.__name__, applied[version].applied_at if version in applied else None)
+        for version, function in enumerate(MIGRATIONS, start=1)
+    ]
+
+
+def main():
+    from app.data.database import get_engine
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wait", type=float, default=0, help="seconds to retry connecting while the database starts")
+    parser.add_argument("--status", action="store_true", help="list migrations instead of applying them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine()
+    wait_for_database(engine, args.wait)
+    if args.status:
+        for version, name, applied_at in status(engine):
+            print(f"{version:4d} {name:40s} {applied_at.isoformat() if applied_at else 'pending'}")
+        return
+    started = time.perf_counter()
+    applied = run_migrations(engine)
+    print(f"Applied {len(applied)} migration(s) in {time.perf_counter() - started:.2f} s, "
+          f"schema at version {len(MIGRATIONS)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,39 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, Boolean, DateTime, LargeBinary, Index
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
 
+# Child collections are ordered by id, so a tree renders the same bytes every
+# time; strong ETags and the row-based renderer in app.data.tree_json rely on it
 class Device(Base):
     __tablename__ = "devices"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    projects = relationship("Project", back_populates="device", cascade="all, delete-orphan")
+    # Bumped with every write to any of its projects, see app.data.versions
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    projects = relationship("Project", back_populates="device", cascade="all, delete-orphan", order_by="Project.id")
 
 class Project(Base):
     __tablename__ = "projects"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    device_id = Column(Integer, ForeignKey('devices.id'), nullable=False)
+    device_id = Column(Integer, ForeignKey('devices.id'), nullable=False, index=True)
     inward_design_pressure = Column(Float, nullable=False)
     outward_design_pressure = Column(Float, nullable=False)
+    # Python-side default so adding the column to an existing table leaves old rows NULL, not "today"
+    created_at = Column(DateTime(timezone=True), nullable=True, default=lambda: datetime.now(timezone.utc))
+    # Bumped with every write to the project or its tests, see app.data.versions
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     device = relationship("Device", back_populates="projects")
-    static_tests = relationship("StaticTest", back_populates="project", cascade="all, delete-orphan")
-    infiltration_tests = relationship("InfiltrationTest", back_populates="project", cascade="all, delete-orphan")
-    missile_impact_tests = relationship("MissileImpactTest", back_populates="project", cascade="all, delete-orphan")
-    cyclic_tests = relationship("CyclicTest", back_populates="project", cascade="all, delete-orphan")
+    static_tests = relationship("StaticTest", back_populates="project", cascade="all, delete-orphan", order_by="StaticTest.id")
+    infiltration_tests = relationship("InfiltrationTest", back_populates="project", cascade="all, delete-orphan",
+                                      order_by="InfiltrationTest.id")
+    missile_impact_tests = relationship("MissileImpactTest", back_populates="project", cascade="all, delete-orphan",
+                                        order_by="MissileImpactTest.id")
+    cyclic_tests = relationship("CyclicTest", back_populates="project", cascade="all, delete-orphan", order_by="CyclicTest.id")
 
 class StaticTest(Base):
     __tablename__ = "static_tests"
@@ -36,7 +47,13 @@ class StaticTest(Base):
     project_id = Column(Integer, ForeignKey('projects.id'))
     project = relationship("Project", back_populates="static_tests")
 
-    deflections = relationship("Deflection", back_populates="static_test", cascade="all, delete-orphan")
+    deflections = relationship("Deflection", back_populates="static_test", cascade="all, delete-orphan", order_by="Deflection.id")
+
+    __table_args__ = (
+        # One test per plan position, enforced by the database under concurrent
+        # writers; also the index of every lookup by project
+        Index("uq_static_tests_project_index", "project_id", "index", unique=True),
+    )
 
 class Deflection(Base):
     __tablename__ = "deflections"
@@ -50,6 +67,10 @@ class Deflection(Base):
     static_test_id = Column(Integer, ForeignKey('static_tests.id'))
     static_test = relationship("StaticTest", back_populates="deflections")
 
+    __table_args__ = (
+        Index("ix_deflections_static_test_gauge", "static_test_id", "deflection_gauge"),
+    )
+
 class InfiltrationTest(Base):
     __tablename__ = "infiltration_tests"
 
@@ -61,6 +82,10 @@ class InfiltrationTest(Base):
     project_id = Column(Integer, ForeignKey('projects.id'))
     project = relationship("Project", back_populates="infiltration_tests")
 
+    __table_args__ = (
+        Index("ix_infiltration_tests_project", "project_id"),
+    )
+
 class MissileImpactTest(Base):
     __tablename__ = "missile_impact_tests"
 
@@ -71,7 +96,11 @@ class MissileImpactTest(Base):
     project_id = Column(Integer, ForeignKey('projects.id'))
     project = relationship("Project", back_populates="missile_impact_tests")
 
-    shots = relationship("Shot", back_populates="missile_impact_test", cascade="all, delete-orphan")
+    shots = relationship("Shot", back_populates="missile_impact_test", cascade="all, delete-orphan", order_by="Shot.id")
+
+    __table_args__ = (
+        Index("ix_missile_impact_tests_project_missile", "project_id", "missile"),
+    )
 
 class Shot(Base):
     __tablename__ = "shots"
@@ -85,6 +114,10 @@ class Shot(Base):
     missile_impact_test_id = Column(Integer, ForeignKey('missile_impact_tests.id'))
     missile_impact_test = relationship("MissileImpactTest", back_populates="shots")
 
+    __table_args__ = (
+        Index("ix_shots_missile_impact_test", "missile_impact_test_id"),
+    )
+
 class CyclicTest(Base):
     __tablename__ = "cyclic_tests"
 
@@ -95,6 +128,8 @@ class CyclicTest(Base):
     cycles = Column(Integer, nullable=False)
     low_pressure = Column(Float, nullable=False)
     high_pressure = Column(Float, nullable=False)
+    # Counted from telemetry; `cycles` is the plan's target
+    completed_cycles = Column(Integer, nullable=True)
     deflection = Column(Float, nullable=True)
     permanent_set = Column(Float, nullable=True)
     result = Column(Boolean, nullable=True)
@@ -102,3 +137,71 @@ class CyclicTest(Base):
 
     project_id = Column(Integer, ForeignKey('projects.id'))
     project = relationship("Project", back_populates="cyclic_tests")
+
+    __table_args__ = (
+        Index("uq_cyclic_tests_project_index", "project_id", "index", unique=True),
+    )
+
+class ActiveTest(Base):
+    __tablename__ = "active_tests"
+
+    # Test currently running on a rig; telemetry from the device is tagged with it
+    device_id = Column(Integer, ForeignKey('devices.id'), primary_key=True)
+    static_test_id = Column(Integer, ForeignKey('static_tests.id'), nullable=True)
+    cyclic_test_id = Column(Integer, ForeignKey('cyclic_tests.id'), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+
+class TelemetrySample(Base):
+    __tablename__ = "telemetry_samples"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    device_id = Column(Integer, nullable=False, index=True)
+    sensor = Column(String, nullable=False)
+    role = Column(String, nullable=True)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+    value = Column(Float, nullable=False)
+    static_test_id = Column(Integer, ForeignKey('static_tests.id'), nullable=True, index=True)
+    cyclic_test_id = Column(Integer, ForeignKey('cyclic_tests.id'), nullable=True, index=True)
+
+class TelemetryChunk(Base):
+    __tablename__ = "telemetry_chunks"
+
+    # Samples of one sensor within one time window, packed as little-endian
+    # float32 arrays: offsets are seconds since start_at
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    device_id = Column(Integer, nullable=False)
+    sensor = Column(String, nullable=False)
+    static_test_id = Column(Integer, ForeignKey('static_tests.id'), nullable=True)
+    cyclic_test_id = Column(Integer, ForeignKey('cyclic_tests.id'), nullable=True)
+    start_at = Column(DateTime(timezone=True), nullable=False)
+    end_at = Column(DateTime(timezone=True), nullable=False)
+    count = Column(Integer, nullable=False)
+    offsets = Column(LargeBinary, nullable=False)
+    values = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ix_telemetry_chunks_static_test", "static_test_id", "sensor", "start_at"),
+        Index("ix_telemetry_chunks_cyclic_test", "cyclic_test_id", "sensor", "start_at"),
+        Index("ix_telemetry_chunks_device", "device_id", "sensor", "start_at"),
+    )
+
+class TelemetryRollup(Base):
+    __tablename__ = "telemetry_rollups"
+
+    # min/max/mean of one sensor over a bucket of `resolution` seconds
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    device_id = Column(Integer, nullable=False)
+    sensor = Column(String, nullable=False)
+    static_test_id = Column(Integer, ForeignKey('static_tests.id'), nullable=True)
+    cyclic_test_id = Column(Integer, ForeignKey('cyclic_tests.id'), nullable=True)
+    resolution = Column(Integer, nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+    mean = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_telemetry_rollups_static_test", "static_test_id", "sensor", "resolution", "bucket_start"),
+        Index("ix_telemetry_rollups_cyclic_test", "cyclic_test_id", "sensor", "resolution", "bucket_start"),
+    )
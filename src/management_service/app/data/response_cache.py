@@ -0,0 +1,304 @@
+"""Read-through cache of rendered device and project responses, shared by the API workers.
+
+Entries are keyed by the request URL and the version of what it reads (see
+app.data.versions), the same key as the response's ETag. A write moves the
+version, so a stale entry can never be served, and a hit costs the one
+version lookup the conditional GET does anyway instead of a graph load and
+serialization.
+
+Two tiers:
+
+- An LRU per worker, bounded in bytes (RESPONSE_CACHE_MB, 0 turns caching off).
+- Optionally a directory shared by the workers (RESPONSE_CACHE_DIR, bounded by
+  RESPONSE_CACHE_SHARED_MB). Hits there are copied into the LRU. It must not
+  outlive the deployment, since a new release may render differently: use a
+  tmpfs or a directory emptied on start.
+
+Version bumps publish the projects and devices they touched: on commit they
+are dropped from this worker's LRU right away, and on Postgres a NOTIFY sent
+in the same transaction makes every other worker drop them too. That only
+frees memory early; correctness never depends on a notification arriving.
+LISTEN needs a session of its own, so behind pgbouncer in transaction mode
+point RESPONSE_CACHE_LISTEN_URL at the database directly.
+"""
+import json
+import logging
+import os
+import select
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "response_cache"
+# NOTIFY payloads are limited to 8000 bytes; larger changes clear everything
+MAX_NOTIFY_IDS = 500
+# Every list across all devices depends on every project
+ALL_DEVICES = ("devices",)
+
+
+class CachedResponse:
+    __slots__ = ("body", "headers", "scopes")
+
+    def __init__(self, body, headers, scopes):
+        self.body = body
+        self.headers = headers
+        # What the response depends on, e.g. ("project", 5)
+        self.scopes = scopes
+
+    @property
+    def size(self):
+        return len(self.body)
+
+
+class SharedDirectoryTier:
+    """Entries as files named by key; the least recently used go once the directory outgrows `max_bytes`."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+            # Hits refresh the mtime the eviction orders by
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(body, meta["headers"], [tuple(scope) for scope in meta["scopes"]])
+
+    def put(self, key, entry):
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(json.dumps({"headers": entry.headers, "scopes": entry.scopes}).encode() + b"\n")
+                f.write(entry.body)
+            # Readers in other workers see the old file or the whole new one
+            os.replace(temporary, path)
+        except OSError as exc:
+            logger.warning("Could not write shared cache entry: %s", exc)
+            return
+        self._written += entry.size
+        # Sweeping scans the directory, so only do it after a tenth of the budget was written
+        if self._written > self.max_bytes // 10:
+            self._written = 0
+            self.evict()
+
+    def evict(self):
+        files = []
+        for item in os.scandir(self.directory):
+            try:
+                stat = item.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, item.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+class ResponseCache:
+    def __init__(self, max_bytes, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        # scope -> keys of the entries that depend on it
+        self._scopes = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        max_bytes = int(float(os.getenv("RESPONSE_CACHE_MB", "64")) * 2**20)
+        shared = None
+        if max_bytes and os.getenv("RESPONSE_CACHE_DIR"):
+            shared = SharedDirectoryTier(
+                os.getenv("RESPONSE_CACHE_DIR"), int(float(os.getenv("RESPONSE_CACHE_SHARED_MB", "512")) * 2**20)
+            )
+        return cls(max_bytes, shared)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self.put(key, entry, shared=False)
+        return entry
+
+    def put(self, key, entry, shared=True):
+        """Cache `entry` under `key`, to be dropped when any of its scopes changes."""
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += entry.size
+            for scope in entry.scopes:
+                self._scopes.setdefault(scope, set()).add(key)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        if shared and self.shared is not None:
+            self.shared.put(key, entry)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.size
+        for scope in entry.scopes:
+            keys = self._scopes.get(scope)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._scopes[scope]
+
+    def invalidate(self, change):
+        """Drop entries depending on a change: {"projects": [ids], "devices": [ids]} or {"all": True}."""
+        with self._lock:
+            self.invalidations += 1
+            if change.get("all"):
+                keys = list(self._entries)
+            else:
+                scopes = [ALL_DEVICES]
+                scopes += [("project", project_id) for project_id in change.get("projects", ())]
+                scopes += [("device", device_id) for device_id in change.get("devices", ())]
+                keys = set().union(*(self._scopes.get(scope, ()) for scope in scopes))
+            for key in keys:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                entries=len(self._entries), size=self._size, max_size=self.max_bytes, shared=self.shared is not None,
+                hits=self.hits, shared_hits=self.shared_hits, misses=self.misses, invalidations=self.invalidations,
+            )
+
+    @contextmanager
+    def listening(self, engine):
+        """Apply other workers' invalidations for the app's lifetime; a no-op off Postgres."""
+        listener = None
+        if self.enabled and engine.dialect.name == "postgresql":
+            listener = InvalidationListener(self, engine)
+            listener.start()
+        try:
+            yield self
+        finally:
+            if listener is not None:
+                listener.stop()
+
+
+class InvalidationListener:
+    """LISTENs on its own connection in a thread and applies every worker's invalidations."""
+
+    def __init__(self, cache, engine, retry_interval=5.0):
+        self.cache = cache
+        # Outside the app's pool: the connection stays checked out for the process lifetime
+        self.engine = create_engine(os.getenv("RESPONSE_CACHE_LISTEN_URL") or engine.url, poolclass=NullPool)
+        self.retry_interval = retry_interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="response-cache-listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
+        self.engine.dispose()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Response cache listener lost its connection")
+            # Whatever changed while not listening is unknown
+            self.cache.clear()
+            self._stopped.wait(self.retry_interval)
+
+    def _listen(self):
+        raw = self.engine.raw_connection()
+        try:
+            connection = raw.driver_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            self.cache.clear()
+            while not self._stopped.is_set():
+                if select.select([connection], [], [], 1.0) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    self.cache.invalidate(json.loads(notification.payload))
+        finally:
+            raw.close()
+
+
+def publish_invalidation(db, project_ids=(), device_ids=()):
+    """Invalidate cached responses of these projects and devices once `db` commits."""
+    change = {"projects": sorted(set(project_ids)), "devices": sorted(set(device_ids))}
+    if len(change["projects"]) + len(change["devices"]) > MAX_NOTIFY_IDS:
+        change = {"all": True}
+    db.info.setdefault("cache_invalidations", []).append(change)
+    if db.get_bind().dialect.name == "postgresql":
+        # Delivered to the listeners only if and when the transaction commits
+        db.execute(sql_select(func.pg_notify(CHANNEL, json.dumps(change))))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # This worker's own LRU, right away, so a client reading its own write never waits for the NOTIFY
+    for change in session.info.pop("cache_invalidations", ()):
+        response_cache.invalidate(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop("cache_invalidations", None)
+
+
+response_cache = ResponseCache.from_env()
@@ -1,4 +1,6 @@
-from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -13,6 +15,25 @@ class DeflectionSchema(DeflectionCreateSchema):
     class Config:
         orm_mode = True
 
+# Batch items: no id creates, id updates the fields given, id + delete removes
+class DeflectionBatchItemSchema(BaseModel):
+    id: Optional[int] = None
+    delete: bool = False
+    deflection_gauge: Optional[int] = None
+    max_deflection: Optional[float] = None
+    permanent_deflection: Optional[float] = None
+    recovery: Optional[float] = None
+
+class BatchItemResultSchema(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str
+    detail: Optional[str] = None
+
+class BatchResultSchema(BaseModel):
+    applied: bool
+    items: List[BatchItemResultSchema]
+
 class StaticTestCreateSchema(BaseModel):
     pressure_factor: str
     pressure: float
@@ -51,6 +72,14 @@ class ShotCreateSchema(BaseModel):
     result: bool
     note: str
     
+class ShotBatchItemSchema(BaseModel):
+    id: Optional[int] = None
+    delete: bool = False
+    area: Optional[float] = None
+    velocity: Optional[float] = None
+    result: Optional[bool] = None
+    note: Optional[str] = None
+
 class ShotSchema(ShotCreateSchema):
     id: int
 
@@ -88,6 +117,7 @@ class CyclicTestSchema(CyclicTestCreateSchema):
     # id: int
     finished: bool
     index: int
+    completed_cycles: Optional[int]
     deflection: Optional[float]
     permanent_set: Optional[float]
     result: Optional[bool]
@@ -96,11 +126,50 @@ class CyclicTestSchema(CyclicTestCreateSchema):
     class Config:
         orm_mode = True
 
+class StaticTestAnalysisSchema(BaseModel):
+    static_test_id: int
+    deflections: List[DeflectionCreateSchema]
+
+class CyclicTestEvaluationSchema(BaseModel):
+    completed_cycles: int
+    samples: int
+    deflection: Optional[float]
+    permanent_set: Optional[float]
+    result: bool
+    test: CyclicTestSchema
+
+class TestPlanSchema(BaseModel):
+    static_tests: List[StaticTestCreateSchema]
+    cyclic_tests: List[CyclicTestUpdateSchema]
+
+class TestPlanCacheStatsSchema(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+
+class ResponseCacheStatsSchema(BaseModel):
+    entries: int
+    size: int
+    max_size: int
+    shared: bool
+    hits: int
+    shared_hits: int
+    misses: int
+    invalidations: int
+
 class ProjectCreateSchema(BaseModel):
     name: str
     inward_design_pressure: float
     outward_design_pressure: float
        
+class ProjectHeaderSchema(ProjectCreateSchema):
+    id: int
+    device_id: int
+
+    class Config:
+        orm_mode = True
+
 class ProjectSchema(ProjectCreateSchema):
     id: int
     device_id: int  # New field added
@@ -121,4 +190,196 @@ class DeviceSchema(DeviceCreateSchema):
     projects: List[ProjectSchema]
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class DeviceSummarySchema(DeviceCreateSchema):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+class DeviceProjectHeadersSchema(DeviceSummarySchema):
+    projects: List[ProjectHeaderSchema]
+
+    class Config:
+        orm_mode = True
+
+
+# Decimation used when raw telemetry exceeds the requested point budget
+class DownsampleMethod(str, Enum):
+    lttb = "lttb"
+    minmax = "minmax"
+
+
+class TelemetrySeriesSchema(BaseModel):
+    sensor: str
+    method: str
+    resolution: Optional[int] = None
+    timestamps: List[float]
+    values: List[float]
+    min: Optional[List[float]] = None
+    max: Optional[List[float]] = None
+
+
+# How much of the device -> project -> test tree a list endpoint returns
+class TreeDepth(str, Enum):
+    devices = "devices"
+    projects = "projects"
+    full = "full"
+
+
+class ReportFormat(str, Enum):
+    html = "html"
+    pdf = "pdf"
+
+
+class ExportKind(str, Enum):
+    projects = "projects"
+    static_tests = "static_tests"
+    cyclic_tests = "cyclic_tests"
+    deflections = "deflections"
+    shots = "shots"
+    telemetry = "telemetry"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+    parquet = "parquet"
+
+
+class ReportJobSchema(BaseModel):
+    key: str
+    format: ReportFormat
+    status: str
+    detail: Optional[str] = None
+    url: Optional[str] = None
+
+
+class DatabaseHealthSchema(BaseModel):
+    mode: str
+    pool_class: str
+    size: Optional[int] = None
+    checked_out: Optional[int] = None
+    idle: Optional[int] = None
+    overflow: Optional[int] = None
+    max_overflow: Optional[int] = None
+
+
+class ActiveTestCreateSchema(BaseModel):
+    static_test_id: Optional[int] = None
+    cyclic_test_id: Optional[int] = None
+
+class ActiveTestSchema(ActiveTestCreateSchema):
+    device_id: int
+    started_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+# Import rows: parents are referenced by natural keys (device name, project
+# name, static test index, missile) since spreadsheets do not know database ids
+class ImportDeviceSchema(BaseModel):
+    name: str
+
+
+class ImportProjectSchema(BaseModel):
+    device: str
+    name: str
+    inward_design_pressure: float
+    outward_design_pressure: float
+    created_at: Optional[datetime] = None
+
+
+class ImportStaticTestSchema(BaseModel):
+    device: str
+    project: str
+    index: int
+    type: str
+    pressure_factor: str
+    pressure: float
+    duration: int
+    finished: bool = True
+
+
+class ImportCyclicTestSchema(BaseModel):
+    device: str
+    project: str
+    index: int
+    type: str
+    cycles: int
+    low_pressure: float
+    high_pressure: float
+    completed_cycles: Optional[int] = None
+    deflection: Optional[float] = None
+    permanent_set: Optional[float] = None
+    result: Optional[bool] = None
+    note: Optional[str] = None
+    finished: bool = True
+
+
+class ImportInfiltrationTestSchema(BaseModel):
+    device: str
+    project: str
+    type: str
+    pressure: float
+    duration: Optional[float] = None
+    leakage: Optional[float] = None
+
+
+class ImportMissileImpactTestSchema(BaseModel):
+    device: str
+    project: str
+    missile: str
+    missile_weight: float
+
+
+class ImportDeflectionSchema(BaseModel):
+    device: str
+    project: str
+    static_test: int
+    deflection_gauge: int
+    max_deflection: float
+    permanent_deflection: float
+    recovery: float
+
+
+class ImportShotSchema(BaseModel):
+    device: str
+    project: str
+    missile: str
+    area: float
+    velocity: float
+    result: bool
+    note: str = ""
+
+
+class ImportEntity(str, Enum):
+    devices = "devices"
+    projects = "projects"
+    static_tests = "static_tests"
+    cyclic_tests = "cyclic_tests"
+    infiltration_tests = "infiltration_tests"
+    missile_impact_tests = "missile_impact_tests"
+    deflections = "deflections"
+    shots = "shots"
+
+
+class ImportCountSchema(BaseModel):
+    created: int = 0
+    existing: int = 0
+    failed: int = 0
+
+
+class ImportErrorSchema(BaseModel):
+    entity: ImportEntity
+    index: int
+    detail: str
+
+
+class ImportResultSchema(BaseModel):
+    applied: bool
+    counts: Dict[ImportEntity, ImportCountSchema]
+    errors: List[ImportErrorSchema]
+    errors_truncated: bool = False
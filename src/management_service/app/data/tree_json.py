@@ -0,0 +1,155 @@
+"""Render device and project trees to JSON straight from column rows.
+
+The schema path loads ORM objects, validates every one of them into a
+pydantic model from attributes and dumps the models. For a device with
+thousands of tests that costs more than the queries. Here each level of the
+tree is one SELECT of exactly the columns its schema serializes, batched over
+the parents' ids like selectinload, and the nested dicts are encoded with
+orjson.
+
+The output is byte for byte what the schemas produce:
+
+- The field names, their order and the nesting are read off the schemas.
+- Children are ordered by id, like the model relationships.
+- Values only get the coercion pydantic would apply (ints into float fields).
+
+Anything the fast path cannot vouch for makes `render` return None, and the
+caller falls back to the schemas. That covers a NULL in a required field,
+where pydantic would fail, and a float of 1e16 or more, which pydantic
+writes with an "e+" exponent and orjson without the "+".
+
+FAST_JSON=0 turns it off; so does orjson not being installed.
+"""
+import os
+import typing
+from functools import lru_cache
+
+from sqlalchemy import select
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+FAST_JSON = os.getenv("FAST_JSON", "1").lower() in ("1", "true", "yes") and orjson is not None
+
+# Parent ids per child SELECT, the same batch size selectinload uses
+BATCH_SIZE = 500
+# From here on pydantic writes 1e+16 where orjson writes 1e16
+_EXPONENT_FROM = 1e16
+
+
+class _Untrusted(Exception):
+    """A row the schema would reject or coerce in a way not reproduced here."""
+
+
+def _is_optional(annotation):
+    return typing.get_origin(annotation) is typing.Union and type(None) in typing.get_args(annotation)
+
+
+class _Plan:
+    """Columns and children one schema serializes from one model."""
+
+    def __init__(self, schema, model):
+        mapper = model.__mapper__
+        self.model = model
+        self.fields = list(schema.model_fields)
+        self.columns, self.floats, self.required, self.children = [], [], [], []
+        for name, field in schema.model_fields.items():
+            relationship = mapper.relationships.get(name)
+            if relationship is not None:
+                (child_schema,) = typing.get_args(field.annotation)
+                [(_, foreign_key)] = relationship.local_remote_pairs
+                self.children.append((name, foreign_key, _Plan(child_schema, relationship.mapper.class_)))
+                continue
+            annotation = field.annotation
+            optional = _is_optional(annotation)
+            if optional:
+                annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+            position = len(self.columns)
+            self.columns.append(getattr(model, name))
+            if annotation is float:
+                self.floats.append(position)
+            if not optional:
+                self.required.append(position)
+
+    def load(self, db, statement_filter, criteria_by_child=None):
+        """Dicts of the rows matching `statement_filter(select(...))`, with their children, in order."""
+        statement = statement_filter(select(self.model.id, *self.columns))
+        ids, items = self._items(db.execute(statement))
+        self._load_children(db, ids, items, criteria_by_child or {})
+        return ids, items
+
+    def _items(self, rows, keyed_by=None):
+        names = [column.key for column in self.columns]
+        child_names = [name for name, _, _ in self.children]
+        floats, required = self.floats, self.required
+        ids, items = [], []
+        for row in rows:
+            if keyed_by is None:
+                row_id, *values = row
+            else:
+                row_id, parent_id, *values = row
+            for position in required:
+                if values[position] is None:
+                    raise _Untrusted
+            for position in floats:
+                value = values[position]
+                if value is None:
+                    continue
+                if value.__class__ is not float:
+                    value = values[position] = float(value)
+                if not -_EXPONENT_FROM < value < _EXPONENT_FROM:
+                    raise _Untrusted
+            item = dict.fromkeys(self.fields)
+            item.update(zip(names, values))
+            for name in child_names:
+                item[name] = []
+            ids.append(row_id)
+            items.append(item if keyed_by is None else (parent_id, item))
+        return ids, items
+
+    def _load_children(self, db, ids, items, criteria_by_child):
+        by_id = dict(zip(ids, items))
+        for name, foreign_key, plan in self.children:
+            child_ids, child_items = [], []
+            criteria = criteria_by_child.get(name, ())
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = ids[start:start + BATCH_SIZE]
+                statement = (
+                    select(plan.model.id, foreign_key, *plan.columns)
+                    .where(foreign_key.in_(batch), *criteria)
+                    .order_by(plan.model.id)
+                )
+                batch_ids, batch_items = plan._items(db.execute(statement), keyed_by=foreign_key)
+                child_ids.extend(batch_ids)
+                for parent_id, item in batch_items:
+                    by_id[parent_id][name].append(item)
+                    child_items.append(item)
+            plan._load_children(db, child_ids, child_items, {})
+
+
+@lru_cache(maxsize=None)
+def _plan(schema, model):
+    return _Plan(schema, model)
+
+
+def render(db, schema, model, statement_filter=lambda statement: statement, criteria_by_child=None, many=True):
+    """(ids, JSON bytes) of `schema` for the rows of `model` that `statement_filter` selects, or None.
+
+    `statement_filter` adds the WHERE, ORDER BY and LIMIT to a select() of the
+    serialized columns; `criteria_by_child` filters a relationship, like
+    `Device.projects.and_(...)` does for the schema path. Without `many` the
+    first row renders as a single object. None means use the schemas instead.
+    """
+    if not FAST_JSON:
+        return None
+    try:
+        ids, items = _plan(schema, model).load(db, statement_filter, criteria_by_child)
+    except _Untrusted:
+        return None
+    if not many:
+        if not items:
+            return None
+        items = items[0]
+    return ids, orjson.dumps(items)
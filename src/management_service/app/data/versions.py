@@ -0,0 +1,79 @@
+"""Version counters of projects and devices, for ETags and conditional GETs.
+
+Every write to a project or anything in its tree bumps the project's version
+and its device's, in the same transaction as the write, so a version never
+changes without the data changing and a rolled back write bumps nothing.
+A device's version therefore moves whenever any of its projects does, and
+device-scoped lists are validated with one primary key lookup.
+
+Readers must look the version up before loading the data: a write landing in
+between then only costs the client one needless refetch, where the other
+order could tag new data with an old version, or old data with the new one.
+"""
+from sqlalchemy import func, select, update
+
+from app.data.models import Device, Project
+from app.data.response_cache import publish_invalidation
+
+# Ids per UPDATE ... WHERE id IN (...)
+BATCH_SIZE = 1_000
+
+
+def bump_projects(db, project_ids):
+    """Bump `project_ids`, a list of ids or a SELECT of them, and their devices."""
+    if isinstance(project_ids, (list, tuple, set)):
+        project_ids = sorted(project_ids)
+        for start in range(0, len(project_ids), BATCH_SIZE):
+            _bump(db, project_ids[start:start + BATCH_SIZE])
+    else:
+        _bump(db, project_ids)
+
+
+def _bump(db, project_ids):
+    if isinstance(project_ids, list) and not project_ids:
+        return
+    # Projects before devices, the same order everywhere, so concurrent writers cannot deadlock
+    bumped = db.execute(
+        update(Project).where(Project.id.in_(project_ids)).values(version=Project.version + 1)
+        .returning(Project.id, Project.device_id),
+        execution_options={"synchronize_session": False},
+    ).all()
+    if bumped:
+        device_ids = sorted({device_id for _, device_id in bumped})
+        _bump_devices(db, device_ids)
+        publish_invalidation(db, [project_id for project_id, _ in bumped], device_ids)
+
+
+def _bump_devices(db, device_ids):
+    db.execute(
+        update(Device).where(Device.id.in_(device_ids)).values(version=Device.version + 1),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def bump_devices(db, device_ids):
+    """Bump devices whose project list changed, e.g. by adding projects."""
+    device_ids = sorted(device_ids)
+    _bump_devices(db, device_ids)
+    publish_invalidation(db, device_ids=device_ids)
+
+
+def project_version(db, project_id):
+    """Version of the project, or None if it does not exist."""
+    return db.scalar(select(Project.version).where(Project.id == project_id))
+
+
+def device_version(db, device_id):
+    """Version covering the device and all of its projects, or None if it does not exist."""
+    return db.scalar(select(Device.version).where(Device.id == device_id))
+
+
+def devices_version(db):
+    """Version covering every device and project.
+
+    Versions only grow and devices are never deleted, so the device count and
+    the sum of their versions together change with every write. One aggregate
+    over the devices table, which has a row per rig.
+    """
+    count, total = db.execute(select(func.count(Device.id), func.coalesce(func.sum(Device.version), 0))).one()
+    return f"{count}.{total}"
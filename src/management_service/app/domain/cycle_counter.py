@@ -0,0 +1,76 @@
+class CycleEvaluator:
+    """Counts load cycles and tracks gauge deflection for one cyclic test in constant memory.
+
+    A cycle is counted when pressure rises past the upper threshold and then
+    falls back below the lower one. The thresholds sit `hysteresis` of the
+    test's pressure range inside the low/high pressures, so sensor noise around
+    either level does not produce extra cycles. Pressures are compared by
+    magnitude, so suction (outward) tests count the same way as inward ones.
+
+    Deflection is measured per gauge from its first reading. The peak is the
+    largest displacement seen; the permanent set is the displacement of the
+    last reading taken while the specimen was unloaded (below the lower
+    threshold), i.e. after the final cycle once the rig has released pressure.
+    """
+
+    def __init__(self, low_pressure, high_pressure, target_cycles, hysteresis=0.1, max_permanent_set=None):
+        low, high = sorted((abs(low_pressure), abs(high_pressure)))
+        band = (high - low) * hysteresis
+        self.upper = high - band
+        self.lower = low + band
+        self.target_cycles = target_cycles
+        self.max_permanent_set = max_permanent_set
+        self.cycles = 0
+        self.samples = 0
+        self._loaded = False
+        self._unloaded = True
+        # gauge -> [baseline, peak, permanent set]
+        self._gauges = {}
+
+    def add_pressure(self, pressure):
+        pressure = abs(pressure)
+        self.samples += 1
+        if self._loaded:
+            if pressure <= self.lower:
+                self._loaded = False
+                self.cycles += 1
+        elif pressure >= self.upper:
+            self._loaded = True
+        self._unloaded = pressure <= self.lower
+
+    def add_deflection(self, gauge, value):
+        state = self._gauges.get(gauge)
+        if state is None:
+            self._gauges[gauge] = [value, 0.0, 0.0]
+            return
+        displacement = value - state[0]
+        if abs(displacement) > abs(state[1]):
+            state[1] = displacement
+        if self._unloaded:
+            state[2] = displacement
+
+    @property
+    def deflection(self):
+        """Largest peak displacement over all gauges, or None without gauge data."""
+        return max((state[1] for state in self._gauges.values()), key=abs, default=None)
+
+    @property
+    def permanent_set(self):
+        return max((state[2] for state in self._gauges.values()), key=abs, default=None)
+
+    @property
+    def result(self):
+        if self.cycles < self.target_cycles:
+            return False
+        if self.max_permanent_set is not None and self.permanent_set is not None:
+            return abs(self.permanent_set) <= self.max_permanent_set
+        return True
+
+    def summary(self):
+        return dict(
+            completed_cycles=self.cycles,
+            samples=self.samples,
+            deflection=self.deflection,
+            permanent_set=self.permanent_set,
+            result=self.result,
+        )
@@ -0,0 +1,56 @@
+import numpy as np
+
+# Fractions of the test pressure that count as "at load" and "unloaded"
+LOADED_FRACTION = 0.9
+UNLOADED_FRACTION = 0.1
+# Permanent set is averaged over the last seconds of the unloaded tail
+SETTLE_SECONDS = 5.0
+
+
+def analyze_static_test(t, pressure, gauge_series, target_pressure, duration):
+    """Max deflection, permanent set and recovery of every gauge of one static test.
+
+    `t`/`pressure` is the sorted pressure series and `gauge_series` a list of
+    (timestamps, values) per gauge. Gauges are resampled onto the pressure
+    timestamps and reduced together as one gauges x samples matrix.
+
+    The hold window starts when pressure first reaches LOADED_FRACTION of the
+    target and lasts `duration` seconds. Displacements are taken from the median
+    unloaded reading before the hold; max deflection is the largest one inside
+    the hold, permanent set the median over the last SETTLE_SECONDS unloaded
+    after it, and recovery the percentage of the max deflection recovered.
+    Medians keep the few ramp samples inside the unloaded band from skewing
+    either reference.
+
+    Returns three arrays, one entry per gauge, or None if the load was never
+    reached.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    pressure = np.abs(np.asarray(pressure, dtype=np.float64))
+    target = abs(target_pressure)
+    loaded = pressure >= LOADED_FRACTION * target
+    if not len(t) or not gauge_series or not loaded.any():
+        return None
+
+    start = t[np.argmax(loaded)]
+    end = start + duration
+    deflections = np.vstack([np.interp(t, gauge_t, gauge_v) for gauge_t, gauge_v in gauge_series])
+
+    unloaded = pressure <= UNLOADED_FRACTION * target
+    before = unloaded & (t < start)
+    baseline = np.median(deflections[:, before], axis=1) if before.any() else deflections[:, 0]
+    displacement = deflections - baseline[:, None]
+
+    hold = displacement[:, (t >= start) & (t <= end)]
+    peaks = hold[np.arange(len(hold)), np.abs(hold).argmax(axis=1)]
+
+    after = unloaded & (t > end)
+    if after.any():
+        after &= t >= t[after].max() - SETTLE_SECONDS
+        permanent = np.median(displacement[:, after], axis=1)
+    else:
+        permanent = displacement[:, -1]
+
+    safe_peaks = np.where(peaks == 0, 1.0, peaks)
+    recovery = np.where(peaks == 0, 100.0, (1 - permanent / safe_peaks) * 100)
+    return peaks, permanent, recovery
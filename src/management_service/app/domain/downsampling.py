@@ -0,0 +1,101 @@
+import numpy as np
+
+# Rounds of evaluating changed LTTB buckets together before following the rest one by one,
+# when buckets are narrower than LTTB_VECTOR_WIDTH samples; a few wide buckets are cheaper one by one
+LTTB_VECTOR_ROUNDS = 8
+LTTB_VECTOR_WIDTH = 64
+
+
+def lttb(t, v, points):
+    """Largest-Triangle-Three-Buckets: keep `points` samples that preserve the visual shape.
+
+    `t` must be sorted. First and last samples are always kept.
+
+    Each bucket's pick depends on the pick before it. All buckets are
+    evaluated at once against the current picks of their predecessors, then
+    only those whose predecessor changed are evaluated again, until nothing
+    changes. That fixed point is exactly the sequential result. Most changes
+    settle in a few rounds; those still cascading after LTTB_VECTOR_ROUNDS,
+    and all buckets when they are wide, are followed one bucket at a time,
+    skipping buckets whose predecessor kept its pick.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    n = len(t)
+    if points >= n or points < 3:
+        return t, v
+
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # Average of the next bucket (the last sample, after the last bucket) is the third vertex of the triangle
+    next_counts = np.diff(np.r_[edges[1:], n])
+    next_t = np.add.reduceat(t, edges[1:]) / next_counts
+    next_v = np.add.reduceat(v, edges[1:]) / next_counts
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    # First guess: every bucket's predecessor picked its first sample
+    picks = selected[1:-1]
+    picks[:] = starts
+    todo = np.arange(len(starts))
+    width = int((ends - starts).max())
+    rounds = LTTB_VECTOR_ROUNDS if width < LTTB_VECTOR_WIDTH else 0
+    if rounds:
+        # Samples of every bucket in a row, padded with the bucket's first sample
+        members = starts[:, None] + np.arange(width)
+        members = np.where(members < ends[:, None], members, starts[:, None])
+    for _ in range(rounds):
+        if not len(todo):
+            break
+        previous = np.where(todo > 0, picks[todo - 1], 0)
+        candidates = members[todo]
+        t_prev, v_prev = t[previous][:, None], v[previous][:, None]
+        area = np.abs(
+            (t_prev - next_t[todo][:, None]) * (v[candidates] - v_prev)
+            - (t_prev - t[candidates]) * (next_v[todo][:, None] - v_prev)
+        )
+        chosen = candidates[np.arange(len(todo)), np.argmax(area, axis=1)]
+        changed = todo[chosen != picks[todo]]
+        picks[todo] = chosen
+        todo = changed[changed + 1 < len(starts)] + 1
+
+    stale = np.zeros(len(starts) + 1, dtype=bool)
+    stale[todo] = True
+    for bucket in range(todo[0], len(starts)) if len(todo) else ():
+        if not stale[bucket]:
+            continue
+        start, end = starts[bucket], ends[bucket]
+        previous = picks[bucket - 1] if bucket else 0
+        area = np.abs(
+            (t[previous] - next_t[bucket]) * (v[start:end] - v[previous])
+            - (t[previous] - t[start:end]) * (next_v[bucket] - v[previous])
+        )
+        chosen = start + int(np.argmax(area))
+        stale[bucket + 1] |= chosen != picks[bucket]
+        picks[bucket] = chosen
+    return t[selected], v[selected]
+
+
+def minmax(t, v, points):
+    """Keep the minimum and maximum of `points // 2` equal-width time buckets.
+
+    Cheaper than LTTB and never hides a peak, which is what pressure plots need
+    when zoomed out over a whole cyclic test.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    n = len(t)
+    buckets = max(1, points // 2)
+    if n <= points:
+        return t, v
+
+    bucket_of = np.minimum(((t - t[0]) / (t[-1] - t[0] or 1) * buckets).astype(np.int64), buckets - 1)
+    starts = np.flatnonzero(np.r_[True, bucket_of[1:] != bucket_of[:-1]])
+    ends = np.r_[starts[1:], n]
+    keep = []
+    for start, end in zip(starts, ends):
+        segment = v[start:end]
+        low, high = start + int(np.argmin(segment)), start + int(np.argmax(segment))
+        keep.extend(sorted({low, high}))
+    keep = np.asarray(keep, dtype=np.int64)
+    return t[keep], v[keep]
@@ -0,0 +1,67 @@
+import numpy as np
+from app.domain.cyclic_test_pressure_calculator import CyclicTestPressureCalculator
+from app.domain.static_test_pressure_calculator import StaticTestPressureCalculator
+
+
+class TestProtocol:
+    """Factor tables of one test standard revision.
+
+    Row `i` of every table describes the test with index `i`; `*_inward` says
+    whether that test is loaded with the inward or the outward design pressure.
+    """
+
+    def __init__(self, name, version, static_pressure_factors, static_inward, static_duration,
+                 cyclic_high_factors, cyclic_low_factors, cyclic_cycles, cyclic_inward):
+        self.name = name
+        self.version = version
+        self.static_pressure_factors = np.asarray(static_pressure_factors, dtype=np.float64)
+        self.static_inward = np.asarray(static_inward, dtype=bool)
+        self.static_duration = np.broadcast_to(np.asarray(static_duration, dtype=np.int64), self.static_inward.shape)
+        self.cyclic_high_factors = np.asarray(cyclic_high_factors, dtype=np.float64)
+        self.cyclic_low_factors = np.asarray(cyclic_low_factors, dtype=np.float64)
+        self.cyclic_cycles = np.asarray(cyclic_cycles, dtype=np.int64)
+        self.cyclic_inward = np.asarray(cyclic_inward, dtype=bool)
+
+    @property
+    def key(self):
+        return self.name, self.version
+
+    @property
+    def static_test_count(self):
+        return len(self.static_inward)
+
+    @property
+    def cyclic_test_count(self):
+        return len(self.cyclic_inward)
+
+
+def _legacy_protocol():
+    # Unrolls the per-index lookups of the original calculators into tables
+    static = StaticTestPressureCalculator.STATIC_PRESSURE_FACTOR
+    high = CyclicTestPressureCalculator.HIGH_PRESSURE_FACTORS
+    low = CyclicTestPressureCalculator.LOW_PRESSURE_FACTORS
+    return TestProtocol(
+        name="default",
+        version=1,
+        static_pressure_factors=[static[abs(j - 3) - 1] for j in range(6)],
+        static_inward=[j < 3 for j in range(6)],
+        static_duration=30,
+        cyclic_high_factors=[high[abs(i - 4) - 1] for i in range(8)],
+        cyclic_low_factors=[low[abs(i - 4) - 1] for i in range(8)],
+        cyclic_cycles=CyclicTestPressureCalculator.CYCLE_COUNT,
+        cyclic_inward=[i < 4 for i in range(8)],
+    )
+
+
+DEFAULT_PROTOCOL = _legacy_protocol()
+PROTOCOLS = {DEFAULT_PROTOCOL.name: DEFAULT_PROTOCOL}
+
+
+def register_protocol(protocol):
+    PROTOCOLS[protocol.name] = protocol
+
+
+def get_protocol(name=None):
+    if name is None:
+        return DEFAULT_PROTOCOL
+    return PROTOCOLS[name]
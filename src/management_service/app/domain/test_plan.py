@@ -0,0 +1,58 @@
+from app.domain.test_plan_engine import TestPlanEngine
+
+
+class TestPlan:
+    STATIC_PRESSURE_FACTOR = 'Structural Pressure'
+
+    @staticmethod
+    def _direction(inward):
+        return "inward" if inward else "outward"
+
+    @staticmethod
+    def static_tests_many(inward_design_pressures, outward_design_pressures, protocol=None):
+        plan = TestPlanEngine(protocol).static_plan(inward_design_pressures, outward_design_pressures)
+        return [
+            [
+                dict(
+                    pressure_factor=TestPlan.STATIC_PRESSURE_FACTOR,
+                    pressure=p,
+                    duration=d,
+                    type=TestPlan._direction(inward),
+                    index=j,
+                    finished=False,
+                )
+                for j, (p, d, inward) in enumerate(zip(pressures, durations, directions))
+            ]
+            for pressures, durations, directions in zip(
+                plan["pressure"].tolist(), plan["duration"].tolist(), plan["inward"].tolist()
+            )
+        ]
+
+    @staticmethod
+    def cyclic_tests_many(inward_design_pressures, outward_design_pressures, protocol=None):
+        plan = TestPlanEngine(protocol).cyclic_plan(inward_design_pressures, outward_design_pressures)
+        return [
+            [
+                dict(
+                    type=TestPlan._direction(inward),
+                    cycles=c,
+                    low_pressure=l,
+                    high_pressure=h,
+                    index=i,
+                    finished=False,
+                )
+                for i, (h, l, c, inward) in enumerate(zip(highs, lows, cycles, directions))
+            ]
+            for highs, lows, cycles, directions in zip(
+                plan["high_pressure"].tolist(), plan["low_pressure"].tolist(),
+                plan["cycles"].tolist(), plan["inward"].tolist(),
+            )
+        ]
+
+    @staticmethod
+    def static_tests(inward_design_pressure, outward_design_pressure, protocol=None):
+        return TestPlan.static_tests_many([inward_design_pressure], [outward_design_pressure], protocol)[0]
+
+    @staticmethod
+    def cyclic_tests(inward_design_pressure, outward_design_pressure, protocol=None):
+        return TestPlan.cyclic_tests_many([inward_design_pressure], [outward_design_pressure], protocol)[0]
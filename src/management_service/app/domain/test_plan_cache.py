@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from threading import Lock
+from app.domain.protocols import get_protocol
+from app.domain.test_plan import TestPlan
+
+
+class TestPlanCache:
+    """LRU cache of generated test plans keyed by (protocol, version, inward, outward).
+
+    Labs reuse a handful of design pressures, so creating, updating and
+    previewing projects mostly hit the cache. Cached rows are shared: callers
+    must copy a row before changing it.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, inward_design_pressure, outward_design_pressure, protocol=None):
+        protocol = protocol or get_protocol()
+        key = protocol.key + (float(inward_design_pressure), float(outward_design_pressure))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+
+        plan = (
+            tuple(TestPlan.static_tests(inward_design_pressure, outward_design_pressure, protocol)),
+            tuple(TestPlan.cyclic_tests(inward_design_pressure, outward_design_pressure, protocol)),
+        )
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(size=len(self._plans), maxsize=self.maxsize, hits=self.hits, misses=self.misses)
+
+
+test_plan_cache = TestPlanCache()
@@ -0,0 +1,38 @@
+import numpy as np
+from app.domain.protocols import get_protocol
+
+
+class TestPlanEngine:
+    """Evaluates a protocol's factor tables for many projects at once.
+
+    Every plan is a dict of 2-D arrays shaped (projects, tests), computed with
+    one broadcast multiply per column instead of a Python loop per test.
+    """
+
+    def __init__(self, protocol=None):
+        self.protocol = protocol or get_protocol()
+
+    @staticmethod
+    def _design_pressures(inward, outward, use_inward):
+        inward = np.atleast_1d(np.asarray(inward, dtype=np.float64))
+        outward = np.atleast_1d(np.asarray(outward, dtype=np.float64))
+        return np.where(use_inward[np.newaxis, :], inward[:, np.newaxis], outward[:, np.newaxis])
+
+    def static_plan(self, inward, outward):
+        protocol = self.protocol
+        design = self._design_pressures(inward, outward, protocol.static_inward)
+        return {
+            "pressure": design * protocol.static_pressure_factors,
+            "duration": np.broadcast_to(protocol.static_duration, design.shape),
+            "inward": np.broadcast_to(protocol.static_inward, design.shape),
+        }
+
+    def cyclic_plan(self, inward, outward):
+        protocol = self.protocol
+        design = self._design_pressures(inward, outward, protocol.cyclic_inward)
+        return {
+            "high_pressure": design * protocol.cyclic_high_factors,
+            "low_pressure": design * protocol.cyclic_low_factors,
+            "cycles": np.broadcast_to(protocol.cyclic_cycles, design.shape),
+            "inward": np.broadcast_to(protocol.cyclic_inward, design.shape),
+        }
@@ -0,0 +1,228 @@
+"""Per-request timing: wall time, DB time and statements, serialization time and response size.
+
+`InstrumentationMiddleware` opens a RequestStats for every HTTP request in a
+context variable. Engine events add each statement's time to it and
+`InstrumentedRoute` marks when the endpoint returned, so everything after
+that (response_model validation, which is where orm_mode lazy loads land,
+plus JSON rendering) counts as serialization. Lazy loads still count as DB
+time as well; `Server-Timing` shows both.
+
+Worker startup is recorded too: `app_startup_seconds` by phase, and a log line.
+
+Metrics are Prometheus histograms labelled by method and route template.
+Under gunicorn every worker has its own; set PROMETHEUS_MULTIPROC_DIR to an
+empty directory shared by the workers to aggregate them.
+"""
+import contextvars
+import inspect
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from sqlalchemy import event
+
+from app.data.database import DatabaseRoute
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LABELS = ("method", "route")
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", LABELS + ("status",))
+DURATION = Histogram("http_request_duration_seconds", "Wall time per request", LABELS, buckets=LATENCY_BUCKETS)
+DB_DURATION = Histogram("http_request_db_seconds", "Time in SQL statements per request", LABELS, buckets=LATENCY_BUCKETS)
+DB_STATEMENTS = Histogram("http_request_db_statements", "SQL statements per request", LABELS, buckets=STATEMENT_BUCKETS)
+SERIALIZATION = Histogram(
+    "http_request_serialization_seconds", "Time from endpoint return to rendered response", LABELS,
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size", LABELS, buckets=SIZE_BUCKETS)
+# import: app.main and everything it imports; lifespan: startup hooks;
+# process: from the worker process starting (interpreter, gunicorn fork) to serving
+STARTUP = Gauge(
+    "app_startup_seconds", "Time for a worker to start serving, by phase", ("phase",), multiprocess_mode="mostrecent"
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.statements = 0
+        self.endpoint_done = None
+        self.handler_done = None
+        self.response_bytes = 0
+        # Threads doing this request's work; the sampling profiler reads them
+        self.threads = {threading.get_ident()}
+        self.samples = None
+
+    @property
+    def serialization_seconds(self):
+        if self.endpoint_done is None or self.handler_done is None:
+            return 0.0
+        return max(0.0, self.handler_done - self.endpoint_done)
+
+    def server_timing(self):
+        elapsed = (time.perf_counter() - self.started) * 1000
+        return (
+            f'app;dur={elapsed:.1f}, db;dur={self.db_seconds * 1000:.1f};desc="{self.statements} statements", '
+            f"serialize;dur={self.serialization_seconds * 1000:.1f}"
+        )
+
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is not None and conn.info.get("query_started"):
+        stats.db_seconds += time.perf_counter() - conn.info["query_started"].pop()
+        stats.statements += 1
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _timed_endpoint(endpoint):
+    # Marks when the endpoint itself returned; sync endpoints keep running in the threadpool
+    if inspect.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def timed(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _endpoint_done()
+    else:
+        @wraps(endpoint)
+        def timed(*args, **kwargs):
+            stats = current_request.get()
+            if stats is not None:
+                stats.threads.add(threading.get_ident())
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _endpoint_done()
+    return timed
+
+
+def _endpoint_done():
+    stats = current_request.get()
+    if stats is not None:
+        stats.endpoint_done = time.perf_counter()
+
+
+class InstrumentedRoute(DatabaseRoute):
+    """DatabaseRoute that also records where the endpoint ends and serialization begins."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            try:
+                return await handler(request)
+            finally:
+                stats = current_request.get()
+                if stats is not None:
+                    stats.handler_done = time.perf_counter()
+
+        return timed_handler
+
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware, so streaming responses and context variables keep working."""
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        if self.profiler is not None:
+            self.profiler.begin(stats)
+
+        async def instrumented_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", stats.server_timing().encode()),
+                    # Lets the UI on another origin read the timings in its devtools
+                    (b"timing-allow-origin", b"*"),
+                ]
+            elif message["type"] == "http.response.body":
+                stats.response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, instrumented_send)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - stats.started
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"))
+            REQUESTS.labels(*labels, str(status)).inc()
+            DURATION.labels(*labels).observe(elapsed)
+            DB_DURATION.labels(*labels).observe(stats.db_seconds)
+            DB_STATEMENTS.labels(*labels).observe(stats.statements)
+            SERIALIZATION.labels(*labels).observe(stats.serialization_seconds)
+            RESPONSE_SIZE.labels(*labels).observe(stats.response_bytes)
+            if self.profiler is not None:
+                self.profiler.end(stats, labels, elapsed)
+
+
+def process_age():
+    """Seconds since this process started, or None where /proc is not available."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesised command name, which may contain spaces
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - started_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+def record_startup(import_seconds, lifespan_seconds):
+    """Export and log how long this worker took to become ready."""
+    STARTUP.labels("import").set(import_seconds)
+    STARTUP.labels("lifespan").set(lifespan_seconds)
+    age = process_age()
+    if age is not None:
+        STARTUP.labels("process").set(age)
+    logger.info(
+        "Worker %d ready: import %.2f s, lifespan %.2f s, since process start %s",
+        os.getpid(), import_seconds, lifespan_seconds, "unknown" if age is None else f"{age:.2f} s",
+    )
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus exposition for this process or all workers."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,93 @@
+"""Opt-in sampling profiler that keeps flamegraphs of slow requests.
+
+A background thread samples the stacks of the threads serving in-flight
+requests every `interval` seconds. That is the event loop thread, plus the
+threadpool thread of a sync endpoint. A request that takes longer than the
+threshold gets its samples written as folded stacks, one "frame;frame;... count"
+line per stack, which flamegraph.pl and speedscope read directly. Samples
+of the event loop thread can include other requests running concurrently
+on it.
+
+Enabled by PROFILE_SLOW_REQUESTS_MS; PROFILE_DIR and PROFILE_INTERVAL_MS tune it.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+def _stack(frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class SamplingProfiler:
+    def __init__(self, threshold_ms, output_dir, interval=0.005):
+        self.threshold = threshold_ms / 1000
+        self.output_dir = output_dir
+        self.interval = interval
+        self._active = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def begin(self, stats):
+        stats.samples = Counter()
+        with self._lock:
+            self._active.add(stats)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def end(self, stats, labels, elapsed):
+        with self._lock:
+            self._active.discard(stats)
+        if elapsed >= self.threshold and stats.samples:
+            try:
+                self._dump(stats.samples, labels, elapsed)
+            except OSError as exc:
+                logger.warning("Could not write profile: %s", exc)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for stats in active:
+                for thread_id in list(stats.threads):
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != me:
+                        stats.samples[_stack(frame)] += 1
+
+    def _dump(self, samples, labels, elapsed):
+        os.makedirs(self.output_dir, exist_ok=True)
+        method, route = labels
+        name = re.sub(r"[^A-Za-z0-9]+", "_", f"{method}_{route}").strip("_")
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%dT%H%M%S')}_{int(elapsed * 1000)}ms_{name}.folded")
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info("Slow request %s %s took %.0f ms; profile in %s", method, route, elapsed * 1000, path)
+
+
+def profiler_from_env():
+    threshold = os.getenv("PROFILE_SLOW_REQUESTS_MS")
+    if not threshold:
+        return None
+    return SamplingProfiler(
+        float(threshold),
+        os.getenv("PROFILE_DIR", "/tmp/profiles"),
+        interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+    )
@@ -0,0 +1,109 @@
+"""Report job queue: renders in a process pool into a content-addressed cache directory.
+
+A report's file name is its content key, so the cache is shared by every API
+worker. Job state lives next to it as marker files ("<file>.pending" while
+rendering, "<file>.error" after a failure) for the same reason.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.reports.render import render_to_file
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMATS = ("html", "pdf")
+
+
+class ReportQueue:
+    def __init__(self, cache_dir, workers=2, job_timeout=300.0):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        # A pending marker older than this belongs to a worker that died
+        self.job_timeout = job_timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def path(self, key, report_format):
+        return os.path.join(self.cache_dir, f"{key}.{report_format}")
+
+    def status(self, key, report_format):
+        """("done" | "pending" | "failed" | None, error detail)."""
+        path = self.path(key, report_format)
+        if os.path.exists(path):
+            return "done", None
+        try:
+            if time.time() - os.path.getmtime(f"{path}.pending") < self.job_timeout:
+                return "pending", None
+        except OSError:
+            pass
+        try:
+            with open(f"{path}.error") as f:
+                return "failed", f.read()
+        except OSError:
+            return None, None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that runs an event loop and DB pools is not safe
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def submit(self, key, report_format, load_data):
+        """Queue rendering unless the report is cached or already rendering; returns the status.
+
+        `load_data` is only called when a render is actually queued, so a
+        cache hit never pays for loading telemetry plots.
+        """
+        status, _ = self.status(key, report_format)
+        if status in ("done", "pending"):
+            return status
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(key, report_format)
+        with open(f"{path}.pending", "w"):
+            pass
+        try:
+            os.remove(f"{path}.error")
+        except OSError:
+            pass
+        try:
+            data = load_data()
+            try:
+                future = self._executor().submit(render_to_file, data, key, report_format, path)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool once
+                self.shutdown()
+                future = self._executor().submit(render_to_file, data, key, report_format, path)
+        except Exception:
+            os.remove(f"{path}.pending")
+            raise
+        future.add_done_callback(lambda done: self._finished(path, done))
+        return "pending"
+
+    def _finished(self, path, future):
+        error = future.exception()
+        if error is not None:
+            logger.error("Report %s failed: %s", path, error)
+            with open(f"{path}.error", "w") as f:
+                f.write(str(error))
+        try:
+            os.remove(f"{path}.pending")
+        except OSError:
+            pass
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+report_queue = ReportQueue(
+    os.getenv("REPORT_CACHE_DIR", "/tmp/reports"),
+    workers=int(os.getenv("REPORT_WORKERS", "2")),
+)
@@ -0,0 +1,152 @@
+"""Project report rendering. Runs in the report worker processes, so it only
+depends on the plain data handed over by the API and on the standard library.
+
+PDF output needs WeasyPrint (and its Pango system libraries); HTML does not.
+The image installs neither, so the API answers 501 for PDF reports there
+instead of queueing jobs that can only fail.
+"""
+import os
+from functools import lru_cache
+from datetime import datetime, timezone
+from html import escape
+
+PLOT_WIDTH = 640
+PLOT_HEIGHT = 160
+
+STYLE = """
+body { font-family: Helvetica, Arial, sans-serif; font-size: 11pt; margin: 2em; color: #222; }
+h1 { font-size: 18pt; margin-bottom: 0; }
+h2 { font-size: 14pt; border-bottom: 1px solid #999; margin-top: 1.5em; }
+h3 { font-size: 12pt; margin-bottom: 0.3em; }
+table { border-collapse: collapse; margin: 0.5em 0; }
+th, td { border: 1px solid #bbb; padding: 3px 8px; text-align: right; }
+th { background: #eee; }
+td.text { text-align: left; }
+.muted { color: #777; font-size: 9pt; }
+.pass { color: #186a3b; } .fail { color: #a93226; }
+svg { border: 1px solid #ddd; margin: 0.3em 0; }
+"""
+
+
+def _cell(value):
+    if value is None:
+        return "<td>&ndash;</td>"
+    if isinstance(value, bool):
+        return f'<td class="{"pass" if value else "fail"}">{"Pass" if value else "Fail"}</td>'
+    if isinstance(value, float):
+        return f"<td>{value:.3f}</td>"
+    if isinstance(value, int):
+        return f"<td>{value}</td>"
+    return f'<td class="text">{escape(str(value))}</td>'
+
+
+def _table(headers, rows):
+    if not rows:
+        return '<p class="muted">None recorded.</p>'
+    head = "".join(f"<th>{escape(header)}</th>" for header in headers)
+    body = "".join("<tr>" + "".join(_cell(value) for value in row) + "</tr>" for row in rows)
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def _plot(series):
+    if not series:
+        return ""
+    t, v = series["timestamps"], series["values"]
+    t0, t1 = t[0], t[-1] if t[-1] > t[0] else t[0] + 1
+    low, high = min(v), max(v)
+    high = high if high > low else low + 1
+    points = " ".join(
+        f"{(x - t0) / (t1 - t0) * PLOT_WIDTH:.1f},{PLOT_HEIGHT - (y - low) / (high - low) * PLOT_HEIGHT:.1f}"
+        for x, y in zip(t, v)
+    )
+    return (
+        f'<svg width="{PLOT_WIDTH}" height="{PLOT_HEIGHT}" viewBox="0 0 {PLOT_WIDTH} {PLOT_HEIGHT}">'
+        f'<polyline fill="none" stroke="#1f618d" stroke-width="1" points="{points}"/></svg>'
+        f'<div class="muted">Pressure {low:.1f} &ndash; {high:.1f} over {t1 - t0:.0f} s</div>'
+    )
+
+
+def render_html(data, key):
+    plots = data.get("plots", {})
+    parts = [
+        f"<h1>{escape(data['name'])}</h1>",
+        f'<p>Rig: {escape(str(data["device_name"]))} &middot; Inward design pressure: '
+        f'{data["inward_design_pressure"]:.2f} &middot; Outward design pressure: {data["outward_design_pressure"]:.2f}</p>',
+        "<h2>Static tests</h2>",
+    ]
+    for test in sorted(data["static_tests"], key=lambda test: test["index"]):
+        status = "finished" if test["finished"] else "not finished"
+        parts.append(
+            f"<h3>#{test['index'] + 1} {escape(test['type'])} &middot; {escape(test['pressure_factor'])} &middot; "
+            f"{test['pressure']:.2f} for {test['duration']} s <span class=\"muted\">({status})</span></h3>"
+        )
+        parts.append(_table(
+            ("Gauge", "Max deflection", "Permanent deflection", "Recovery %"),
+            [(d["deflection_gauge"], d["max_deflection"], d["permanent_deflection"], d["recovery"])
+             for d in sorted(test["deflections"], key=lambda d: d["deflection_gauge"])],
+        ))
+        parts.append(_plot(plots.get(f"static:{test['index']}")))
+
+    parts.append("<h2>Cyclic tests</h2>")
+    cyclic_tests = sorted(data["cyclic_tests"], key=lambda test: test["index"])
+    parts.append(_table(
+        ("#", "Type", "Cycles", "Completed", "Low", "High", "Deflection", "Permanent set", "Result", "Note"),
+        [(test["index"] + 1, test["type"], test["cycles"], test["completed_cycles"], test["low_pressure"],
+          test["high_pressure"], test["deflection"], test["permanent_set"], test["result"], test["note"]) for test in cyclic_tests],
+    ))
+    for test in cyclic_tests:
+        plot = _plot(plots.get(f"cyclic:{test['index']}"))
+        if plot:
+            parts.append(f"<h3>Cyclic #{test['index'] + 1} {escape(test['type'])}</h3>{plot}")
+
+    parts.append("<h2>Infiltration tests</h2>")
+    parts.append(_table(
+        ("Type", "Pressure", "Duration", "Leakage"),
+        [(test["type"], test["pressure"], test["duration"], test["leakage"]) for test in data["infiltration_tests"]],
+    ))
+
+    parts.append("<h2>Missile impact tests</h2>")
+    if not data["missile_impact_tests"]:
+        parts.append('<p class="muted">None recorded.</p>')
+    for test in data["missile_impact_tests"]:
+        parts.append(f"<h3>{escape(test['missile'])} &middot; {test['missile_weight']:.2f}</h3>")
+        parts.append(_table(
+            ("Area", "Velocity", "Result", "Note"),
+            [(shot["area"], shot["velocity"], shot["result"], shot["note"]) for shot in test["shots"]],
+        ))
+
+    generated = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    parts.append(f'<p class="muted">Generated {generated} &middot; data version {key[:12]}</p>')
+    return (
+        f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{escape(data['name'])}</title>"
+        f"<style>{STYLE}</style></head><body>{''.join(parts)}</body></html>"
+    )
+
+
+@lru_cache(maxsize=None)
+def pdf_available():
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        # OSError: installed, but the Pango libraries it loads are missing
+        return False
+    return True
+
+
+def render_pdf(html):
+    try:
+        from weasyprint import HTML
+    except ImportError as exc:
+        raise RuntimeError("PDF reports need the weasyprint package") from exc
+    return HTML(string=html).write_pdf()
+
+
+def render_to_file(data, key, report_format, path):
+    """Render into `path` atomically; what the report worker processes run."""
+    html = render_html(data, key)
+    content = html.encode() if report_format == "html" else render_pdf(html)
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as f:
+        f.write(content)
+    os.replace(partial, path)
+    return len(content)
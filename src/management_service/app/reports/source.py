@@ -0,0 +1,87 @@
+"""What a project report is rendered from, and the content key that identifies it.
+
+The key is derived from the project's version, which every write to its tree
+bumps (app.data.versions), and a watermark of its recorded telemetry: the
+highest sample and chunk ids of its tests. Both come from one indexed lookup,
+so a cached report is found without loading the project; the tree and the
+plots are only loaded when the report has to be rendered. Compacting samples
+into chunks moves the watermark too, which costs one needless render.
+"""
+import hashlib
+import json
+
+from sqlalchemy import func, select
+
+from app.data.loaders import load_project_tree
+from app.data.models import CyclicTest, Project, StaticTest, TelemetryChunk, TelemetrySample
+from app.data.schema import ProjectSchema
+from app.telemetry.evaluation import evaluation_sensors
+from app.telemetry.store import load_series
+
+# Bump when the report layout changes so cached reports are rendered again
+REPORT_LAYOUT_VERSION = 2
+PLOT_POINTS = 400
+
+TEST_COLUMNS = {"static": "static_test_id", "cyclic": "cyclic_test_id"}
+TEST_MODELS = {"static": StaticTest, "cyclic": CyclicTest}
+
+
+def _telemetry_watermarks(project_id):
+    """Highest sample and chunk id of each kind of test of the project, as scalar subqueries."""
+    return [
+        select(func.max(model.id)).where(getattr(model, column).in_(
+            select(TEST_MODELS[kind].id).where(TEST_MODELS[kind].project_id == project_id)
+        )).scalar_subquery()
+        for model in (TelemetrySample, TelemetryChunk)
+        for kind, column in TEST_COLUMNS.items()
+    ]
+
+
+def project_report_key(db, project_id):
+    """Content key of the project's current report, or None if the project does not exist."""
+    row = db.execute(
+        select(Project.version, *_telemetry_watermarks(project_id)).where(Project.id == project_id)
+    ).first()
+    if row is None:
+        return None
+    encoded = json.dumps([REPORT_LAYOUT_VERSION, project_id, *row]).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def project_report_data(db, project_id, sensor_roles):
+    """Everything the report is rendered from; raises LookupError if the project is gone."""
+    project = load_project_tree(db, project_id)
+    if project is None:
+        raise LookupError(f"Project {project_id} not found")
+    data = ProjectSchema.model_validate(project, from_attributes=True).model_dump(mode="json")
+    data["device_name"] = project.device.name
+    data["plots"] = report_plots(db, project, sensor_roles)
+    return data
+
+
+def _tests_with_telemetry(db, project):
+    recorded = set()
+    for kind, column in TEST_COLUMNS.items():
+        test_ids = [test.id for test in getattr(project, f"{kind}_tests")]
+        if not test_ids:
+            continue
+        for model in (TelemetryChunk, TelemetrySample):
+            test_column = getattr(model, column)
+            rows = db.query(test_column).filter(test_column.in_(test_ids)).distinct()
+            recorded.update((kind, test_id) for test_id, in rows)
+    return recorded
+
+
+def report_plots(db, project, sensor_roles):
+    """Downsampled pressure series of every test that has telemetry, keyed by kind and test index."""
+    pressure_sensor, _ = evaluation_sensors(sensor_roles, project.device_id)
+    recorded = _tests_with_telemetry(db, project)
+    plots = {}
+    for kind, tests in (("static", project.static_tests), ("cyclic", project.cyclic_tests)):
+        for test in tests:
+            if (kind, test.id) not in recorded:
+                continue
+            series = load_series(db, TEST_COLUMNS[kind], test.id, pressure_sensor, points=PLOT_POINTS, method="minmax")
+            if series["timestamps"]:
+                plots[f"{kind}:{test.index}"] = {"timestamps": series["timestamps"], "values": series["values"]}
+    return plots
@@ -0,0 +1,173 @@
+"""Cyclic-test evaluation from telemetry, either live in the ingestor or replayed from storage.
+
+The first sensor with role "pressure" in the rig config drives cycle counting;
+every sensor with role "deflection" is treated as a deflection gauge. A rig
+without deflection gauges still gets its completed cycles counted, but no
+deflection or permanent set, so its result only checks the count. The count
+is stored as completed_cycles, since a test's `cycles` is the planned number
+the evaluator counts towards.
+"""
+import logging
+import os
+import time
+from functools import lru_cache
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import joinedload
+
+from app.data.models import CyclicTest
+from app.data.versions import bump_projects
+from app.domain.cycle_counter import CycleEvaluator
+from app.telemetry.ingestion import load_sensor_roles
+from app.telemetry.store import iter_test_samples, to_epoch
+
+logger = logging.getLogger(__name__)
+
+PRESSURE_ROLE = "pressure"
+DEFLECTION_ROLE = "deflection"
+# Rigs without a config entry publish their main pressure transducer as address 1
+DEFAULT_PRESSURE_SENSOR = "1"
+
+
+@lru_cache(maxsize=1)
+def configured_sensor_roles():
+    return load_sensor_roles(os.getenv("DEVICES_CONFIG"))
+
+
+def evaluation_sensors(sensor_roles, device_id):
+    """(pressure sensor, deflection gauges) of one rig."""
+    pressure, gauges = [], []
+    for (device, sensor), role in sensor_roles.items():
+        if device == device_id and role == PRESSURE_ROLE:
+            pressure.append(sensor)
+        elif device == device_id and role == DEFLECTION_ROLE:
+            gauges.append(sensor)
+    return (pressure[0] if pressure else DEFAULT_PRESSURE_SENSOR), gauges
+
+
+def evaluator_for(test, max_permanent_set=None):
+    return CycleEvaluator(test.low_pressure, test.high_pressure, test.cycles, max_permanent_set=max_permanent_set)
+
+
+def feed(evaluator, pressure_sensor, gauges, sensors, values):
+    for sensor, value in zip(sensors, values):
+        if sensor == pressure_sensor:
+            evaluator.add_pressure(value)
+        elif sensor in gauges:
+            evaluator.add_deflection(sensor, value)
+
+
+def replay_cyclic_test(db, test, sensor_roles, max_permanent_set=None):
+    """Run the evaluator over everything recorded for `test`; returns (evaluator, last sample epoch)."""
+    pressure_sensor, gauges = evaluation_sensors(sensor_roles, test.project.device_id)
+    evaluator = evaluator_for(test, max_permanent_set)
+    last = None
+    for timestamps, sensors, values in iter_test_samples(db, "cyclic_test_id", test.id, [pressure_sensor, *gauges]):
+        feed(evaluator, pressure_sensor, gauges, sensors.tolist(), values.tolist())
+        if len(timestamps):
+            last = float(timestamps[-1])
+    return evaluator, last
+
+
+def evaluation_values(evaluator):
+    return dict(completed_cycles=evaluator.cycles, deflection=evaluator.deflection,
+                permanent_set=evaluator.permanent_set, result=evaluator.result)
+
+
+def apply_evaluation(test, evaluator):
+    """Copy the evaluation onto `test`; tests without recorded pressure are left untouched."""
+    if not evaluator.samples:
+        return False
+    for field, value in evaluation_values(evaluator).items():
+        setattr(test, field, value)
+    return True
+
+
+class LiveCycleEvaluation:
+    """Ingestor observer that evaluates active cyclic tests as their samples are written.
+
+    An evaluator is created the first time a test's samples show up, primed by
+    replaying what is already stored, and its results are written back every
+    `write_interval` seconds. Tests whose samples stop arriving for
+    `idle_timeout` seconds get a final write and are dropped. Finished tests
+    keep what was recorded when they were finished: they are never tracked,
+    and are dropped without a write once finished.
+    """
+
+    def __init__(self, session_factory, sensor_roles, write_interval=5.0, idle_timeout=60.0):
+        self.session_factory = session_factory
+        self.sensor_roles = sensor_roles
+        self.write_interval = write_interval
+        self.idle_timeout = idle_timeout
+        # cyclic test id -> [evaluator, (pressure sensor, gauges), last replayed epoch, last seen]
+        self._tests = {}
+        self._written_at = time.monotonic()
+
+    def _start(self, db, test_id):
+        test = db.query(CyclicTest).options(joinedload(CyclicTest.project)).filter(CyclicTest.id == test_id).first()
+        if test is None or test.finished:
+            return None
+        evaluator, last = replay_cyclic_test(db, test, self.sensor_roles)
+        pressure_sensor, gauges = evaluation_sensors(self.sensor_roles, test.project.device_id)
+        return [evaluator, (pressure_sensor, frozenset(gauges)), last, time.monotonic()]
+
+    def observe(self, samples):
+        now = time.monotonic()
+        db = None
+        try:
+            for sample in samples:
+                if sample.cyclic_test_id is None:
+                    continue
+                if sample.cyclic_test_id not in self._tests:
+                    db = db or self.session_factory()
+                    self._tests[sample.cyclic_test_id] = self._start(db, sample.cyclic_test_id)
+                tracked = self._tests[sample.cyclic_test_id]
+                if tracked is None:
+                    continue
+                evaluator, (pressure_sensor, gauges), replayed_until, _ = tracked
+                tracked[3] = now
+                # The batch was written before observers run, so the priming replay already saw it
+                if replayed_until is not None and to_epoch(sample.recorded_at) <= replayed_until:
+                    continue
+                feed(evaluator, pressure_sensor, gauges, (sample.sensor,), (sample.value,))
+        finally:
+            if db is not None:
+                db.close()
+        if now - self._written_at >= self.write_interval:
+            self.write()
+
+    def write(self, final=False):
+        now = time.monotonic()
+        tracked_ids = [test_id for test_id, tracked in self._tests.items() if tracked is not None]
+        if tracked_ids:
+            db = self.session_factory()
+            try:
+                for test_id in db.scalars(
+                    select(CyclicTest.id).where(CyclicTest.id.in_(tracked_ids), CyclicTest.finished.is_(True))
+                ):
+                    del self._tests[test_id]
+                rows = [
+                    dict(id=test_id, **evaluation_values(tracked[0]))
+                    for test_id, tracked in self._tests.items()
+                    if tracked is not None and tracked[0].samples
+                ]
+                if rows:
+                    # The guard again, for a test finished since the SELECT above
+                    db.execute(
+                        update(CyclicTest).where(CyclicTest.finished.is_(False)), rows,
+                        execution_options={"synchronize_session": None},
+                    )
+                    bump_projects(db, select(CyclicTest.project_id).where(CyclicTest.id.in_([row["id"] for row in rows])))
+                db.commit()
+            except Exception:
+                logger.exception("Failed to write evaluation of %d cyclic tests", len(tracked_ids))
+            finally:
+                db.close()
+        self._written_at = now
+        self._tests = {
+            test_id: tracked for test_id, tracked in self._tests.items()
+            if not final and tracked is not None and now - tracked[3] < self.idle_timeout
+        }
+
+    def close(self):
+        self.write(final=True)
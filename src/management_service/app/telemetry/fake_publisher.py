@@ -0,0 +1,101 @@
+"""Simulated rig that publishes sensor readings like the real hardware.
+
+Feeds an ingestor directly (no broker needed) or publishes to MQTT in real time:
+
+    python -m app.telemetry.fake_publisher --host localhost --device 1 --seconds 60
+"""
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+
+class FakeRig:
+    """Pressure sensors following a sine between low and high, with noise, at `frequency` Hz.
+
+    Deflection gauges read `stiffness` times the pressure plus a set that
+    grows by `creep` per second, so permanent set is visible after unloading.
+    """
+
+    def __init__(self, device_id, sensors=("1", "2", "3"), frequency=20, low=0.0, high=100.0,
+                 period=4.0, noise=0.5, seed=None, gauges=(), stiffness=0.05, creep=0.0):
+        self.device_id = device_id
+        self.sensors = sensors
+        self.gauges = gauges
+        self.stiffness = stiffness
+        self.creep = creep
+        self.frequency = frequency
+        self.low = low
+        self.high = high
+        self.period = period
+        self.noise = noise
+        self._random = random.Random(seed)
+
+    def value_at(self, elapsed):
+        phase = (1 - math.cos(2 * math.pi * elapsed / self.period)) / 2
+        return self.low + (self.high - self.low) * phase + self._random.gauss(0, self.noise)
+
+    def readings(self, elapsed):
+        """(topic, payload) for every sensor and gauge at `elapsed` seconds into the run."""
+        pressures = [self.value_at(elapsed) for _ in self.sensors]
+        readings = [
+            (f"device{self.device_id}/sensors/{sensor}", f"{pressure:.3f}".encode())
+            for sensor, pressure in zip(self.sensors, pressures)
+        ]
+        for gauge in self.gauges:
+            deflection = pressures[0] * self.stiffness + self.creep * elapsed
+            readings.append((f"device{self.device_id}/sensors/{gauge}", f"{deflection:.4f}".encode()))
+        return readings
+
+    def messages(self, seconds, start=None):
+        """Yield (topic, payload, recorded_at) for `seconds` of simulated time."""
+        start = start or datetime.now(timezone.utc)
+        for tick in range(int(seconds * self.frequency)):
+            elapsed = tick / self.frequency
+            recorded_at = start + timedelta(seconds=elapsed)
+            for topic, payload in self.readings(elapsed):
+                yield topic, payload, recorded_at
+
+
+def feed(ingestor, rigs, seconds, start=None):
+    """Push simulated samples straight into `ingestor`; returns how many were offered."""
+    offered = 0
+    for rig in rigs:
+        for topic, payload, recorded_at in rig.messages(seconds, start):
+            ingestor.handle_message(topic, payload, recorded_at)
+            offered += 1
+    return offered
+
+
+def main():
+    import paho.mqtt.client as mqtt
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--device", type=int, action="append", dest="devices")
+    parser.add_argument("--frequency", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=60)
+    args = parser.parse_args()
+
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    else:
+        client = mqtt.Client()
+    client.connect(args.host, args.port)
+    client.loop_start()
+    rigs = [FakeRig(device_id, frequency=args.frequency) for device_id in (args.devices or [1])]
+    started = time.monotonic()
+    for tick in range(int(args.seconds * args.frequency)):
+        elapsed = tick / args.frequency
+        for rig in rigs:
+            for topic, payload in rig.readings(elapsed):
+                client.publish(topic, payload)
+        time.sleep(max(0.0, started + elapsed + 1 / args.frequency - time.monotonic()))
+    client.loop_stop()
+    client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
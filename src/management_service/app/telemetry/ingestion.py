@@ -0,0 +1,296 @@
+"""Sensor telemetry ingestion: MQTT -> bounded in-memory buffer -> batched writes.
+
+Runs as its own process next to the API so that every gunicorn worker does not
+subscribe and store the same samples:
+
+    python -m app.telemetry.ingestion
+"""
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import re
+import signal
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert
+
+from app.data.models import ActiveTest, TelemetrySample
+
+logger = logging.getLogger(__name__)
+
+SENSOR_TOPIC = re.compile(r"^device(\d+)/sensors/([^/]+)$")
+
+Sample = namedtuple("Sample", "device_id sensor role recorded_at value static_test_id cyclic_test_id")
+
+
+def device_number(device_id):
+    # config.json names rigs "device1", "device2", ...; topics and Device ids use the number
+    return int(str(device_id).replace("device", ""))
+
+
+def load_sensor_roles(path):
+    """Map (device number, sensor address) to the sensor's role from the rig config."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        devices = json.load(f)
+    return {
+        (device_number(device["device_id"]), str(sensor["address"])): sensor.get("role")
+        for device in devices
+        for sensor in device.get("sensors", [])
+    }
+
+
+def parse_payload(payload, received_at):
+    """Accept a bare number (what rigs publish today) or {"value": v, "timestamp": epoch seconds}."""
+    if isinstance(payload, bytes):
+        payload = payload.decode()
+    payload = payload.strip()
+    if payload.startswith("{"):
+        data = json.loads(payload)
+        recorded_at = data.get("timestamp")
+        if recorded_at is not None:
+            received_at = datetime.fromtimestamp(float(recorded_at), timezone.utc)
+        return float(data["value"]), received_at
+    return float(payload), received_at
+
+
+class ActiveTestRegistry:
+    """In-memory copy of the active_tests table, refreshed at most every `refresh_interval` seconds."""
+
+    def __init__(self, session_factory, refresh_interval=1.0):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._active = {}
+        self._refreshed_at = 0.0
+
+    def lookup(self, device_id):
+        return self._active.get(device_id, (None, None))
+
+    def refresh(self, force=False):
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        db = self.session_factory()
+        try:
+            rows = db.query(ActiveTest.device_id, ActiveTest.static_test_id, ActiveTest.cyclic_test_id).all()
+        finally:
+            db.close()
+        # Swapping the whole dict keeps lookups from the MQTT thread lock-free
+        self._active = {device_id: (static_id, cyclic_id) for device_id, static_id, cyclic_id in rows}
+        self._refreshed_at = time.monotonic()
+
+
+class SampleWriter:
+    """Writes sample batches with COPY on psycopg2 and a multi-row INSERT elsewhere."""
+
+    COLUMNS = Sample._fields
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.use_copy = engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+    def write(self, samples):
+        if not samples:
+            return
+        if self.use_copy:
+            self._copy(samples)
+        else:
+            with self.engine.begin() as conn:
+                conn.execute(insert(TelemetrySample), [sample._asdict() for sample in samples])
+
+    def _copy(self, samples):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for sample in samples:
+            writer.writerow(
+                sample.recorded_at.isoformat() if field == "recorded_at" else ("" if value is None else value)
+                for field, value in zip(self.COLUMNS, sample)
+            )
+        buffer.seek(0)
+        raw = self.engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {TelemetrySample.__tablename__} ({', '.join(self.COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+            raw.commit()
+        finally:
+            raw.close()
+
+
+class TelemetryIngestor:
+    """Buffers samples from the MQTT thread and flushes them in batches from a writer thread.
+
+    The buffer is bounded: when the database falls behind, new samples are
+    dropped and counted instead of growing memory without limit. Observers are
+    called with every batch once it has been written.
+    """
+
+    def __init__(self, writer, active_tests=None, sensor_roles=None,
+                 max_queue=100_000, batch_size=5_000, flush_interval=0.5, observers=()):
+        self.writer = writer
+        self.observers = list(observers)
+        self.active_tests = active_tests
+        self.sensor_roles = sensor_roles or {}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters_lock = threading.Lock()
+        self.counters = dict(received=0, accepted=0, rejected=0, dropped=0, written=0, lost=0, flush_errors=0)
+
+    def _count(self, name, amount=1):
+        with self._counters_lock:
+            self.counters[name] += amount
+
+    def handle_message(self, topic, payload, received_at=None):
+        match = SENSOR_TOPIC.match(topic)
+        if not match:
+            return False
+        self._count("received")
+        try:
+            value, recorded_at = parse_payload(payload, received_at or datetime.now(timezone.utc))
+        except (ValueError, KeyError, TypeError):
+            self._count("rejected")
+            return False
+        return self.submit(int(match.group(1)), match.group(2), value, recorded_at)
+
+    def submit(self, device_id, sensor, value, recorded_at):
+        static_test_id, cyclic_test_id = self.active_tests.lookup(device_id) if self.active_tests else (None, None)
+        sample = Sample(
+            device_id, sensor, self.sensor_roles.get((device_id, sensor)), recorded_at, value,
+            static_test_id, cyclic_test_id,
+        )
+        try:
+            self._queue.put_nowait(sample)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("accepted")
+        return True
+
+    def _drain(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def flush(self, timeout=0.0):
+        batch = self._drain(timeout)
+        if not batch:
+            return 0
+        try:
+            self.writer.write(batch)
+        except Exception:
+            logger.exception("Failed to write %d telemetry samples", len(batch))
+            self._count("flush_errors")
+            self._count("lost", len(batch))
+            return 0
+        self._count("written", len(batch))
+        for observer in self.observers:
+            try:
+                observer(batch)
+            except Exception:
+                logger.exception("Telemetry observer failed")
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.active_tests is not None:
+                try:
+                    self.active_tests.refresh()
+                except Exception:
+                    logger.exception("Failed to refresh active tests")
+            self.flush(timeout=self.flush_interval)
+        while self.flush():
+            pass
+
+    def start(self):
+        if self.active_tests is not None:
+            self.active_tests.refresh(force=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        with self._counters_lock:
+            return dict(self.counters, queue_depth=self._queue.qsize())
+
+
+def main():
+    from app.data.database import engine, SessionLocal
+    from app.data.migrations import MIGRATE_ON_STARTUP, run_migrations
+    from app.telemetry.mqtt import MqttSubscriber
+    from app.telemetry.evaluation import LiveCycleEvaluation
+    from app.telemetry.store import compact_samples
+
+    logging.basicConfig(level=logging.INFO)
+    if MIGRATE_ON_STARTUP:
+        run_migrations(engine)
+    sensor_roles = load_sensor_roles(os.getenv("DEVICES_CONFIG"))
+    evaluation = None
+    if os.getenv("TELEMETRY_EVALUATE", "1") == "1":
+        evaluation = LiveCycleEvaluation(
+            SessionLocal, sensor_roles, write_interval=float(os.getenv("TELEMETRY_EVALUATE_INTERVAL", "5")),
+        )
+    ingestor = TelemetryIngestor(
+        SampleWriter(engine),
+        active_tests=ActiveTestRegistry(SessionLocal),
+        sensor_roles=sensor_roles,
+        max_queue=int(os.getenv("TELEMETRY_QUEUE_SIZE", "100000")),
+        batch_size=int(os.getenv("TELEMETRY_BATCH_SIZE", "5000")),
+        flush_interval=float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "0.5")),
+        observers=[evaluation.observe] if evaluation else (),
+    )
+    subscriber = MqttSubscriber(os.getenv("MQTT_HOST", "localhost"), int(os.getenv("MQTT_PORT", "1883")))
+    subscriber.add_handler(ingestor.handle_message)
+
+    compact_interval = float(os.getenv("TELEMETRY_COMPACT_INTERVAL", "30"))
+    compact_grace = float(os.getenv("TELEMETRY_COMPACT_GRACE", "10"))
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    ingestor.start()
+    subscriber.start()
+    try:
+        while not stopping.wait(compact_interval):
+            logger.info("telemetry %s", ingestor.stats())
+            # Raw rows become chunks/rollups once they're older than the grace period
+            before = datetime.now(timezone.utc) - timedelta(seconds=compact_grace)
+            db = SessionLocal()
+            try:
+                while compact_samples(db, before):
+                    pass
+            except Exception:
+                logger.exception("Telemetry compaction failed")
+            finally:
+                db.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.stop()
+        ingestor.stop()
+        if evaluation is not None:
+            evaluation.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Per-device live state fanned out to WebSocket/SSE clients.
+
+Each API worker keeps one MQTT subscription and folds rig messages into a
+small state per device. Clients never get a queue of every sample: they are
+woken when their device changes and always send the latest snapshot, so a slow
+browser tab sees fewer, fresher updates instead of an ever-growing backlog.
+Discrete events (a test finished) are kept in a short bounded list per client.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+DEVICE_TOPIC = re.compile(r"^device(\d+)/(.+)$")
+LIVE_TOPICS = ("+/sensors/+", "+/status", "+/current_test_index", "+/initial_value", "+/test_events")
+EVENTS_TOPIC = "device{device_id}/test_events"
+
+
+def _decode(payload):
+    return payload.decode() if isinstance(payload, bytes) else payload
+
+
+class LiveClient:
+    def __init__(self, hub, device_id, max_events=100):
+        self.hub = hub
+        self.device_id = device_id
+        self.events = deque(maxlen=max_events)
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self._changed.set()
+
+    async def updates(self, min_interval=0.05, heartbeat=15.0):
+        """Yield {"state": ..., "events": [...]} whenever the device changed, at most every `min_interval` s.
+
+        An unchanged state is re-sent every `heartbeat` seconds so proxies keep
+        the connection open and dead clients are noticed.
+        """
+        yield self._message()
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            yield self._message()
+            await asyncio.sleep(min_interval)
+
+    def _message(self):
+        events = list(self.events)
+        self.events.clear()
+        return {"state": self.hub.snapshot(self.device_id), "events": events}
+
+
+class LiveHub:
+    def __init__(self):
+        self._states = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self.publisher = None
+
+    def attach(self, loop):
+        self._loop = loop
+
+    def snapshot(self, device_id):
+        with self._lock:
+            state = self._states.get(device_id)
+            return dict(state, sensors=dict(state["sensors"])) if state else {
+                "device_id": device_id, "sensors": {}, "status": None,
+                "current_test_index": None, "cycles": None, "updated_at": None,
+            }
+
+    def _state(self, device_id):
+        state = self._states.get(device_id)
+        if state is None:
+            state = self._states[device_id] = {
+                "device_id": device_id, "sensors": {}, "status": None,
+                "current_test_index": None, "cycles": None, "updated_at": None,
+            }
+        return state
+
+    def handle_message(self, topic, payload):
+        """MQTT handler; runs on the network thread."""
+        match = DEVICE_TOPIC.match(topic)
+        if not match:
+            return
+        device_id, subtopic = int(match.group(1)), match.group(2)
+        payload = _decode(payload)
+        if subtopic == "test_events":
+            self._dispatch(device_id, event=json.loads(payload))
+            return
+        with self._lock:
+            state = self._state(device_id)
+            if subtopic.startswith("sensors/"):
+                try:
+                    state["sensors"][subtopic[len("sensors/"):]] = float(payload)
+                except ValueError:
+                    return
+            elif subtopic == "status":
+                state["status"] = payload
+            elif subtopic == "current_test_index":
+                state["current_test_index"] = int(payload)
+            elif subtopic == "initial_value":
+                cyclic_values = json.loads(payload).get("current_values", {}).get("cyclic_values", {})
+                state["cycles"] = cyclic_values.get("number_of_cycles", state["cycles"])
+            else:
+                return
+            state["updated_at"] = time.time()
+        self._dispatch(device_id)
+
+    def publish_event(self, device_id, event):
+        """Announce an event to every worker's clients (through MQTT when connected)."""
+        if self.publisher is not None:
+            self.publisher(EVENTS_TOPIC.format(device_id=device_id), json.dumps(event))
+        else:
+            self._dispatch(device_id, event=event)
+
+    def _dispatch(self, device_id, event=None):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._wake, device_id, event)
+
+    def _wake(self, device_id, event):
+        for client in self._clients.get(device_id, ()):
+            if event is not None:
+                client.events.append(event)
+            client.notify()
+
+    def connect(self, device_id):
+        client = LiveClient(self, device_id)
+        self._clients.setdefault(device_id, set()).add(client)
+        return client
+
+    def disconnect(self, client):
+        clients = self._clients.get(client.device_id)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del self._clients[client.device_id]
+
+    def client_count(self):
+        return sum(len(clients) for clients in self._clients.values())
+
+    @asynccontextmanager
+    async def running(self):
+        """Bind to the running loop and, when MQTT_HOST is set, subscribe to the rigs for the app's lifetime."""
+        from app.telemetry.mqtt import MqttSubscriber
+
+        self.attach(asyncio.get_running_loop())
+        subscriber = None
+        if os.getenv("MQTT_HOST"):
+            subscriber = MqttSubscriber(os.getenv("MQTT_HOST"), int(os.getenv("MQTT_PORT", "1883")), topics=LIVE_TOPICS)
+            subscriber.add_handler(self.handle_message)
+            subscriber.start()
+            self.publisher = subscriber.publish
+        try:
+            yield self
+        finally:
+            self.publisher = None
+            if subscriber is not None:
+                subscriber.stop()
+            self._loop = None
+
+
+live_hub = LiveHub()
@@ -0,0 +1,68 @@
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Rigs publish every sensor reading on device<N>/sensors/<address>. MQTT
+# wildcards must span a whole level, so the device level is matched with "+".
+SENSOR_TOPICS = ("+/sensors/+",)
+
+
+class MqttSubscriber:
+    """One broker connection whose messages are handed to every registered handler.
+
+    Handlers are called on paho's network thread as handler(topic, payload)
+    and must not block.
+    """
+
+    def __init__(self, host, port=1883, topics=SENSOR_TOPICS, client_id=None, username=None, password=None):
+        self.host = host
+        self.port = port
+        self.topics = topics
+        self.client_id = client_id or f"report-api-{uuid.uuid4().hex[:8]}"
+        self.username = username
+        self.password = password
+        self.handlers = []
+        self._client = None
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        # Subscribing here also restores the subscriptions after a reconnect
+        for topic in self.topics:
+            client.subscribe(topic, qos=0)
+        logger.info("Subscribed to %s on %s:%s", ", ".join(self.topics), self.host, self.port)
+
+    def _on_message(self, client, userdata, message):
+        for handler in self.handlers:
+            try:
+                handler(message.topic, message.payload)
+            except Exception:
+                logger.exception("MQTT handler failed for %s", message.topic)
+
+    def publish(self, topic, payload, qos=0):
+        # paho queues the message, so this is safe to call from any thread
+        if self._client is not None:
+            self._client.publish(topic, payload, qos=qos)
+
+    def start(self):
+        import paho.mqtt.client as mqtt
+
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id)
+        else:
+            client = mqtt.Client(client_id=self.client_id)
+        if self.username:
+            client.username_pw_set(self.username, self.password)
+        client.on_connect = self._on_connect
+        client.on_message = self._on_message
+        client.connect_async(self.host, self.port)
+        client.loop_start()
+        self._client = client
+
+    def stop(self):
+        if self._client is not None:
+            self._client.loop_stop()
+            self._client.disconnect()
+            self._client = None
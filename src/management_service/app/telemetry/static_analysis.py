@@ -0,0 +1,70 @@
+"""Deflection rows of static tests computed from their recorded gauge data.
+
+Gauges are the rig's "deflection" sensors in config order; the first one is
+deflection_gauge 1, matching how gauges are numbered on the data sheets.
+Finished tests keep the deflections they were finished with and are skipped.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import joinedload
+
+from app.data.bulk import upsert_deflections_by_gauge
+from app.data.models import StaticTest
+from app.domain.deflection_analysis import analyze_static_test
+from app.telemetry.evaluation import evaluation_sensors
+from app.telemetry.store import raw_series
+
+
+def deflection_rows(db, static_test, sensor_roles):
+    """Deflection dicts for every gauge with data; empty if the test has no usable telemetry."""
+    pressure_sensor, gauges = evaluation_sensors(sensor_roles, static_test.project.device_id)
+    t, pressure = raw_series(db, "static_test_id", static_test.id, pressure_sensor)
+    numbered = []
+    for number, gauge in enumerate(gauges, start=1):
+        gauge_t, gauge_v = raw_series(db, "static_test_id", static_test.id, gauge)
+        if len(gauge_t):
+            numbered.append((number, (gauge_t, gauge_v)))
+    analysis = analyze_static_test(
+        t, pressure, [series for _, series in numbered], static_test.pressure, static_test.duration
+    )
+    if analysis is None:
+        return []
+    return [
+        dict(deflection_gauge=number, max_deflection=peak, permanent_deflection=permanent, recovery=recovery)
+        for (number, _), peak, permanent, recovery in zip(numbered, *(column.tolist() for column in analysis))
+    ]
+
+
+def analyze_static_tests(db, static_tests, sensor_roles):
+    """Analyze the unfinished `static_tests` in the caller's session and upsert their deflections (not committed)."""
+    rows_by_test = {test.id: deflection_rows(db, test, sensor_roles) for test in static_tests if not test.finished}
+    upsert_deflections_by_gauge(db, {test_id: rows for test_id, rows in rows_by_test.items() if rows})
+    return rows_by_test
+
+
+def analyze_project(db, session_factory, project_id, sensor_roles, workers=4):
+    """Analyze the unfinished static tests of a project in a pool of `workers` threads, then upsert in `db` (not committed).
+
+    Each worker reads its test's telemetry through its own session; the work is
+    dominated by database reads and NumPy, both of which release the GIL.
+    """
+    test_ids = [
+        test_id for test_id, in
+        db.query(StaticTest.id).filter(StaticTest.project_id == project_id, StaticTest.finished.is_(False))
+    ]
+
+    def analyze(test_id):
+        worker_db = session_factory()
+        try:
+            test = (
+                worker_db.query(StaticTest).options(joinedload(StaticTest.project))
+                .filter(StaticTest.id == test_id).one()
+            )
+            return test_id, deflection_rows(worker_db, test, sensor_roles)
+        finally:
+            worker_db.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(test_ids)))) as pool:
+        rows_by_test = dict(pool.map(analyze, test_ids))
+    upsert_deflections_by_gauge(db, {test_id: rows for test_id, rows in rows_by_test.items() if rows})
+    return rows_by_test
@@ -0,0 +1,309 @@
+"""Compact telemetry storage: packed per-window chunks plus min/max/mean rollups.
+
+The ingestor lands raw rows in telemetry_samples; `compact_samples` periodically
+moves everything older than a cutoff into telemetry_chunks (one row per sensor
+and CHUNK_SECONDS window) and telemetry_rollups (one row per bucket for every
+resolution in ROLLUP_RESOLUTIONS). `load_series` answers plot queries from
+whichever level fits the requested point budget.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import delete, func, insert
+
+from app.data.models import TelemetryChunk, TelemetryRollup, TelemetrySample
+from app.domain.downsampling import lttb, minmax
+
+CHUNK_SECONDS = 60
+ROLLUP_RESOLUTIONS = (1, 10, 60, 600)
+# Raw data is used while it is at most this many times the point budget
+RAW_BUDGET_FACTOR = 4
+DELETE_BATCH = 10_000
+
+GROUP_COLUMNS = ("device_id", "sensor", "static_test_id", "cyclic_test_id")
+
+
+def to_epoch(value):
+    # SQLite hands back naive datetimes; everything is stored in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def from_epoch(seconds):
+    return datetime.fromtimestamp(float(seconds), timezone.utc)
+
+
+def pack(array):
+    return np.asarray(array, dtype="<f4").tobytes()
+
+
+def unpack(blob):
+    return np.frombuffer(blob, dtype="<f4").astype(np.float64)
+
+
+def _run_starts(keys):
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def rollup_rows(group, t, v, resolution):
+    """min/max/mean rows of `resolution`-second buckets for time-sorted samples."""
+    buckets = np.floor(t / resolution).astype(np.int64)
+    starts = _run_starts(buckets)
+    counts = np.diff(np.r_[starts, len(t)])
+    mins = np.minimum.reduceat(v, starts)
+    maxs = np.maximum.reduceat(v, starts)
+    means = np.add.reduceat(v, starts) / counts
+    return [
+        dict(group, resolution=resolution, bucket_start=from_epoch(bucket * resolution),
+             min=low, max=high, mean=mean, count=count)
+        for bucket, low, high, mean, count in zip(
+            buckets[starts].tolist(), mins.tolist(), maxs.tolist(), means.tolist(), counts.tolist()
+        )
+    ]
+
+
+def compacted_rows(group, t, v):
+    """Chunk and rollup rows of one sensor/test group's time-sorted samples."""
+    chunks, rollups = [], []
+    windows = np.floor(t / CHUNK_SECONDS).astype(np.int64)
+    starts = _run_starts(windows)
+    for start, end in zip(starts.tolist(), np.r_[starts[1:], len(t)].tolist()):
+        chunks.append(dict(
+            group,
+            start_at=from_epoch(t[start]),
+            end_at=from_epoch(t[end - 1]),
+            count=end - start,
+            offsets=pack(t[start:end] - t[start]),
+            values=pack(v[start:end]),
+        ))
+    for resolution in ROLLUP_RESOLUTIONS:
+        rollups.extend(rollup_rows(group, t, v, resolution))
+    return chunks, rollups
+
+
+def compact_samples(db, before, max_rows=200_000):
+    """Move up to `max_rows` raw samples recorded before `before` into chunks and rollups.
+
+    A window split across two runs just yields two chunks and two partial
+    rollup rows; readers merge them. Returns the number of samples compacted.
+    """
+    rows = (
+        db.query(TelemetrySample.id, *(getattr(TelemetrySample, c) for c in GROUP_COLUMNS),
+                 TelemetrySample.recorded_at, TelemetrySample.value)
+        .filter(TelemetrySample.recorded_at < before)
+        .order_by(TelemetrySample.id)
+        .limit(max_rows)
+        .all()
+    )
+    if not rows:
+        return 0
+
+    groups = defaultdict(lambda: ([], []))
+    for row in rows:
+        times, values = groups[row[1:5]]
+        times.append(to_epoch(row.recorded_at))
+        values.append(row.value)
+
+    chunks, rollups = [], []
+    for key, (times, values) in groups.items():
+        t = np.asarray(times)
+        v = np.asarray(values, dtype=np.float64)
+        order = np.argsort(t, kind="stable")
+        group_chunks, group_rollups = compacted_rows(dict(zip(GROUP_COLUMNS, key)), t[order], v[order])
+        chunks.extend(group_chunks)
+        rollups.extend(group_rollups)
+
+    db.execute(insert(TelemetryChunk), chunks)
+    db.execute(insert(TelemetryRollup), rollups)
+    ids = [row.id for row in rows]
+    for offset in range(0, len(ids), DELETE_BATCH):
+        db.execute(delete(TelemetrySample).where(TelemetrySample.id.in_(ids[offset:offset + DELETE_BATCH])))
+    db.commit()
+    return len(rows)
+
+
+def _range_filters(column_start, column_end, start, end):
+    filters = []
+    if start is not None:
+        filters.append(column_end >= start)
+    if end is not None:
+        filters.append(column_start <= end)
+    return filters
+
+
+def _pending_samples(db, test_filter, sensor, start, end):
+    rows = (
+        db.query(TelemetrySample.recorded_at, TelemetrySample.value)
+        .filter(test_filter(TelemetrySample), TelemetrySample.sensor == sensor,
+                *_range_filters(TelemetrySample.recorded_at, TelemetrySample.recorded_at, start, end))
+        .all()
+    )
+    t = np.fromiter((to_epoch(row.recorded_at) for row in rows), dtype=np.float64, count=len(rows))
+    v = np.fromiter((row.value for row in rows), dtype=np.float64, count=len(rows))
+    return t, v
+
+
+def _raw_series(db, test_filter, sensor, start, end):
+    chunks = (
+        db.query(TelemetryChunk.start_at, TelemetryChunk.offsets, TelemetryChunk.values)
+        .filter(test_filter(TelemetryChunk), TelemetryChunk.sensor == sensor,
+                *_range_filters(TelemetryChunk.start_at, TelemetryChunk.end_at, start, end))
+        .all()
+    )
+    times = [to_epoch(chunk.start_at) + unpack(chunk.offsets) for chunk in chunks]
+    values = [unpack(chunk.values) for chunk in chunks]
+    pending_t, pending_v = _pending_samples(db, test_filter, sensor, start, end)
+    t = np.concatenate(times + [pending_t])
+    v = np.concatenate(values + [pending_v])
+    order = np.argsort(t, kind="stable")
+    t, v = t[order], v[order]
+    # Chunks overlapping the range edges carry samples outside it
+    inside = np.ones(len(t), dtype=bool)
+    if start is not None:
+        inside &= t >= to_epoch(start)
+    if end is not None:
+        inside &= t <= to_epoch(end)
+    return t[inside], v[inside]
+
+
+def _rollup_series(db, test_filter, sensor, start, end, resolution):
+    # The bucket holding `start` begins before it, so buckets are selected from that bucket's start
+    bucket_from = None if start is None else from_epoch(np.floor(to_epoch(start) / resolution) * resolution)
+    # Partial rollups of the same bucket (split compactions) are merged here
+    weighted_sum = func.sum(TelemetryRollup.mean * TelemetryRollup.count)
+    rows = (
+        db.query(TelemetryRollup.bucket_start, func.min(TelemetryRollup.min), func.max(TelemetryRollup.max),
+                 weighted_sum, func.sum(TelemetryRollup.count))
+        .filter(test_filter(TelemetryRollup), TelemetryRollup.sensor == sensor,
+                TelemetryRollup.resolution == resolution,
+                *_range_filters(TelemetryRollup.bucket_start, TelemetryRollup.bucket_start, bucket_from, end))
+        .group_by(TelemetryRollup.bucket_start)
+        .all()
+    )
+    buckets = {to_epoch(row[0]): [row[1], row[2], row[3], row[4]] for row in rows}
+
+    # Samples not compacted yet are bucketed on the fly
+    pending_t, pending_v = _pending_samples(db, test_filter, sensor, start, end)
+    if len(pending_t):
+        order = np.argsort(pending_t, kind="stable")
+        for row in rollup_rows({}, pending_t[order], pending_v[order], resolution):
+            bucket = buckets.setdefault(to_epoch(row["bucket_start"]), [row["min"], row["max"], 0.0, 0])
+            bucket[0] = min(bucket[0], row["min"])
+            bucket[1] = max(bucket[1], row["max"])
+            bucket[2] += row["mean"] * row["count"]
+            bucket[3] += row["count"]
+
+    t = np.asarray(sorted(buckets), dtype=np.float64)
+    stats = np.asarray([buckets[key] for key in t.tolist()], dtype=np.float64).reshape(-1, 4)
+    return t, stats[:, 0], stats[:, 1], stats[:, 2] / np.maximum(stats[:, 3], 1)
+
+
+def raw_series(db, test_column, test_id, sensor, start=None, end=None):
+    """Every stored sample of `sensor` during one test as sorted (timestamps, values) arrays."""
+    return _raw_series(db, lambda model: getattr(model, test_column) == test_id, sensor, start, end)
+
+
+def iter_test_samples(db, test_column, test_id, sensors, batch=500):
+    """Replay every sample of `sensors` recorded during one test in time order.
+
+    Yields (timestamps, sensors, values) arrays one chunk window at a time, so
+    memory stays bounded by a window however long the test ran. Samples not
+    compacted yet come last; they are always newer than the chunks.
+    """
+    def merged(parts):
+        t = np.concatenate([part[0] for part in parts])
+        order = np.argsort(t, kind="stable")
+        return (t[order], np.concatenate([part[1] for part in parts])[order],
+                np.concatenate([part[2] for part in parts])[order])
+
+    test_filter = getattr(TelemetryChunk, test_column) == test_id
+    chunks = (
+        db.query(TelemetryChunk.sensor, TelemetryChunk.start_at, TelemetryChunk.offsets, TelemetryChunk.values)
+        .filter(test_filter, TelemetryChunk.sensor.in_(sensors))
+        .order_by(TelemetryChunk.start_at)
+        .yield_per(batch)
+    )
+    window, parts = None, []
+    for chunk in chunks:
+        start = to_epoch(chunk.start_at)
+        chunk_window = start // CHUNK_SECONDS
+        if parts and chunk_window != window:
+            yield merged(parts)
+            parts = []
+        window = chunk_window
+        values = unpack(chunk.values)
+        parts.append((start + unpack(chunk.offsets), np.full(len(values), chunk.sensor, dtype=object), values))
+    if parts:
+        yield merged(parts)
+
+    def as_arrays(rows):
+        return (np.fromiter((to_epoch(row.recorded_at) for row in rows), dtype=np.float64, count=len(rows)),
+                np.asarray([row.sensor for row in rows], dtype=object),
+                np.fromiter((row.value for row in rows), dtype=np.float64, count=len(rows)))
+
+    pending = (
+        db.query(TelemetrySample.recorded_at, TelemetrySample.sensor, TelemetrySample.value)
+        .filter(getattr(TelemetrySample, test_column) == test_id, TelemetrySample.sensor.in_(sensors))
+        .order_by(TelemetrySample.recorded_at)
+        .yield_per(batch * 20)
+    )
+    rows = []
+    for row in pending:
+        rows.append(row)
+        if len(rows) == batch * 20:
+            yield as_arrays(rows)
+            rows = []
+    if rows:
+        yield as_arrays(rows)
+
+
+def _extent(db, test_filter, sensor):
+    chunk_count, first, last = (
+        db.query(func.coalesce(func.sum(TelemetryChunk.count), 0), func.min(TelemetryChunk.start_at),
+                 func.max(TelemetryChunk.end_at))
+        .filter(test_filter(TelemetryChunk), TelemetryChunk.sensor == sensor)
+        .one()
+    )
+    pending_count, pending_first, pending_last = (
+        db.query(func.count(TelemetrySample.id), func.min(TelemetrySample.recorded_at),
+                 func.max(TelemetrySample.recorded_at))
+        .filter(test_filter(TelemetrySample), TelemetrySample.sensor == sensor)
+        .one()
+    )
+    bounds = [to_epoch(value) for value in (first, last, pending_first, pending_last) if value is not None]
+    if not bounds:
+        return 0, None, None
+    return chunk_count + pending_count, min(bounds), max(bounds)
+
+
+def load_series(db, test_column, test_id, sensor, start=None, end=None, points=1000, method="lttb"):
+    """Series of `sensor` during one test, reduced to about `points` points.
+
+    `test_column` is "static_test_id" or "cyclic_test_id". Narrow ranges come
+    from the raw chunks (decimated with LTTB or min/max); wide ranges from the
+    finest rollup resolution whose bucket count fits the budget.
+    """
+    def test_filter(model):
+        return getattr(model, test_column) == test_id
+
+    total, first, last = _extent(db, test_filter, sensor)
+    series = dict(sensor=sensor, method="raw", resolution=None, timestamps=[], values=[])
+    if not total:
+        return series
+    span = (to_epoch(end) if end else last) - (to_epoch(start) if start else first)
+
+    # Without range bounds the sample count is exact, otherwise assume uniform sampling
+    estimate = total if start is None and end is None else total * span / max(last - first, 1e-9)
+    if estimate <= points * RAW_BUDGET_FACTOR:
+        t, v = _raw_series(db, test_filter, sensor, start, end)
+        if len(t) > points:
+            t, v = (minmax if method == "minmax" else lttb)(t, v, points)
+            series["method"] = method
+        return dict(series, timestamps=t.tolist(), values=v.tolist())
+
+    resolution = next((r for r in ROLLUP_RESOLUTIONS if span / r <= points), ROLLUP_RESOLUTIONS[-1])
+    t, mins, maxs, means = _rollup_series(db, test_filter, sensor, start, end, resolution)
+    return dict(series, method="rollup", resolution=resolution, timestamps=t.tolist(),
+                values=means.tolist(), min=mins.tolist(), max=maxs.tolist())
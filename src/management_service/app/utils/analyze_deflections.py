@@ -0,0 +1,32 @@
+"""Compute static-test deflections from recorded gauge data for whole projects.
+
+    python -m app.utils.analyze_deflections --project 3 --project 4 --workers 8
+"""
+import argparse
+
+from app.data.database import SessionLocal
+from app.data.versions import bump_projects
+from app.telemetry.evaluation import configured_sensor_roles
+from app.telemetry.static_analysis import analyze_project
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--project", type=int, action="append", dest="project_ids", required=True)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        for project_id in args.project_ids:
+            rows_by_test = analyze_project(db, SessionLocal, project_id, configured_sensor_roles(), args.workers)
+            bump_projects(db, [project_id])
+            db.commit()
+            analyzed = sum(1 for rows in rows_by_test.values() if rows)
+            print(f"Project {project_id}: {analyzed} of {len(rows_by_test)} static tests had gauge data")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
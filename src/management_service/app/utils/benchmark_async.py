@@ -0,0 +1,121 @@
+"""Compare the sync (threadpool) and async (DB_ASYNC=1) database modes under load.
+
+Starts one uvicorn server per mode against DATABASE_URL, seeds a device with
+projects, then fires a read-heavy request mix at a fixed concurrency.
+
+    python -m app.utils.benchmark_async --concurrency 200 --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _start_server(async_mode, port):
+    env = dict(os.environ, DB_ASYNC="1" if async_mode else "0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def _wait_ready(client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/devices/", params={"depth": "devices", "limit": 1})
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def _seed(client, projects):
+    device = (await client.post("/devices/", json={"name": "benchmark rig"})).json()
+    for i in range(projects):
+        await client.post(
+            f"/devices/{device['id']}/projects/",
+            json={"name": f"benchmark {i}", "inward_design_pressure": 100 + i, "outward_design_pressure": 80 + i},
+        )
+    return device["id"]
+
+
+async def _run_load(client, device_id, total, concurrency):
+    paths = [
+        f"/devices/{device_id}/projects",
+        f"/devices/{device_id}/projects?depth=projects",
+        "/devices/?depth=devices",
+        "/projects/?limit=20",
+    ]
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "errors": errors,
+    }
+
+
+async def benchmark_mode(async_mode, args):
+    server = _start_server(async_mode, args.port)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            await _wait_ready(client)
+            device_id = await _seed(client, args.projects)
+            return await _run_load(client, device_id, args.requests, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for label, async_mode in (("sync", False), ("async", True)):
+        result = asyncio.run(benchmark_mode(async_mode, args))
+        print(
+            f"{label:5}  {result['throughput']:8.1f} req/s  p50 {result['p50_ms']:7.1f} ms  "
+            f"p99 {result['p99_ms']:7.1f} ms  mean {result['mean_ms']:7.1f} ms  errors {result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
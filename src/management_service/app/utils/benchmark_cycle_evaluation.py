@@ -0,0 +1,113 @@
+"""Measure cyclic-test evaluation throughput, in memory and replayed from storage.
+
+Simulates `--rigs` rigs at `--frequency` Hz for `--seconds` of test time and
+reports how many times faster than real time the evaluator keeps up, first
+fed directly and then replayed from compacted telemetry in a scratch SQLite
+database.
+
+    python -m app.utils.benchmark_cycle_evaluation --rigs 8 --seconds 3600
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.data.models import ActiveTest, Base, CyclicTest, Device, Project
+from app.domain.cycle_counter import CycleEvaluator
+from app.telemetry.evaluation import replay_cyclic_test
+from app.telemetry.fake_publisher import FakeRig, feed
+from app.telemetry.ingestion import ActiveTestRegistry, SampleWriter, TelemetryIngestor
+from app.telemetry.store import compact_samples
+
+GAUGES = ("21", "22")
+
+
+def _rigs(count, frequency):
+    return [
+        FakeRig(device_id, frequency=frequency, low=0.0, high=100.0, period=4.0, seed=device_id,
+                gauges=GAUGES, creep=0.0001)
+        for device_id in range(1, count + 1)
+    ]
+
+
+def bench_in_memory(rigs, seconds):
+    streams = []
+    for rig in rigs:
+        parsed = ((topic.rsplit("/", 1)[1], float(payload)) for topic, payload, _ in rig.messages(seconds))
+        streams.append([(sensor, value) for sensor, value in parsed if sensor == "1" or sensor in GAUGES])
+    evaluators = [CycleEvaluator(0.0, 100.0, 0) for _ in rigs]
+
+    started = time.perf_counter()
+    for evaluator, stream in zip(evaluators, streams):
+        for sensor, value in stream:
+            if sensor == "1":
+                evaluator.add_pressure(value)
+            elif sensor in GAUGES:
+                evaluator.add_deflection(sensor, value)
+    elapsed = time.perf_counter() - started
+    return sum(map(len, streams)), elapsed, evaluators[0].summary()
+
+
+def bench_replay(rigs, seconds):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    db = Session()
+    tests = []
+    for rig in rigs:
+        device = Device(id=rig.device_id, name=f"rig {rig.device_id}")
+        project = Project(name="benchmark", device=device, inward_design_pressure=100.0, outward_design_pressure=100.0)
+        test = CyclicTest(project=project, index=0, type="inward", cycles=0, low_pressure=0.0,
+                          high_pressure=100.0, finished=False)
+        db.add_all([device, project, test])
+        db.flush()
+        db.add(ActiveTest(device_id=device.id, cyclic_test_id=test.id, started_at=datetime.now(timezone.utc)))
+        tests.append(test)
+    db.commit()
+
+    ingestor = TelemetryIngestor(SampleWriter(engine), active_tests=ActiveTestRegistry(Session), max_queue=10_000_000)
+    ingestor.active_tests.refresh(force=True)
+    feed(ingestor, rigs, seconds, start=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    while ingestor.flush():
+        pass
+    while compact_samples(db, datetime(2100, 1, 1, tzinfo=timezone.utc)):
+        pass
+
+    sensor_roles = {}
+    for rig in rigs:
+        sensor_roles[(rig.device_id, "1")] = "pressure"
+        sensor_roles.update(((rig.device_id, gauge), "deflection") for gauge in GAUGES)
+    started = time.perf_counter()
+    evaluators = [replay_cyclic_test(db, test, sensor_roles)[0] for test in tests]
+    elapsed = time.perf_counter() - started
+    db.close()
+    samples = sum(evaluator.samples for evaluator in evaluators) * (1 + len(GAUGES))
+    return samples, elapsed, evaluators[0].summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rigs", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--frequency", type=int, default=20)
+    args = parser.parse_args()
+
+    rigs = _rigs(args.rigs, args.frequency)
+    # The evaluator only consumes the pressure sensor and the gauges of each rig
+    live_rate = args.rigs * args.frequency * (1 + len(GAUGES))
+    print(f"{args.rigs} rigs x {args.frequency} Hz: {live_rate} evaluated samples/s in real time")
+
+    samples, elapsed, summary = bench_in_memory(rigs, args.seconds)
+    print(f"in memory: {samples / elapsed:,.0f} samples/s, {samples / elapsed / live_rate:,.0f}x real time")
+    print(f"  rig 1: {summary}")
+
+    samples, elapsed, summary = bench_replay(rigs, args.seconds)
+    print(f"replay:    {samples / elapsed:,.0f} samples/s, {samples / elapsed / live_rate:,.0f}x real time "
+          f"({samples:,} samples in {elapsed:.2f} s)")
+    print(f"  rig 1: {summary}")
+
+
+if __name__ == "__main__":
+    main()
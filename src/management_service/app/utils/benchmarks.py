@@ -0,0 +1,602 @@
+"""Endpoint and domain micro-benchmarks with a regression check against a baseline.
+
+Every route of app.main is driven in-process through FastAPI's TestClient,
+against a database seeded by app.utils.generate_dataset. The domain
+calculators, the Pydantic serialization of a large ProjectSchema tree and the
+rendering of every device tree through the schemas and from rows
+(app.data.tree_json) are timed as well, and so is a worker's cold start.
+
+    python -m app.utils.benchmarks --save baseline.json
+    python -m app.utils.benchmarks --compare baseline.json --threshold 0.25
+
+Each case records its median and p95 latency over --repeat runs. Endpoints
+also record SQL statements, rows fetched and response bytes per request.
+Those counts are deterministic for a given seed and size, so any increase
+beyond --count-threshold fails a comparison. Latency fails when the median
+grows by more than --threshold and by at least --min-ms. The run also fails
+when a route has no benchmark case.
+
+Without --database-url, a scratch SQLite database is created and seeded.
+Compare baselines made with the same database, seed and size.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.utils.benchmark_async import _percentile
+
+# A worker's cold start: a fresh interpreter importing the app and running its lifespan
+STARTUP_SCRIPT = """
+import asyncio
+import app.main
+
+async def start():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        pass
+
+asyncio.run(start())
+"""
+# Streams that never end; they cannot be timed as a request
+UNTIMED_ROUTES = {("GET", "/devices/{device_id}/live"), ("WS", "/ws/devices/{device_id}/live")}
+WARMUP = 2
+
+
+class _CountingCursor:
+    # Wraps a DBAPI cursor to count the rows SQLAlchemy fetches from it
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._counter.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._counter.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._counter.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SqlCounter:
+    """Statements executed and rows fetched on some engines since the last reset."""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.statements = 0
+        self.rows = 0
+        for engine in engines:
+            event.listen(engine, "after_cursor_execute", self._executed)
+
+    def _executed(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        if context is not None and cursor.description is not None:
+            # The result is built from context.cursor right after this event
+            context.cursor = _CountingCursor(cursor, self)
+
+    def reset(self):
+        self.statements = 0
+        self.rows = 0
+
+
+def _timing(samples):
+    return dict(median_ms=statistics.median(samples) * 1000, p95_ms=_percentile(samples, 0.95) * 1000)
+
+
+class EndpointBench:
+    def __init__(self, client, counter, targets, repeat):
+        self.client = client
+        self.counter = counter
+        self.targets = targets
+        self.repeat = repeat
+        self.results = {}
+        self.covered = set()
+
+    def case(self, method, route, prepare, label=""):
+        """Time `prepare()`'s request; `prepare` runs untimed before every request.
+
+        It returns (path, request kwargs), so writes can set up a fresh target each time.
+        """
+        self.covered.add((method, route))
+        samples, counts = [], None
+        for run in range(WARMUP + self.repeat):
+            path, kwargs = prepare()
+            self.counter.reset()
+            started = time.perf_counter()
+            response = self.client.request(method, path, **kwargs)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {path}: {response.status_code} {response.text[:200]}")
+            if run >= WARMUP:
+                samples.append(elapsed)
+                counts = dict(statements=self.counter.statements, rows=self.counter.rows,
+                              bytes=len(response.content), status=response.status_code)
+        name = f"{method} {route}" + (f" [{label}]" if label else "")
+        self.results[name] = dict(_timing(samples), **counts)
+
+
+def _targets(db):
+    from sqlalchemy import func
+
+    from app.data.models import CyclicTest, Deflection, MissileImpactTest, Project, StaticTest, TelemetryChunk
+
+    finished_project = db.query(MissileImpactTest.project_id).order_by(MissileImpactTest.id).first()[0]
+    telemetry_test_id = db.query(func.min(TelemetryChunk.static_test_id)).scalar()
+    return SimpleNamespace(
+        device_id=db.query(Project.device_id).filter(Project.id == finished_project).scalar(),
+        project_id=finished_project,
+        static_test_id=db.query(StaticTest.id).filter(StaticTest.project_id == finished_project).order_by(StaticTest.index).first()[0],
+        cyclic_test_id=db.query(CyclicTest.id).filter(CyclicTest.project_id == finished_project).order_by(CyclicTest.index).first()[0],
+        telemetry_test_id=telemetry_test_id,
+        telemetry_project_id=db.query(StaticTest.project_id).filter(StaticTest.id == telemetry_test_id).scalar(),
+        missile_impact_test_id=db.query(MissileImpactTest.id).filter(MissileImpactTest.project_id == finished_project).first()[0],
+        deflection_id=db.query(func.min(Deflection.id)).scalar(),
+    )
+
+
+def bench_endpoints(client, counter, targets, repeat):
+    from app.data.response_cache import response_cache
+
+    bench = EndpointBench(client, counter, targets, repeat)
+    t = targets
+    project_body = dict(name="Benchmark project", inward_design_pressure=100.0, outward_design_pressure=80.0)
+    deflection_body = dict(deflection_gauge=1, max_deflection=2.0, permanent_deflection=0.1, recovery=95.0)
+
+    def get(path, **params):
+        return lambda: (path, dict(params=params))
+
+    # Device and project reads are served from the response cache after the
+    # first request; these cases measure building them
+    def uncached(path, **params):
+        def prepare():
+            response_cache.clear()
+            return path, dict(params=params)
+        return prepare
+
+    def new_project():
+        return client.post(f"/devices/{t.device_id}/projects/", json=project_body).json()
+
+    def new_deflection():
+        return client.post(f"/static-tests/{t.static_test_id}/deflections/", json=deflection_body).json()["id"]
+
+    bench.case("GET", "/health/db", get("/health/db"))
+    bench.case("GET", "/metrics", get("/metrics"))
+    for depth in ("devices", "projects", "full"):
+        bench.case("GET", "/devices/", uncached("/devices/", depth=depth, limit=50), label=f"depth={depth}")
+    bench.case("GET", "/devices/", get("/devices/", depth="full", limit=50), label="depth=full cached")
+    bench.case("POST", "/devices/", lambda: ("/devices/", dict(json=dict(name="Benchmark rig"))))
+    bench.case("PUT", "/devices/{device_id}/active-test", lambda: (
+        f"/devices/{t.device_id}/active-test", dict(json=dict(static_test_id=t.static_test_id))))
+    bench.case("GET", "/devices/{device_id}/active-test", get(f"/devices/{t.device_id}/active-test"))
+
+    def set_active_test():
+        client.put(f"/devices/{t.device_id}/active-test", json=dict(static_test_id=t.static_test_id))
+        return f"/devices/{t.device_id}/active-test", {}
+    bench.case("DELETE", "/devices/{device_id}/active-test", set_active_test)
+
+    for depth in ("projects", "full"):
+        bench.case("GET", "/devices/{device_id}/projects",
+                   uncached(f"/devices/{t.device_id}/projects", depth=depth, limit=50), label=f"depth={depth}")
+        bench.case("GET", "/projects/", uncached("/projects/", depth=depth, limit=50), label=f"depth={depth}")
+    bench.case("GET", "/devices/{device_id}/projects",
+               get(f"/devices/{t.device_id}/projects", depth="full", limit=50), label="depth=full cached")
+    bench.case("GET", "/projects/", uncached("/projects/", finished="false", depth="projects", limit=50), label="unfinished")
+    bench.case("GET", "/projects/{project_id}", uncached(f"/projects/{t.project_id}"))
+    bench.case("GET", "/projects/{project_id}", get(f"/projects/{t.project_id}"), label="cached")
+
+    def conditional(path, **params):
+        etag = client.get(path, params=params).headers["ETag"]
+        return lambda: (path, dict(params=params, headers={"If-None-Match": etag}))
+    bench.case("GET", "/devices/{device_id}/projects",
+               conditional(f"/devices/{t.device_id}/projects", depth="full", limit=50), label="not modified")
+    bench.case("GET", "/projects/{project_id}", conditional(f"/projects/{t.project_id}"), label="not modified")
+    bench.case("POST", "/devices/{device_id}/projects/",
+               lambda: (f"/devices/{t.device_id}/projects/", dict(json=project_body)))
+    bench.case("POST", "/devices/{device_id}/projects/batch",
+               lambda: (f"/devices/{t.device_id}/projects/batch", dict(json=[project_body] * 20)), label="20 projects")
+    bench.case("GET", "/test-plans/preview", get("/test-plans/preview", inward_design_pressure=100, outward_design_pressure=80))
+    bench.case("GET", "/test-plans/cache", get("/test-plans/cache"))
+    bench.case("GET", "/responses/cache", get("/responses/cache"))
+
+    scratch = new_project()
+    bench.case("PUT", "/projects/{project_id}", lambda: (f"/projects/{scratch['id']}", dict(json=project_body)))
+    bench.case("PUT", "/projects/{project_id}/static_tests", lambda: (f"/projects/{scratch['id']}/static_tests", dict(json=[
+        dict(type=test["type"], index=test["index"], duration=test["duration"], pressure=test["pressure"])
+        for test in scratch["static_tests"]
+    ])))
+    bench.case("PUT", "/projects/{project_id}/cyclic_tests", lambda: (f"/projects/{scratch['id']}/cyclic_tests", dict(json=[
+        dict(type=test["type"], index=test["index"], cycles=test["cycles"], low_pressure=test["low_pressure"],
+             high_pressure=test["high_pressure"])
+        for test in scratch["cyclic_tests"]
+    ])))
+    unfinished_static = scratch["static_tests"][0]
+    bench.case("PUT", "/static-tests/{static_test_id}/", lambda: (f"/static-tests/{unfinished_static['id']}/", dict(json=dict(
+        type=unfinished_static["type"], index=0, duration=unfinished_static["duration"], pressure=unfinished_static["pressure"]))))
+
+    def first_static_test():
+        project = new_project()
+        return f"/projects/{project['id']}/static_tests/{project['static_tests'][0]['id']}/finish", {}
+    bench.case("PUT", "/projects/{project_id}/static_tests/{static_test_id}/finish", first_static_test)
+
+    def first_cyclic_test():
+        project = new_project()
+        return f"/projects/{project['id']}/cyclic_tests/{_first_cyclic_test_id(project['id'])}/finish", {}
+    bench.case("PUT", "/projects/{project_id}/cyclic_tests/{cyclic_test_id}/finish", first_cyclic_test)
+
+    bench.case("POST", "/static-tests/{static_test_id}/deflections/",
+               lambda: (f"/static-tests/{t.static_test_id}/deflections/", dict(json=deflection_body)))
+    bench.case("PUT", "/deflections/{deflection_id}/",
+               lambda: (f"/deflections/{t.deflection_id}/", dict(json=deflection_body)))
+    bench.case("DELETE", "/deflections/{deflection_id}/", lambda: (f"/deflections/{new_deflection()}/", {}))
+    bench.case("POST", "/static-tests/{static_test_id}/deflections/batch",
+               lambda: (f"/static-tests/{t.static_test_id}/deflections/batch", dict(json=[
+                   dict(deflection_body, deflection_gauge=gauge) for gauge in range(10)
+               ])), label="10 creates")
+    bench.case("POST", "/missile-impact-tests/{missile_impact_test_id}/shots/batch",
+               lambda: (f"/missile-impact-tests/{t.missile_impact_test_id}/shots/batch", dict(json=[
+                   dict(area=float(area), velocity=15.0, result=True, note="") for area in range(10)
+               ])), label="10 creates")
+    # Finished tests are not analyzed, and the dataset only records telemetry for finished ones
+    def reopened(path, **params):
+        def prepare():
+            _reopen_static_test(t.telemetry_test_id)
+            return path, dict(params=params)
+        return prepare
+
+    if t.telemetry_test_id is not None:
+        bench.case("POST", "/static-tests/{static_test_id}/deflections/analyze",
+                   reopened(f"/static-tests/{t.telemetry_test_id}/deflections/analyze"))
+        bench.case("GET", "/static-tests/{static_test_id}/telemetry/{sensor}",
+                   get(f"/static-tests/{t.telemetry_test_id}/telemetry/1", points=1000))
+        bench.case("POST", "/projects/{project_id}/static-tests/analyze",
+                   reopened(f"/projects/{t.telemetry_project_id}/static-tests/analyze", workers=2))
+    else:
+        bench.case("POST", "/projects/{project_id}/static-tests/analyze",
+                   lambda: (f"/projects/{t.project_id}/static-tests/analyze", dict(params=dict(workers=2))))
+    scratch_cyclic_id = _first_cyclic_test_id(scratch["id"])
+    bench.case("PUT", "/cyclic-tests/{cyclic_test_id}/", lambda: (f"/cyclic-tests/{scratch_cyclic_id}/", dict(json=dict(
+        index=0, cycles=100, type="inward", low_pressure=10.0, high_pressure=50.0))))
+    bench.case("GET", "/cyclic-tests/{cyclic_test_id}/telemetry/{sensor}",
+               get(f"/cyclic-tests/{t.cyclic_test_id}/telemetry/1", points=1000))
+    bench.case("POST", "/cyclic-tests/{cyclic_test_id}/evaluate",
+               lambda: (f"/cyclic-tests/{t.cyclic_test_id}/evaluate", dict(params=dict(save="false"))))
+
+    bench.case("POST", "/projects/{project_id}/reports", lambda: (f"/projects/{t.project_id}/reports", {}))
+    key = _wait_for_report(client, t.project_id)
+    bench.case("GET", "/projects/{project_id}/report", get(f"/projects/{t.project_id}/report"))
+    bench.case("GET", "/reports/{report_format}/{key}/status", get(f"/reports/html/{key}/status"))
+    bench.case("GET", "/reports/{report_format}/{key}", get(f"/reports/html/{key}"))
+
+    import_body = dict(projects=[dict(project_body, device="Rig 1", name=f"Imported {number}") for number in range(50)])
+    bench.case("POST", "/import", lambda: ("/import", dict(json=import_body, params=dict(dry_run="true"))), label="50 projects")
+    import_csv = "device,name,inward_design_pressure,outward_design_pressure\n" + "".join(
+        f"Rig 1,Imported {number},100,80\n" for number in range(50)
+    )
+    bench.case("POST", "/import/{entity}", lambda: ("/import/projects", dict(
+        content=import_csv, headers={"content-type": "text/csv"}, params=dict(dry_run="true"))), label="50 projects")
+    for kind in ("projects", "static_tests"):
+        bench.case("GET", "/export/{kind}", get(f"/export/{kind}", format="ndjson"), label=f"{kind} ndjson")
+    bench.case("GET", "/export/{kind}", get("/export/telemetry", format="csv", device_id=t.device_id), label="telemetry csv")
+    return bench
+
+
+# CyclicTestSchema has no id, so it is looked up
+def _first_cyclic_test_id(project_id):
+    from app.data.database import SessionLocal
+    from app.data.models import CyclicTest
+
+    db = SessionLocal()
+    try:
+        return db.query(CyclicTest.id).filter(CyclicTest.project_id == project_id, CyclicTest.index == 0).scalar()
+    finally:
+        db.close()
+
+
+def _reopen_static_test(static_test_id):
+    from app.data.database import SessionLocal
+    from app.data.models import StaticTest
+
+    db = SessionLocal()
+    try:
+        db.query(StaticTest).filter(StaticTest.id == static_test_id).update({StaticTest.finished: False})
+        db.commit()
+    finally:
+        db.close()
+
+
+def _wait_for_report(client, project_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.post(f"/projects/{project_id}/reports").json()
+        if job["status"] == "done":
+            return job["key"]
+        if job["status"] == "failed":
+            raise RuntimeError(f"Report failed: {job['detail']}")
+        time.sleep(0.1)
+    raise RuntimeError("Report did not render in time")
+
+
+def _routes(app):
+    from fastapi.routing import APIRoute, APIWebSocketRoute
+
+    routes = set()
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            routes.update((method, route.path) for method in route.methods if method != "HEAD")
+        elif isinstance(route, APIWebSocketRoute):
+            routes.add(("WS", route.path))
+    return routes
+
+
+def _time(function, repeat):
+    for _ in range(WARMUP):
+        function()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return _timing(samples)
+
+
+def _large_project(static_tests=200, deflections=20, cyclic_tests=200, missile_tests=50, shots=20):
+    deflection = dict(id=1, deflection_gauge=1, max_deflection=2.5, permanent_deflection=0.1, recovery=96.0)
+    return SimpleNamespace(
+        id=1, device_id=1, name="Large project", inward_design_pressure=100.0, outward_design_pressure=80.0,
+        static_tests=[SimpleNamespace(
+            id=i, index=i, type="inward", pressure_factor="Structural Pressure", pressure=150.0, duration=30,
+            finished=True, deflections=[SimpleNamespace(**dict(deflection, deflection_gauge=g)) for g in range(deflections)],
+        ) for i in range(static_tests)],
+        cyclic_tests=[SimpleNamespace(
+            index=i, type="inward", cycles=3500, low_pressure=20.0, high_pressure=50.0, finished=True,
+            completed_cycles=3500, deflection=1.2, permanent_set=0.01, result=True, note=None,
+        ) for i in range(cyclic_tests)],
+        infiltration_tests=[SimpleNamespace(id=1, type="air", pressure=75.0, duration=15.0, leakage=0.1)],
+        missile_impact_tests=[SimpleNamespace(
+            id=i, missile="D", missile_weight=4.1,
+            shots=[SimpleNamespace(id=s, area=1.0, velocity=15.3, result=True, note="") for s in range(shots)],
+        ) for i in range(missile_tests)],
+    )
+
+
+def bench_domain(repeat):
+    import numpy as np
+
+    from app.data.schema import ProjectSchema
+    from app.domain.cycle_counter import CycleEvaluator
+    from app.domain.deflection_analysis import analyze_static_test
+    from app.domain.downsampling import lttb, minmax
+    from app.domain.test_plan import TestPlan
+    from app.domain.test_plan_cache import TestPlanCache
+    from app.domain.test_plan_engine import TestPlanEngine
+    from app.utils.generate_dataset import simulate_static_test
+
+    rng = np.random.default_rng(0)
+    inward = (40 + 5 * rng.integers(0, 33, 1000)).astype(float).tolist()
+    outward = (40 + 5 * rng.integers(0, 33, 1000)).astype(float).tolist()
+    engine = TestPlanEngine()
+    cache = TestPlanCache()
+    cache.get(100.0, 80.0)
+    t = np.arange(1_000_000) / 20.0
+    v = np.sin(t) * 100 + rng.normal(0, 1, len(t))
+    cyclic_pressure = (50 * (1 - np.cos(2 * np.pi * np.arange(100_000) / 80)) / 2).tolist()
+    static_t, static_p, static_gauges = simulate_static_test(
+        rng, datetime(2024, 1, 1, tzinfo=timezone.utc), 150.0, 600, 3, 20
+    )
+
+    def evaluate_cycles():
+        evaluator = CycleEvaluator(0.0, 50.0, 1000)
+        for value in cyclic_pressure:
+            evaluator.add_pressure(value)
+
+    project = _large_project()
+    validated = ProjectSchema.model_validate(project, from_attributes=True)
+    cases = {
+        "domain TestPlan.static_tests_many [1000 projects]": lambda: TestPlan.static_tests_many(inward, outward),
+        "domain TestPlan.cyclic_tests_many [1000 projects]": lambda: TestPlan.cyclic_tests_many(inward, outward),
+        "domain TestPlanEngine.static_plan [1000 projects]": lambda: engine.static_plan(inward, outward),
+        "domain TestPlanEngine.cyclic_plan [1000 projects]": lambda: engine.cyclic_plan(inward, outward),
+        "domain TestPlanCache.get [hit]": lambda: cache.get(100.0, 80.0),
+        "domain CycleEvaluator [100k samples]": evaluate_cycles,
+        "domain analyze_static_test [3 gauges, 10 min at 20 Hz]": lambda: analyze_static_test(
+            static_t, static_p, [(static_t, g) for g in static_gauges], 150.0, 600),
+        "domain lttb [1M to 1000]": lambda: lttb(t, v, 1000),
+        "domain lttb [80k to 20000]": lambda: lttb(t[:80_000], v[:80_000], 20_000),
+        "domain minmax [1M to 1000]": lambda: minmax(t, v, 1000),
+        "serialize ProjectSchema.model_validate [large tree]": lambda: ProjectSchema.model_validate(project, from_attributes=True),
+        "serialize ProjectSchema.model_dump_json [large tree]": validated.model_dump_json,
+    }
+    results = {name: _time(function, repeat) for name, function in cases.items()}
+    results["serialize ProjectSchema.model_dump_json [large tree]"]["bytes"] = len(validated.model_dump_json())
+    return results
+
+
+def bench_serialization(repeat):
+    from typing import List
+
+    from pydantic import TypeAdapter
+
+    from app.data import tree_json
+    from app.data.database import SessionLocal
+    from app.data.loaders import device_options
+    from app.data.models import Device
+    from app.data.schema import DeviceSchema, TreeDepth
+
+    adapter = TypeAdapter(List[DeviceSchema])
+    everything = lambda statement: statement.order_by(Device.id)
+    db = SessionLocal()
+
+    def schemas():
+        db.expunge_all()
+        devices = everything(db.query(Device).options(*device_options(TreeDepth.full))).all()
+        return adapter.dump_json([DeviceSchema.model_validate(device, from_attributes=True) for device in devices], by_alias=True)
+
+    def rows():
+        return tree_json.render(db, DeviceSchema, Device, everything)[1]
+
+    try:
+        cases = {"serialize device trees [schemas]": schemas}
+        if tree_json.render(db, DeviceSchema, Device, everything) is not None:
+            cases["serialize device trees [rows]"] = rows
+        else:
+            print("The row renderer declined the device trees; its case was skipped", file=sys.stderr)
+        results = {}
+        for name, function in cases.items():
+            results[name] = _time(function, repeat)
+            results[name]["bytes"] = len(function())
+        return results
+    finally:
+        db.close()
+
+
+def bench_startup(repeat):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    start = lambda: subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=root, check=True, capture_output=True)
+    return {"startup import app.main and lifespan [cold process]": _time(start, repeat)}
+
+
+def run(args):
+    # The app reads its settings at import, so they are set before importing it
+    scratch = None
+    if args.database_url is None:
+        scratch = tempfile.mkdtemp(prefix="benchmarks-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{scratch}/benchmarks.sqlite"
+        os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(scratch, "reports"))
+    else:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from fastapi.testclient import TestClient
+
+    from app.data import database
+    from app.data.database import SessionLocal
+    from app.data.migrations import run_migrations
+    from app.main import app
+    from app.utils.generate_dataset import generate_dataset
+
+    run_migrations(database.engine)
+    if scratch is not None or args.seed_database:
+        db = SessionLocal()
+        try:
+            generate_dataset(db, devices=3, projects=args.projects, telemetry_tests=5, seed=args.seed)
+        finally:
+            db.close()
+
+    engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+    counter = SqlCounter(engines)
+    db = SessionLocal()
+    try:
+        targets = _targets(db)
+    finally:
+        db.close()
+
+    with TestClient(app) as client:
+        bench = bench_endpoints(client, counter, targets, args.repeat)
+    results = dict(bench.results)
+    results.update(bench_domain(args.repeat))
+    results.update(bench_serialization(args.repeat))
+    results.update(bench_startup(args.repeat))
+    uncovered = sorted(_routes(app) - bench.covered - UNTIMED_ROUTES)
+    if targets.telemetry_test_id is None:
+        print("No telemetry in the database; telemetry cases were skipped", file=sys.stderr)
+    return dict(
+        meta=dict(
+            python=platform.python_version(), machine=platform.machine(), database=database.engine.dialect.name,
+            projects=args.projects, seed=args.seed, repeat=args.repeat,
+            created_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        ),
+        cases=results,
+        uncovered=[f"{method} {path}" for method, path in uncovered],
+    )
+
+
+def compare(baseline, current, threshold, count_threshold, min_ms):
+    """Lines describing every regression of `current` against `baseline`."""
+    regressions = []
+    for name, base in baseline["cases"].items():
+        case = current["cases"].get(name)
+        if case is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+        if case["median_ms"] > base["median_ms"] * (1 + threshold) and case["median_ms"] - base["median_ms"] >= min_ms:
+            regressions.append(f"{name}: median {base['median_ms']:.2f} -> {case['median_ms']:.2f} ms")
+        for metric in ("statements", "rows", "bytes"):
+            if metric in base and case.get(metric, 0) > base[metric] * (1 + count_threshold):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {case[metric]}")
+    return regressions
+
+
+def _print(results, baseline=None):
+    cases = results["cases"]
+    width = max(len(name) for name in cases)
+    print(f"{'case':{width}}  {'median ms':>9}  {'p95 ms':>8}  {'base ms':>8}  {'stmts':>5}  {'rows':>6}  {'bytes':>8}")
+    for name, case in cases.items():
+        base = (baseline or {}).get("cases", {}).get(name, {})
+        print(
+            f"{name:{width}}  {case['median_ms']:9.2f}  {case['p95_ms']:8.2f}  "
+            f"{base.get('median_ms', float('nan')):8.2f}  {case.get('statements', ''):>5}  "
+            f"{case.get('rows', ''):>6}  {case.get('bytes', ''):>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="benchmark an existing database instead of a scratch SQLite one")
+    parser.add_argument("--seed-database", action="store_true", help="seed --database-url before benchmarking")
+    parser.add_argument("--projects", type=int, default=300, help="projects in the seeded dataset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="fail on regressions against this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative growth of median latency")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="latency growth below this is noise")
+    parser.add_argument("--count-threshold", type=float, default=0.0,
+                        help="allowed relative growth of statements, rows and bytes")
+    args = parser.parse_args()
+
+    results = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print(results, baseline)
+
+    failed = False
+    if results["uncovered"]:
+        print("Routes without a benchmark case: " + ", ".join(results["uncovered"]), file=sys.stderr)
+        failed = True
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold, args.count_threshold, args.min_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        failed = failed or bool(regressions)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
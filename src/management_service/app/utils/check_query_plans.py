@@ -0,0 +1,235 @@
+"""Flag full table scans in the query plans of every statement the API issues.
+
+Drives every route through the benchmark cases (app.utils.benchmarks) against
+a large seeded database, records each distinct statement with the parameters
+it first ran with, and EXPLAINs it afterwards: EXPLAIN QUERY PLAN on SQLite,
+EXPLAIN (FORMAT JSON) on Postgres. Statistics are refreshed with ANALYZE
+first, so the planner sees the seeded sizes.
+
+A scan of a table holding at least --min-rows rows is reported together with
+the requests that issued it, unless every one of those requests is listed in
+EXPECTED_SCANS as reading whole tables. Exits non-zero on any unexpected scan,
+so it can run in CI.
+
+    python -m app.utils.check_query_plans
+    python -m app.utils.check_query_plans --projects 5000 --verbose
+    python -m app.utils.check_query_plans --database-url postgresql://... --seed-database
+
+Statements the telemetry ingestion service issues are not covered; they are
+inserts and lookups by primary key.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import defaultdict
+
+# Requests that read most of a table, where a scan is the right plan: request -> why.
+# A trailing * matches any path with that prefix.
+EXPECTED_SCANS = {
+    "GET /devices/": "every device with its whole tree; the benchmark seeds fewer devices than a page",
+    "GET /projects/": "first page of all projects in id order, or every project's open tests for `finished`",
+    "GET /export/*": "streams every row of the exported table",
+}
+# Statements that read no table or cannot be EXPLAINed
+SKIPPED_PREFIXES = ("INSERT", "PRAGMA", "SAVEPOINT", "RELEASE", "ROLLBACK", "BEGIN", "COMMIT", "EXPLAIN", "ANALYZE")
+
+
+class StatementRecorder:
+    """Distinct statements run on an engine, with their first parameters and the requests that ran them."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements = {}
+        self.sources = defaultdict(set)
+        self.current = None
+        self._engine = engine
+        event.listen(engine, "before_cursor_execute", self._executed)
+
+    def stop(self):
+        from sqlalchemy import event
+
+        event.remove(self._engine, "before_cursor_execute", self._executed)
+
+    def _executed(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or statement.lstrip().upper().startswith(SKIPPED_PREFIXES):
+            return
+        self.statements.setdefault(statement, parameters)
+        if self.current is not None:
+            self.sources[statement].add(self.current)
+
+
+class _RecordingClient:
+    # Tells the recorder which request is running; the benchmark cases only call request() and the verbs
+    def __init__(self, client, recorder):
+        self._client = client
+        self._recorder = recorder
+
+    def request(self, method, path, **kwargs):
+        self._recorder.current = f"{method} {path}"
+        try:
+            return self._client.request(method, path, **kwargs)
+        finally:
+            self._recorder.current = None
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+
+def _sqlite_scans(conn, statement, parameters):
+    """(table, plan line) of every full scan in a SQLite plan."""
+    scans = []
+    for _, _, _, detail in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters):
+        # "SCAN t" reads every row; "SCAN t USING [COVERING] INDEX i" every index entry
+        if detail.startswith("SCAN ") and " SUBQUERY " not in f" {detail} ":
+            table = detail.split()[1]
+            if not table.startswith(("(", "CONSTANT")):
+                scans.append((table, detail))
+    return scans
+
+
+def _postgres_scans(conn, statement, parameters):
+    """(table, plan line) of every sequential scan in a Postgres plan."""
+    [(plan,)] = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).all()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans, nodes = [], [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan":
+            scans.append((node["Relation Name"], f"Seq Scan on {node['Relation Name']} (rows={node['Plan Rows']})"))
+        nodes.extend(node.get("Plans", ()))
+    return scans
+
+
+def _expected_for(source):
+    method, path = source.split(" ", 1)
+    path = path.split("?", 1)[0]
+    for request, reason in EXPECTED_SCANS.items():
+        if request.endswith("*") and f"{method} {path}".startswith(request[:-1]) or request == f"{method} {path}":
+            return reason
+    return None
+
+
+def _expected(sources):
+    """Why scans are fine for all of `sources`, or None if any of them should not scan."""
+    reasons = [_expected_for(source) for source in sources]
+    if not reasons or None in reasons:
+        return None
+    return "; ".join(sorted(set(reasons)))
+
+
+def explain_all(engine, recorder, min_rows):
+    """(unexpected, expected) scans: lists of (table, rows, plan line, statement, sources, reason)."""
+    from sqlalchemy import inspect, text
+
+    explain = _postgres_scans if engine.dialect.name == "postgresql" else _sqlite_scans
+    unexpected, expected = [], []
+    with engine.connect() as conn:
+        sizes = {table: conn.scalar(text(f'SELECT count(*) FROM "{table}"')) for table in inspect(conn).get_table_names()}
+        for statement, parameters in recorder.statements.items():
+            try:
+                scans = explain(conn, statement, parameters)
+            except Exception as exc:
+                print(f"Could not EXPLAIN ({exc.__class__.__name__}): {statement[:200]}", file=sys.stderr)
+                conn.rollback()
+                continue
+            for table, plan in scans:
+                rows = sizes.get(table, 0)
+                if rows < min_rows:
+                    continue
+                sources = sorted(recorder.sources[statement])
+                reason = _expected(sources)
+                found = (table, rows, plan, statement, sources, reason)
+                (unexpected if reason is None else expected).append(found)
+        conn.rollback()
+    return unexpected, expected
+
+
+def _print(scan, verbose):
+    table, rows, plan, statement, sources, reason = scan
+    print(f"{table} ({rows} rows): {plan}")
+    if reason is not None:
+        print(f"  expected: {reason}")
+    for source in sources[:5]:
+        print(f"  from {source}")
+    if len(sources) > 5:
+        print(f"  and {len(sources) - 5} more requests")
+    print("  " + (statement if verbose else " ".join(statement.split())[:300]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="explain against this database instead of a seeded scratch SQLite one")
+    parser.add_argument("--seed-database", action="store_true", help="seed --database-url first")
+    parser.add_argument("--projects", type=int, default=2000, help="projects in the seeded dataset")
+    parser.add_argument("--min-rows", type=int, default=1000, help="ignore scans of tables smaller than this")
+    parser.add_argument("--verbose", action="store_true", help="print whole statements and the expected scans")
+    args = parser.parse_args()
+
+    # The app reads its settings at import, so they are set before importing it
+    scratch = None
+    if args.database_url is None:
+        scratch = tempfile.TemporaryDirectory(prefix="query-plans-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}/query_plans.sqlite"
+        os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(scratch.name, "reports"))
+    else:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DB_ASYNC"] = "0"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+
+    from app.data.database import SessionLocal, get_engine
+    from app.data.migrations import run_migrations
+    from app.main import app
+    from app.utils.benchmarks import SqlCounter, UNTIMED_ROUTES, _routes, _targets, bench_endpoints
+    from app.utils.generate_dataset import generate_dataset
+
+    engine = get_engine()
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        if scratch is not None or args.seed_database:
+            generate_dataset(db, devices=10, projects=args.projects, telemetry_tests=5)
+        targets = _targets(db)
+    finally:
+        db.close()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    recorder = StatementRecorder(engine)
+    with TestClient(app) as client:
+        bench = bench_endpoints(_RecordingClient(client, recorder), SqlCounter([engine]), targets, repeat=1)
+    recorder.stop()
+    uncovered = sorted(_routes(app) - bench.covered - UNTIMED_ROUTES)
+
+    unexpected, expected = explain_all(engine, recorder, args.min_rows)
+    if args.verbose:
+        for scan in expected:
+            _print(scan, args.verbose)
+    for scan in unexpected:
+        _print(scan, args.verbose)
+    print(f"{len(recorder.statements)} distinct statements explained on {engine.dialect.name}: "
+          f"{len(unexpected)} unexpected and {len(expected)} expected scans of tables with {args.min_rows}+ rows")
+    if uncovered:
+        print("Routes without a benchmark case, not checked: " + ", ".join(f"{m} {p}" for m, p in uncovered))
+    engine.dispose()
+    if scratch is not None:
+        scratch.cleanup()
+    sys.exit(1 if unexpected else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Check that the row-based JSON renderer matches the schemas byte for byte.
+
+Renders every device list depth, every device's projects and every project
+tree of DATABASE_URL both ways, plus edge values (non-ASCII and control
+characters, extreme and non-finite floats, NULL optionals, empty child lists)
+in a scratch SQLite database, and reports each difference. Exits non-zero on
+any mismatch, so it can run in CI; tests/test_serialization.py runs the same
+cases.
+
+    python -m app.utils.check_serialization
+    python -m app.utils.check_serialization --projects 200 --throughput
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def _schema_render(db, schema, model, statement_filter, options, many=True):
+    from typing import List
+
+    from pydantic import TypeAdapter
+
+    items = statement_filter(db.query(model).options(*options)).all()
+    if not many:
+        return TypeAdapter(schema).dump_json(schema.model_validate(items[0], from_attributes=True), by_alias=True)
+    models = [schema.model_validate(item, from_attributes=True) for item in items]
+    return TypeAdapter(List[schema]).dump_json(models, by_alias=True)
+
+
+def _cases(db):
+    """(name, schema, model, statement filter, loader options, many) of every response to compare."""
+    from app.data.filters import paginate, project_criteria
+    from app.data.loaders import device_options, project_options
+    from app.data.models import Device, Project
+    from app.data.schema import ProjectSchema, TreeDepth
+    from app.main import DEVICE_DEPTH_SCHEMAS, PROJECT_DEPTH_SCHEMAS
+
+    def page(model, after=None, limit=None, *criteria):
+        return lambda statement: paginate(statement.filter(*criteria), model.id, after, limit)
+
+    for depth in TreeDepth:
+        yield f"devices depth={depth.value}", DEVICE_DEPTH_SCHEMAS[depth], Device, page(Device), device_options(depth), True
+    unfinished = project_criteria(finished=False)
+    yield ("devices depth=projects unfinished", DEVICE_DEPTH_SCHEMAS[TreeDepth.projects], Device, page(Device),
+           device_options(TreeDepth.projects, unfinished), True, {"projects": unfinished})
+    for (device_id,) in db.query(Device.id).order_by(Device.id):
+        for depth in (TreeDepth.projects, TreeDepth.full):
+            yield (f"device {device_id} projects depth={depth.value}", PROJECT_DEPTH_SCHEMAS[depth], Project,
+                   page(Project, None, None, Project.device_id == device_id), project_options(depth), True)
+    for (project_id,) in db.query(Project.id).order_by(Project.id):
+        yield (f"project {project_id}", ProjectSchema, Project, page(Project, None, None, Project.id == project_id),
+               project_options(TreeDepth.full), False)
+
+
+def check(db, verbose=False):
+    from app.data import tree_json
+
+    mismatches = declined = compared = 0
+    for name, schema, model, statement_filter, options, many, *child_criteria in _cases(db):
+        criteria_by_child = child_criteria[0] if child_criteria else None
+        expected = _schema_render(db, schema, model, statement_filter, options, many)
+        rendered = tree_json.render(db, schema, model, statement_filter, criteria_by_child, many=many)
+        compared += 1
+        if rendered is None:
+            declined += 1
+            if verbose:
+                print(f"declined: {name}")
+            continue
+        if rendered[1] != expected:
+            mismatches += 1
+            at = next((i for i, (a, b) in enumerate(zip(rendered[1], expected)) if a != b), min(len(rendered[1]), len(expected)))
+            print(f"MISMATCH {name} at byte {at}:\n  fast:    {rendered[1][max(0, at - 60):at + 60]!r}\n"
+                  f"  schemas: {expected[max(0, at - 60):at + 60]!r}")
+    return compared, declined, mismatches
+
+
+def _edge_rows(db):
+    """Add devices whose values exercise string escaping, float formatting, NULLs and empty lists."""
+    from datetime import datetime, timezone
+
+    from app.data.models import CyclicTest, Deflection, Device, InfiltrationTest, MissileImpactTest, Project, Shot, StaticTest
+
+    device = Device(name='Rig "ü" \\ \n\t\x01   😀')
+    project = Project(name="Édge 1e5 project", device=device, inward_design_pressure=1e-7, outward_design_pressure=-0.0,
+                      created_at=datetime(2024, 2, 29, 23, 59, 59, 999999, tzinfo=timezone.utc))
+    static_test = StaticTest(project=project, index=0, finished=True, pressure_factor="1.5", pressure=0.1 + 0.2,
+                             duration=30, type="inward")
+    static_test.deflections = [
+        Deflection(deflection_gauge=1, max_deflection=5e-324, permanent_deflection=1.0791922236933063e-05, recovery=100.0),
+        Deflection(deflection_gauge=2, max_deflection=123456789.123, permanent_deflection=2.5, recovery=99.99999999999999),
+    ]
+    project.cyclic_tests = [
+        CyclicTest(index=0, finished=False, type="inward", cycles=0, low_pressure=0.0, high_pressure=1.0),
+        CyclicTest(index=1, finished=True, type="outward", cycles=3500, low_pressure=-20.0, high_pressure=-50.5,
+                   completed_cycles=3500, deflection=0.25, permanent_set=0.0, result=False, note="Permanent set above limit"),
+    ]
+    project.infiltration_tests = [InfiltrationTest(type="water", pressure=300.0, duration=15.0, leakage=0.0)]
+    missile_test = MissileImpactTest(project=project, missile="D", missile_weight=4.1)
+    missile_test.shots = [Shot(area=1.0, velocity=15.3, result=True, note="")]
+    # Floats pydantic writes with an exponent, and non-finite ones: these projects must be declined, not
+    # mis-rendered. SQLite stores NaN as NULL, so the NaN only reaches the renderers on PostgreSQL.
+    Project(name="Huge", device=device, inward_design_pressure=1e16, outward_design_pressure=80.0)
+    infinite = Project(name="Infinite", device=device, inward_design_pressure=50.0, outward_design_pressure=50.0)
+    infinite_test = StaticTest(project=infinite, index=0, finished=True, pressure_factor="1.5", pressure=75.0,
+                               duration=10, type="inward")
+    infinite_test.deflections = [Deflection(deflection_gauge=1, max_deflection=float("inf"),
+                                            permanent_deflection=0.0, recovery=float("-inf"))]
+    infinite.cyclic_tests = [CyclicTest(index=0, finished=True, type="inward", cycles=1, low_pressure=0.0,
+                                        high_pressure=1.0, deflection=float("nan"))]
+    # Empty child lists at every level, on a device the fast path renders
+    plain = Device(name="Plain rig")
+    Project(name="Empty project", device=plain, inward_design_pressure=40.0, outward_design_pressure=40.0)
+    childless = Project(name="Childless tests", device=plain, inward_design_pressure=40.0, outward_design_pressure=40.0)
+    StaticTest(project=childless, index=0, finished=False, pressure_factor="1.5", pressure=60.0, duration=10,
+               type="inward")
+    MissileImpactTest(project=childless, missile="A", missile_weight=0.002)
+    db.add_all([device, plain, Device(name="Empty rig")])
+    db.commit()
+
+
+def throughput(db, repeat):
+    """Median (seconds, bytes) per render of every device's full tree, both ways, or None if the fast path declines."""
+    import statistics
+
+    from app.data import tree_json
+    from app.data.loaders import device_options
+    from app.data.models import Device
+    from app.data.schema import DeviceSchema, TreeDepth
+
+    def timed(render):
+        samples = []
+        for _ in range(repeat):
+            db.expunge_all()
+            started = time.perf_counter()
+            size = len(render())
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples), size
+
+    everything = lambda statement: statement.order_by(Device.id)
+    if tree_json.render(db, DeviceSchema, Device, everything) is None:
+        return None
+    schemas = timed(lambda: _schema_render(db, DeviceSchema, Device, everything, device_options(TreeDepth.full)))
+    fast = timed(lambda: tree_json.render(db, DeviceSchema, Device, everything)[1])
+    return schemas, fast
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="check an existing database instead of a seeded scratch SQLite one")
+    parser.add_argument("--projects", type=int, default=100, help="projects in the seeded dataset")
+    parser.add_argument("--throughput", action="store_true", help="also time full device trees both ways")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true", help="list the responses the fast path declined")
+    args = parser.parse_args()
+
+    scratch = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        scratch = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}/serialization.sqlite"
+    os.environ["FAST_JSON"] = "1"
+
+    from app.data.database import SessionLocal, engine
+    from app.data.migrations import run_migrations
+
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        if scratch is not None:
+            from app.utils.generate_dataset import generate_dataset
+
+            generate_dataset(db, devices=3, projects=args.projects, telemetry_tests=0)
+        if args.throughput:
+            # Before the edge rows, one of which the fast path declines
+            timings = throughput(db, args.repeat)
+            if timings is None:
+                print("full device trees: declined by the fast path")
+            else:
+                (schemas, size), (fast, _) = timings
+                print(f"full device trees, {size / 2**20:.1f} MiB: schemas {schemas * 1000:.1f} ms, "
+                      f"rows {fast * 1000:.1f} ms ({schemas / fast:.1f}x)")
+        if scratch is not None:
+            _edge_rows(db)
+        compared, declined, mismatches = check(db, args.verbose)
+        print(f"{compared} responses compared, {declined} declined by the fast path, {mismatches} mismatches")
+    finally:
+        db.close()
+        if scratch is not None:
+            engine.dispose()
+            scratch.cleanup()
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
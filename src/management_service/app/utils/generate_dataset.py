@@ -0,0 +1,266 @@
+"""Generate a large, realistic dataset for load tests and benchmarks.
+
+    python -m app.utils.generate_dataset --devices 10 --projects 10000 --telemetry-tests 200 --seed 1
+
+Projects get their real static and cyclic test plans from the test plan
+calculators. Labs work through a plan in order, so each project has finished
+the first part of it. Finished tests carry results:
+
+- Static tests have deflections.
+- Cyclic tests have deflection, permanent set and a pass/fail.
+- Infiltration and missile impact tests are added to finished projects.
+
+For the first `--telemetry-tests` finished static tests, a pressure and gauge
+recording is simulated. It is stored the way compaction stores it, and the
+deflections of those tests are computed from it, so plots and results agree.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.data.bulk import _insert_returning
+from app.data.database import SessionLocal, engine
+from app.data.models import (
+    CyclicTest, Deflection, Device, InfiltrationTest, MissileImpactTest, Project, Shot, StaticTest, TelemetryChunk,
+    TelemetryRollup,
+)
+from app.data.migrations import run_migrations
+from app.domain.deflection_analysis import analyze_static_test
+from app.domain.test_plan import TestPlan
+from app.telemetry.store import compacted_rows, to_epoch
+
+# Projects generated and committed per transaction
+BATCH_PROJECTS = 500
+# Design pressures come in steps like real window ratings
+DESIGN_PRESSURE_STEP = 5.0
+DESIGN_PRESSURES = (40.0, 200.0)
+# Large missiles of the impact standards: (name, weight kg, velocity m/s)
+MISSILES = (("A", 0.002, 39.6), ("B", 0.9, 15.3), ("C", 2.0, 12.2), ("D", 4.1, 15.3), ("E", 4.1, 24.4))
+GAUGE_STIFFNESS = 0.02
+# Seconds of unloaded recording before and after a static test's hold, and of each ramp
+IDLE_SECONDS = 20.0
+RAMP_SECONDS = 10.0
+
+
+def _design_pressures(rng, count):
+    low, high = DESIGN_PRESSURES
+    steps = rng.integers(0, int((high - low) / DESIGN_PRESSURE_STEP) + 1, size=(2, count))
+    return (low + steps * DESIGN_PRESSURE_STEP).tolist()
+
+
+def _deflection_rows(rng, static_test_id, pressure, gauges):
+    stiffness = GAUGE_STIFFNESS * rng.uniform(0.7, 1.3, size=gauges)
+    peaks = pressure * stiffness
+    permanent = peaks * rng.uniform(0.0, 0.08, size=gauges)
+    return [
+        dict(static_test_id=static_test_id, deflection_gauge=gauge + 1, max_deflection=peak,
+             permanent_deflection=set_, recovery=(1 - set_ / peak) * 100)
+        for gauge, (peak, set_) in enumerate(zip(peaks.tolist(), permanent.tolist()))
+    ]
+
+
+def simulate_static_test(rng, started, pressure, duration, gauges, frequency):
+    """(t, pressure, [gauge values, ...]) of one static test: ramp, hold, release."""
+    total = 2 * IDLE_SECONDS + 2 * RAMP_SECONDS + duration
+    t = np.arange(0, total, 1 / frequency)
+    load = np.interp(
+        t,
+        [0, IDLE_SECONDS, IDLE_SECONDS + RAMP_SECONDS, IDLE_SECONDS + RAMP_SECONDS + duration,
+         IDLE_SECONDS + 2 * RAMP_SECONDS + duration, total],
+        [0, 0, 1, 1, 0, 0],
+    )
+    unloaded_after = t > IDLE_SECONDS + 2 * RAMP_SECONDS + duration
+    p = pressure * load + rng.normal(0, 0.005 * abs(pressure), len(t))
+    readings = []
+    for _ in range(gauges):
+        stiffness = GAUGE_STIFFNESS * rng.uniform(0.7, 1.3)
+        permanent = abs(pressure) * stiffness * rng.uniform(0.0, 0.08)
+        readings.append(
+            abs(pressure) * stiffness * load + permanent * unloaded_after + rng.normal(0, 0.002, len(t))
+        )
+    return to_epoch(started) + t, p, readings
+
+
+class DatasetGenerator:
+    def __init__(self, db, seed=0, finished_fraction=0.7, gauges=3, telemetry_tests=0, frequency=20,
+                 pressure_sensor="1", gauge_sensors=None):
+        self.db = db
+        self.rng = np.random.default_rng(seed)
+        self.finished_fraction = finished_fraction
+        self.gauges = gauges
+        self.telemetry_tests = telemetry_tests
+        self.frequency = frequency
+        self.pressure_sensor = pressure_sensor
+        self.gauge_sensors = gauge_sensors or [str(21 + gauge) for gauge in range(gauges)]
+        self.counts = dict(devices=0, projects=0, static_tests=0, cyclic_tests=0, deflections=0,
+                           infiltration_tests=0, missile_impact_tests=0, shots=0, telemetry_samples=0)
+
+    def _insert(self, model, rows, returning=False):
+        self.counts[model.__tablename__] += len(rows)
+        if returning:
+            return _insert_returning(self.db, model, rows, ordered=True)
+        if rows:
+            self.db.execute(insert(model), rows)
+        return []
+
+    def devices(self, count):
+        rows = [dict(name=f"Rig {number + 1}") for number in range(count)]
+        return [device.id for device in self._insert(Device, rows, returning=True)]
+
+    def projects(self, device_ids, count, start):
+        """`count` projects spread over the devices, created after `start`."""
+        for offset in range(0, count, BATCH_PROJECTS):
+            size = min(BATCH_PROJECTS, count - offset)
+            self._project_batch(device_ids, offset, size, start)
+            self.db.commit()
+
+    def _project_batch(self, device_ids, offset, size, start):
+        rng = self.rng
+        inward, outward = _design_pressures(rng, size)
+        days = np.sort(rng.uniform(0, (datetime.now(timezone.utc) - start).days, size))
+        projects = self._insert(Project, [
+            dict(name=f"Project {offset + k + 1:05d}", device_id=device_ids[(offset + k) % len(device_ids)],
+                 inward_design_pressure=inward[k], outward_design_pressure=outward[k],
+                 created_at=start + timedelta(days=float(days[k])))
+            for k in range(size)
+        ], returning=True)
+
+        # Real plans for the whole batch in one calculator call each
+        static_plans = TestPlan.static_tests_many(inward, outward)
+        cyclic_plans = TestPlan.cyclic_tests_many(inward, outward)
+        progress = np.where(rng.random(size) < self.finished_fraction, 1.0, rng.random(size))
+        static_rows, cyclic_rows, finished_projects = [], [], []
+        for project, static_plan, cyclic_plan, done in zip(projects, static_plans, cyclic_plans, progress.tolist()):
+            finished_static = round(done * len(static_plan))
+            finished_cyclic = round(done * len(cyclic_plan))
+            static_rows.extend(dict(row, project_id=project.id, finished=row["index"] < finished_static)
+                               for row in static_plan)
+            for row in cyclic_plan:
+                cyclic_rows.append(dict(row, project_id=project.id, **self._cyclic_result(
+                    row, row["index"] < finished_cyclic)))
+            if done == 1.0:
+                finished_projects.append(project)
+
+        static_tests = self._insert(StaticTest, static_rows, returning=True)
+        self._insert(CyclicTest, cyclic_rows)
+
+        deflections = []
+        projects_by_id = {project.id: project for project in projects}
+        for static_test in static_tests:
+            if not static_test.finished:
+                continue
+            if self.telemetry_tests > 0:
+                self.telemetry_tests -= 1
+                project = projects_by_id[static_test.project_id]
+                started = project.created_at + timedelta(hours=1 + static_test.index)
+                deflections.extend(self._recorded_static_test(static_test, project.device_id, started))
+            else:
+                deflections.extend(_deflection_rows(rng, static_test.id, abs(static_test.pressure), self.gauges))
+        self._insert(Deflection, deflections)
+        self._finished_project_tests(finished_projects)
+
+    def _cyclic_result(self, row, finished):
+        if not finished:
+            return dict(finished=False, completed_cycles=None, deflection=None, permanent_set=None, result=None,
+                        note=None)
+        deflection = abs(row["high_pressure"]) * GAUGE_STIFFNESS * float(self.rng.uniform(0.7, 1.3))
+        permanent_set = deflection * float(self.rng.uniform(0.0, 0.1))
+        passed = permanent_set < 0.08 * deflection
+        return dict(finished=True, completed_cycles=row["cycles"], deflection=deflection, permanent_set=permanent_set,
+                    result=passed,
+                    note=None if passed else "Permanent set above limit")
+
+    def _recorded_static_test(self, static_test, device_id, started):
+        t, pressure, readings = simulate_static_test(
+            self.rng, started, static_test.pressure, static_test.duration, self.gauges, self.frequency
+        )
+        chunks, rollups = [], []
+        for sensor, values in [(self.pressure_sensor, pressure)] + list(zip(self.gauge_sensors, readings)):
+            group = dict(device_id=device_id, sensor=sensor, static_test_id=static_test.id, cyclic_test_id=None)
+            group_chunks, group_rollups = compacted_rows(group, t, values)
+            chunks.extend(group_chunks)
+            rollups.extend(group_rollups)
+            self.counts["telemetry_samples"] += len(t)
+        self.db.execute(insert(TelemetryChunk), chunks)
+        self.db.execute(insert(TelemetryRollup), rollups)
+
+        result = analyze_static_test(
+            t, pressure, [(t, values) for values in readings], static_test.pressure, static_test.duration
+        )
+        if result is None:
+            return _deflection_rows(self.rng, static_test.id, abs(static_test.pressure), self.gauges)
+        peaks, permanent, recovery = result
+        return [
+            dict(static_test_id=static_test.id, deflection_gauge=gauge + 1, max_deflection=float(peak),
+                 permanent_deflection=float(set_), recovery=float(share))
+            for gauge, (peak, set_, share) in enumerate(zip(peaks, permanent, recovery))
+        ]
+
+    def _finished_project_tests(self, projects):
+        rng = self.rng
+        infiltration, missile_tests = [], []
+        for project in projects:
+            for kind in ("air", "water"):
+                infiltration.append(dict(
+                    project_id=project.id, type=kind, pressure=75.0 if kind == "air" else 300.0, duration=15.0,
+                    leakage=float(rng.uniform(0.01, 0.3)) if kind == "air" else 0.0,
+                ))
+            name, weight, _ = MISSILES[rng.integers(len(MISSILES))]
+            missile_tests.append(dict(project_id=project.id, missile=name, missile_weight=weight))
+        self._insert(InfiltrationTest, infiltration)
+        velocities = {name: velocity for name, _, velocity in MISSILES}
+        shots = []
+        for test in self._insert(MissileImpactTest, missile_tests, returning=True):
+            for area in (1, 2, 3):
+                passed = bool(rng.random() < 0.9)
+                shots.append(dict(
+                    missile_impact_test_id=test.id, area=float(area),
+                    velocity=velocities[test.missile] * float(rng.uniform(0.98, 1.02)), result=passed,
+                    note="" if passed else "Penetration",
+                ))
+        self._insert(Shot, shots)
+
+
+def generate_dataset(db, devices=10, projects=1000, years=5, **options):
+    """Insert a dataset and return the number of rows created per table."""
+    generator = DatasetGenerator(db, **options)
+    device_ids = generator.devices(devices)
+    db.commit()
+    generator.projects(device_ids, projects, datetime.now(timezone.utc) - timedelta(days=365 * years))
+    return generator.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--projects", type=int, default=1000, help="total, spread over the devices")
+    parser.add_argument("--years", type=float, default=5, help="projects are created over this many past years")
+    parser.add_argument("--finished", type=float, default=0.7, dest="finished_fraction",
+                        help="share of projects with their whole plan finished")
+    parser.add_argument("--gauges", type=int, default=3)
+    parser.add_argument("--telemetry-tests", type=int, default=0,
+                        help="finished static tests that get a simulated recording")
+    parser.add_argument("--frequency", type=int, default=20, help="telemetry samples per second")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        counts = generate_dataset(
+            db, args.devices, args.projects, args.years, seed=args.seed, finished_fraction=args.finished_fraction,
+            gauges=args.gauges, telemetry_tests=args.telemetry_tests, frequency=args.frequency,
+        )
+    finally:
+        db.close()
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+    print(f"Generated in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
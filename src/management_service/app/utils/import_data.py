@@ -0,0 +1,74 @@
+"""Import historical results from CSV/JSON files.
+
+    python -m app.utils.import_data results/ --dry-run
+    python -m app.utils.import_data projects.csv static_tests.csv
+    python -m app.utils.import_data export.json
+
+A CSV file is imported as the entity it is named after (devices.csv,
+static_tests.csv, ...); a directory imports every such file in it. A JSON file
+holds {entity: [row, ...]}. See app.data.importer for the row columns.
+"""
+import argparse
+import os
+import sys
+
+from app.data.database import SessionLocal, engine
+from app.data.importer import IMPORT_ORDER, import_records, read_csv, read_json
+from app.data.migrations import run_migrations
+
+
+def load_files(paths):
+    records = {}
+    for path in paths:
+        if os.path.isdir(path):
+            paths.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if os.path.splitext(name)[0] in IMPORT_ORDER
+            )
+            continue
+        entity, extension = os.path.splitext(os.path.basename(path))
+        with open(path, encoding="utf-8-sig") as f:
+            text = f.read()
+        if extension == ".json":
+            for name, rows in read_json(text).items():
+                records.setdefault(name, []).extend(rows)
+        elif entity in IMPORT_ORDER:
+            records.setdefault(entity, []).extend(read_csv(text))
+        else:
+            raise SystemExit(f"{path}: CSV files must be named after an entity ({', '.join(IMPORT_ORDER)})")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--dry-run", action="store_true", help="validate and resolve everything, then roll back")
+    args = parser.parse_args()
+
+    records = load_files(list(args.paths))
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        result = import_records(db, records)
+        if args.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    finally:
+        db.close()
+
+    for entity, count in result["counts"].items():
+        if any(count.values()):
+            print(f"{entity}: {count['created']} created, {count['existing']} existing, {count['failed']} failed")
+    # Rows count from 1, not counting a CSV header
+    for error in result["errors"]:
+        print(f"{error['entity']} row {error['index'] + 1}: {error['detail']}", file=sys.stderr)
+    if result["errors_truncated"]:
+        print("More errors were not listed", file=sys.stderr)
+    if args.dry_run:
+        print("Dry run: nothing was written")
+    sys.exit(1 if result["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Replay a realistic UI traffic mix against the API and report latency per endpoint.
+
+Targets (devices, projects, tests with telemetry, deflections) are sampled
+from DATABASE_URL, so seed it first with app.utils.generate_dataset. Without
+--url a uvicorn server for app.main:app is started on that database.
+
+    python -m app.utils.generate_dataset --projects 10000 --telemetry-tests 200
+    python -m app.utils.load_test --concurrency 50 --seconds 60
+    python -m app.utils.load_test --url http://localhost:8000 --requests 20000 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+from sqlalchemy import func
+
+from app.data.database import SessionLocal
+from app.data.models import Deflection, Device, Project, StaticTest, TelemetryChunk
+from app.utils.benchmark_async import _percentile, _start_server, _wait_ready
+
+# Sampled targets per kind; enough to spread load without a huge startup query
+TARGETS = 2_000
+
+
+def load_targets(db):
+    def sample(query):
+        return [row[0] for row in query.order_by(func.random()).limit(TARGETS)]
+
+    targets = dict(
+        devices=sample(db.query(Device.id)),
+        projects=sample(db.query(Project.id)),
+        pressures=sample(db.query(Project.inward_design_pressure)),
+        telemetry_tests=sample(db.query(TelemetryChunk.static_test_id).filter(TelemetryChunk.static_test_id.isnot(None)).distinct()),
+        deflections=[tuple(row) for row in db.query(
+            Deflection.id, Deflection.deflection_gauge, Deflection.max_deflection,
+            Deflection.permanent_deflection, Deflection.recovery,
+        ).order_by(func.random()).limit(TARGETS)],
+        static_tests=sample(db.query(StaticTest.id).filter(StaticTest.finished.is_(True))),
+    )
+    if not targets["devices"] or not targets["projects"]:
+        raise SystemExit("The database has no projects; seed it with app.utils.generate_dataset first")
+    return targets
+
+
+# (name, weight, needs, request builder); weights follow what the UI does most:
+# browse rigs and project lists, open a project, look at plots, now and then edit a result
+def _scenarios():
+    def pick(targets, kind):
+        return random.choice(targets[kind])
+
+    def update_deflection(targets):
+        deflection_id, gauge, peak, permanent, recovery = pick(targets, "deflections")
+        return "PUT", f"/deflections/{deflection_id}/", dict(
+            deflection_gauge=gauge, max_deflection=peak, permanent_deflection=permanent, recovery=recovery
+        )
+
+    return [
+        ("GET /devices/?depth=devices", 10, "devices",
+         lambda t: ("GET", "/devices/", None, dict(depth="devices"))),
+        ("GET /devices/{id}/projects?depth=projects", 20, "devices",
+         lambda t: ("GET", f"/devices/{pick(t, 'devices')}/projects", None, dict(depth="projects", limit=50))),
+        ("GET /projects/?after={id}", 15, "projects",
+         lambda t: ("GET", "/projects/", None, dict(after=pick(t, "projects") - 1, limit=1))),
+        ("GET /projects/?device_id={id}&finished=false", 8, "devices",
+         lambda t: ("GET", "/projects/", None, dict(device_id=pick(t, "devices"), finished="false", depth="projects", limit=20))),
+        ("GET /projects/?name_prefix=", 5, "projects",
+         lambda t: ("GET", "/projects/", None, dict(name_prefix=f"Project {random.randint(0, 9)}", depth="projects", limit=20))),
+        ("GET /devices/{id}/active-test", 10, "devices",
+         lambda t: ("GET", f"/devices/{pick(t, 'devices')}/active-test", None, None)),
+        ("GET /static-tests/{id}/telemetry/{sensor}", 12, "telemetry_tests",
+         lambda t: ("GET", f"/static-tests/{pick(t, 'telemetry_tests')}/telemetry/1", None, dict(points=1000))),
+        ("GET /test-plans/preview", 5, "pressures",
+         lambda t: ("GET", "/test-plans/preview", None, dict(
+             inward_design_pressure=pick(t, "pressures"), outward_design_pressure=pick(t, "pressures")))),
+        ("PUT /deflections/{id}/", 3, "deflections", lambda t: update_deflection(t) + (None,)),
+    ]
+
+
+async def run_load(client, targets, total, seconds, concurrency, seed):
+    random.seed(seed)
+    scenarios = [scenario for scenario in _scenarios() if targets[scenario[2]]]
+    weights = [scenario[1] for scenario in scenarios]
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    sent = 0
+    deadline = time.perf_counter() + seconds if seconds else None
+
+    async def worker():
+        nonlocal sent
+        while (total is None or sent < total) and (deadline is None or time.perf_counter() < deadline):
+            sent += 1
+            name, _, _, build = random.choices(scenarios, weights)[0]
+            method, path, body, params = build(targets)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, params=params)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = "error"
+            latencies[name].append(time.perf_counter() - start)
+            statuses[name][status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results = {}
+    for name, _, _, _ in scenarios:
+        samples = latencies.get(name)
+        if not samples:
+            continue
+        codes = statuses[name]
+        results[name] = {
+            "requests": len(samples),
+            "throughput": len(samples) / elapsed,
+            "p50_ms": _percentile(samples, 0.50) * 1000,
+            "p99_ms": _percentile(samples, 0.99) * 1000,
+            "mean_ms": statistics.mean(samples) * 1000,
+            "errors": sum(count for code, count in codes.items() if code == "error" or code >= 500),
+            "statuses": {str(code): count for code, count in codes.items()},
+        }
+    every = [sample for samples in latencies.values() for sample in samples]
+    results["total"] = {
+        "requests": len(every),
+        "throughput": len(every) / elapsed,
+        "p50_ms": _percentile(every, 0.50) * 1000,
+        "p99_ms": _percentile(every, 0.99) * 1000,
+        "mean_ms": statistics.mean(every) * 1000,
+        "errors": sum(result["errors"] for result in results.values()),
+    }
+    return results
+
+
+async def load_test(args):
+    db = SessionLocal()
+    try:
+        targets = load_targets(db)
+    finally:
+        db.close()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = _start_server(args.async_db, args.port)
+        url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            await _wait_ready(client)
+            return await run_load(client, targets, args.requests, args.seconds, args.concurrency, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="API to load; default starts a local uvicorn server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--async-db", action="store_true", help="start the local server with DB_ASYNC=1")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--seconds", type=float, help="stop after this long (default 30 s without --requests)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    if args.requests is None and args.seconds is None:
+        args.seconds = 30.0
+
+    results = asyncio.run(load_test(args))
+    width = max(len(name) for name in results)
+    print(f"{'endpoint':{width}}  {'requests':>8}  {'req/s':>8}  {'p50 ms':>8}  {'p99 ms':>8}  {'errors':>6}")
+    for name, result in results.items():
+        print(
+            f"{name:{width}}  {result['requests']:8d}  {result['throughput']:8.1f}  "
+            f"{result['p50_ms']:8.1f}  {result['p99_ms']:8.1f}  {result['errors']:6d}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
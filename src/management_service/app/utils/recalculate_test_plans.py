@@ -0,0 +1,28 @@
+"""Recompute the unfinished test plans of stored projects under a protocol.
+
+    python -m app.utils.recalculate_test_plans --protocol default
+"""
+import argparse
+
+from app.data.bulk import recalculate_test_plans
+from app.data.database import SessionLocal
+from app.domain.protocols import get_protocol
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--protocol", default=None, help="registered protocol name (default protocol if omitted)")
+    parser.add_argument("--project", type=int, action="append", dest="project_ids", help="limit to these project ids")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        static_updated, cyclic_updated = recalculate_test_plans(db, get_protocol(args.protocol), args.project_ids)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Updated {static_updated} static and {cyclic_updated} cyclic tests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""The tests run the app against one scratch SQLite database, emptied after each test module.
+
+The app reads its settings at import, so they are set here, before any test
+imports it. No cached response may hide a query or a rendering difference.
+"""
+import os
+import tempfile
+
+import pytest
+
+_scratch = tempfile.TemporaryDirectory(prefix="management-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch.name}/tests.sqlite"
+os.environ["DB_ASYNC"] = "0"
+os.environ["RESPONSE_CACHE_MB"] = "0"
+os.environ["REPORT_CACHE_DIR"] = os.path.join(_scratch.name, "reports")
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """The migrated scratch database; every row a module added is deleted after it."""
+    from app.data.database import get_engine
+    from app.data.migrations import run_migrations
+    from app.data.models import Base
+
+    engine = get_engine()
+    run_migrations(engine)
+    yield engine
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
@@ -0,0 +1,44 @@
+"""LTTB must pick exactly the samples of the plain one-bucket-at-a-time algorithm."""
+import numpy as np
+import pytest
+
+from app.domain.downsampling import lttb
+
+
+def sequential_lttb(t, v, points):
+    n = len(t)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = [0]
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_t, next_v = t[end:next_end].mean(), v[end:next_end].mean()
+        previous = selected[-1]
+        area = np.abs((t[previous] - next_t) * (v[start:end] - v[previous])
+                      - (t[previous] - t[start:end]) * (next_v - v[previous]))
+        selected.append(start + int(np.argmax(area)))
+    selected.append(n - 1)
+    return t[selected], v[selected]
+
+
+def _signal(kind, n, rng):
+    steps = np.arange(n)
+    if kind == "cyclic":
+        return 50 * (1 - np.cos(2 * np.pi * steps / 80)) / 2 + rng.normal(0, 0.2, n)
+    if kind == "steps":
+        return np.repeat(rng.integers(0, 5, n // 100 + 1), 100)[:n].astype(float)
+    if kind == "flat":
+        return np.zeros(n)
+    return rng.normal(0, 1, n)
+
+
+@pytest.mark.parametrize("kind", ["cyclic", "steps", "flat", "noise"])
+@pytest.mark.parametrize("n, points", [(20_000, 5000), (20_000, 200), (1000, 999), (50, 3), (10, 5)])
+def test_lttb_matches_sequential(kind, n, points):
+    rng = np.random.default_rng(0)
+    t = 1.7e9 + np.arange(n) / 20.0
+    v = _signal(kind, n, rng)
+    expected_t, expected_v = sequential_lttb(t, v, points)
+    picked_t, picked_v = lttb(t, v, points)
+    assert np.array_equal(picked_t, expected_t)
+    assert np.array_equal(picked_v, expected_v)
@@ -0,0 +1,130 @@
+"""Statements per request must not grow with the number of projects.
+
+Each request runs against a scratch SQLite database seeded with N projects,
+then again after N more are added to the same devices, on both the row-based
+renderer and the schemas. The statement counts must be equal, and stay under
+a ceiling, so a lazy load or per-row query shows up as a failure here.
+
+    cd src/management_service && python -m pytest -q tests
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+PROJECTS = 20
+DEVICES = 2
+
+# Statements per request, version lookup included; raise one only with the reason in the commit
+CEILINGS = {
+    "GET /devices/?depth=devices": 2,
+    "GET /devices/?depth=projects": 3,
+    "GET /devices/?depth=full": 9,
+    "GET /devices/{device_id}/projects?depth=projects": 2,
+    "GET /devices/{device_id}/projects?depth=full": 8,
+    "PUT /projects/{project_id}": 13,
+    "PUT /projects/{project_id}/static_tests": 11,
+    "PUT /projects/{project_id}/cyclic_tests": 11,
+}
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements = 0
+        self._engine = engine
+        event.listen(engine, "before_cursor_execute", self._executed)
+
+    def stop(self):
+        from sqlalchemy import event
+
+        event.remove(self._engine, "before_cursor_execute", self._executed)
+
+    def _executed(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+
+def _requests(client, device_id, project):
+    """(name, method, path, request kwargs) of every request whose statements are counted."""
+    for depth in ("devices", "projects", "full"):
+        yield f"GET /devices/?depth={depth}", "GET", "/devices/", dict(params=dict(depth=depth))
+    for depth in ("projects", "full"):
+        yield (f"GET /devices/{{device_id}}/projects?depth={depth}", "GET", f"/devices/{device_id}/projects",
+               dict(params=dict(depth=depth)))
+    yield "PUT /projects/{project_id}", "PUT", f"/projects/{project['id']}", dict(json=dict(
+        name=project["name"], inward_design_pressure=project["inward_design_pressure"],
+        outward_design_pressure=project["outward_design_pressure"]))
+    yield "PUT /projects/{project_id}/static_tests", "PUT", f"/projects/{project['id']}/static_tests", dict(json=[
+        dict(type=test["type"], index=test["index"], duration=test["duration"], pressure=test["pressure"])
+        for test in project["static_tests"]
+    ])
+    yield "PUT /projects/{project_id}/cyclic_tests", "PUT", f"/projects/{project['id']}/cyclic_tests", dict(json=[
+        dict(index=test["index"], cycles=test["cycles"], type=test["type"], low_pressure=test["low_pressure"],
+             high_pressure=test["high_pressure"])
+        for test in project["cyclic_tests"]
+    ])
+
+
+def _count(client, counter, device_id, project):
+    counts = {}
+    for name, method, path, kwargs in _requests(client, device_id, project):
+        counter.statements = 0
+        response = client.request(method, path, **kwargs)
+        assert response.status_code == 200, f"{name}: {response.status_code} {response.text[:200]}"
+        counts[name] = counter.statements
+    return counts
+
+
+@pytest.fixture(scope="module")
+def statement_counts(engine):
+    """{(fast json, request name): (statements with N projects, statements with 2N)}."""
+    with pytest.MonkeyPatch.context() as env:
+        from fastapi.testclient import TestClient
+
+        from app.data import tree_json
+        from app.data.database import SessionLocal
+        from app.data.models import Device
+        from app.data.response_cache import response_cache
+        from app.main import app
+        from app.utils.generate_dataset import DatasetGenerator, generate_dataset
+
+        db = SessionLocal()
+        try:
+            generate_dataset(db, devices=DEVICES, projects=PROJECTS)
+            device_ids = [device_id for device_id, in db.query(Device.id).order_by(Device.id)]
+        finally:
+            db.close()
+
+        with TestClient(app) as client:
+            project = client.post(f"/devices/{device_ids[0]}/projects/", json=dict(
+                name="Query counts", inward_design_pressure=100.0, outward_design_pressure=80.0)).json()
+
+            def count_both_ways():
+                counts = {}
+                for fast in (True, False):
+                    env.setattr(tree_json, "FAST_JSON", fast)
+                    response_cache.clear()
+                    counter = StatementCounter(engine)
+                    try:
+                        for name, statements in _count(client, counter, device_ids[0], project).items():
+                            counts[fast, name] = statements
+                    finally:
+                        counter.stop()
+                return counts
+
+            before = count_both_ways()
+            db = SessionLocal()
+            try:
+                DatasetGenerator(db, seed=1).projects(device_ids, PROJECTS, datetime(2020, 1, 1, tzinfo=timezone.utc))
+            finally:
+                db.close()
+            after = count_both_ways()
+    return {key: (before[key], after[key]) for key in before}
+
+
+@pytest.mark.parametrize("fast_json", [True, False], ids=["rows", "schemas"])
+@pytest.mark.parametrize("request_name", list(CEILINGS))
+def test_statements_do_not_grow_with_projects(statement_counts, request_name, fast_json):
+    with_n, with_2n = statement_counts[fast_json, request_name]
+    assert with_n == with_2n, f"{with_n} statements with {PROJECTS} projects, {with_2n} with {2 * PROJECTS}"
+    assert with_2n <= CEILINGS[request_name]
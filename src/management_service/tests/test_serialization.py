@@ -0,0 +1,97 @@
+"""The row-based renderer must produce the schemas' bytes for every response app.utils.check_serialization covers.
+
+A generated dataset plus the script's edge rows: non-ASCII and control
+characters, extreme and non-finite floats, NULL optionals, datetimes the
+trees leave out and empty child lists at every level. Rows the fast path
+cannot vouch for must be declined, and the routes must then serve the
+schemas' bytes all the same.
+"""
+import pytest
+
+PROJECTS = 20
+# Projects of the edge rows the fast path must decline, and those it must render
+DECLINED_PROJECTS = ("Huge", "Infinite")
+RENDERED_PROJECTS = ("Édge 1e5 project", "Empty project", "Childless tests")
+
+
+@pytest.fixture(scope="module")
+def db(engine):
+    from app.data.database import SessionLocal
+    from app.utils.check_serialization import _edge_rows
+    from app.utils.generate_dataset import generate_dataset
+
+    db = SessionLocal()
+    generate_dataset(db, devices=2, projects=PROJECTS)
+    _edge_rows(db)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def fast_json(monkeypatch):
+    from app.data import tree_json
+
+    monkeypatch.setattr(tree_json, "FAST_JSON", True)
+    return tree_json
+
+
+def _project_ids(db, names):
+    from app.data.models import Project
+
+    return {project_id for project_id, in db.query(Project.id).filter(Project.name.in_(names))}
+
+
+def _device_id(db, name):
+    from app.data.models import Device
+
+    return db.query(Device.id).filter(Device.name == name).scalar()
+
+
+def test_rows_render_like_the_schemas(db, fast_json):
+    from app.utils.check_serialization import _cases, _schema_render
+
+    mismatches, declined = [], set()
+    for name, schema, model, statement_filter, options, many, *child_criteria in _cases(db):
+        db.expunge_all()
+        expected = _schema_render(db, schema, model, statement_filter, options, many)
+        rendered = fast_json.render(db, schema, model, statement_filter, child_criteria[0] if child_criteria else None,
+                                    many=many)
+        if rendered is None:
+            declined.add(name)
+        elif rendered[1] != expected:
+            mismatches.append(name)
+    assert mismatches == []
+
+    for project_id in _project_ids(db, DECLINED_PROJECTS):
+        assert f"project {project_id}" in declined
+    for project_id in _project_ids(db, RENDERED_PROJECTS):
+        assert f"project {project_id}" not in declined
+    for name in ("Plain rig", "Empty rig"):
+        device_id = _device_id(db, name)
+        assert {f"device {device_id} projects depth=projects", f"device {device_id} projects depth=full"}.isdisjoint(declined)
+
+
+def test_routes_serve_the_same_bytes_either_way(db, fast_json, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.data.models import Device, Project
+    from app.main import app
+
+    requests = [("/devices/", dict(depth=depth)) for depth in ("devices", "projects", "full")]
+    requests.append(("/devices/", dict(depth="projects", finished=False)))
+    for device_id, in db.query(Device.id).order_by(Device.id):
+        requests.extend((f"/devices/{device_id}/projects", dict(depth=depth)) for depth in ("projects", "full"))
+    requests.extend((f"/projects/{project_id}", {}) for project_id, in db.query(Project.id).order_by(Project.id))
+
+    client = TestClient(app)
+    responses = {}
+    for fast in (True, False):
+        monkeypatch.setattr(fast_json, "FAST_JSON", fast)
+        for path, params in requests:
+            response = client.get(path, params=params)
+            responses.setdefault((path, str(params)), []).append((response.status_code, response.content))
+    different = [request for request, (fast, schemas) in responses.items() if fast != schemas]
+    assert different == []
+    # Only the device without projects has nothing to serve
+    not_found = {path for (path, _), [(status, _), _] in responses.items() if status != 200}
+    assert not_found == {f"/devices/{_device_id(db, 'Empty rig')}/projects"}